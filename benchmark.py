@@ -0,0 +1,1284 @@
+"""
+Benchmark untuk P2P Messaging
+
+Jalankan: python benchmark.py <nama> [opsi]
+"""
+import argparse
+import gc
+import heapq
+import json
+import math
+import os
+import random
+import socket
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Optional
+
+from p2p_messaging import Peer, Message, MessageType
+from p2p_messaging import framing
+from p2p_messaging.message import CODECS, AliasTable
+from p2p_messaging.network import P2PServer, ConnectionHandler
+from p2p_messaging.reactor import Reactor, ReactorServer
+from p2p_messaging.routing import RoutingTable, MAX_HOPS
+from p2p_messaging.membership import MemberTable
+from p2p_messaging.peer import PeerInfo
+from p2p_messaging.outbox import Outbox
+from p2p_messaging.events import EventPump
+from p2p_messaging.history import History
+from p2p_messaging.utils import find_available_port, now_us
+
+
+def _report(title: str, rows):
+    print(f"\n== {title} ==")
+    for key, value in rows:
+        print(f"  {key:<32} {value}")
+
+
+def bench_transport(args):
+    """Biaya koneksi idle: memori per koneksi, jumlah thread, CPU saat idle"""
+    for transport in ("thread", "selector"):
+        gc.collect()
+        port = find_available_port(args.port, args.port + 1000)
+        accepted = []
+        lock = threading.Lock()
+
+        def on_connection(handler):
+            handler.start()
+            with lock:
+                accepted.append(handler)
+
+        reactor = None
+        if transport == "selector":
+            reactor = Reactor()
+            reactor.start()
+            server = ReactorServer(reactor, "127.0.0.1", port, on_connection)
+        else:
+            server = P2PServer("127.0.0.1", port, on_connection)
+        server.start()
+
+        threads_before = threading.active_count()
+        tracemalloc.start()
+        mem_before = tracemalloc.get_traced_memory()[0]
+
+        clients = []
+        for _ in range(args.connections):
+            sock = socket.create_connection(("127.0.0.1", port))
+            clients.append(sock)
+        while len(accepted) < args.connections:
+            time.sleep(0.01)
+        time.sleep(0.2)
+
+        mem_after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        threads_after = threading.active_count()
+
+        cpu_start = time.process_time()
+        time.sleep(args.idle)
+        cpu_idle = time.process_time() - cpu_start
+
+        per_conn = (mem_after - mem_before) / args.connections
+        _report(f"transport={transport}", [
+            ("idle connections", args.connections),
+            ("threads added", threads_after - threads_before),
+            ("python heap per connection", f"{per_conn / 1024:.2f} KiB"),
+            (f"CPU during {args.idle:.1f}s idle", f"{cpu_idle * 1000:.1f} ms"),
+        ])
+
+        for sock in clients:
+            sock.close()
+        for handler in accepted:
+            handler.stop()
+        server.stop()
+        if reactor:
+            reactor.stop()
+        time.sleep(0.5)
+
+
+def bench_broadcast(args):
+    """Biaya broadcast per penerima: encode per peer vs encode sekali"""
+    text = "x" * args.payload
+    for peers in (10, 100, 1000):
+        peer = Peer("bench", 0)
+        socks = []
+        for i in range(peers):
+            a, b = socket.socketpair()
+            socks.extend((a, b))
+            handler = ConnectionHandler(a, ("bench", i), peer_id=str(i))
+            handler.configure_send_queue(args.rounds + 1, "drop_oldest")
+            peer.connections[str(i)] = handler
+        handlers = list(peer.connections.values())
+
+        def make_message():
+            return Message(MessageType.BROADCAST, peer.peer_id, peer.name, {"text": text})
+
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            message = make_message()
+            for handler in handlers:
+                # Previous behaviour: every recipient serialized the message
+                handler.send_queue.put(handler.framing.encode(message.to_payload()))
+        per_peer_encode = time.perf_counter() - start
+
+        for handler in handlers:
+            handler.configure_send_queue(args.rounds + 1, "drop_oldest")
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            peer._broadcast_message(make_message())
+        encode_once = time.perf_counter() - start
+
+        scale = 1e6 / (args.rounds * peers)
+        _report(f"broadcast peers={peers} payload={args.payload}B", [
+            ("encode per recipient", f"{per_peer_encode * scale:.2f} us/recipient"),
+            ("encode once (shared buffer)", f"{encode_once * scale:.2f} us/recipient"),
+            ("speedup", f"{per_peer_encode / encode_once:.1f}x"),
+        ])
+        for sock in socks:
+            sock.close()
+
+
+class LegacyMessage:
+    # Message sebelum __slots__ (dict-backed, timestamp ISO string)
+
+    def __init__(self, msg_type, sender_id, sender_name, data=None, target_id=None):
+        self.msg_type = msg_type
+        self.sender_id = sender_id
+        self.sender_name = sender_name
+        self.timestamp = datetime.now().isoformat()
+        self.data = data
+        self.target_id = target_id
+
+    def to_payload(self) -> bytes:
+        return json.dumps({
+            "type": self.msg_type.value,
+            "sender_id": self.sender_id,
+            "sender_name": self.sender_name,
+            "timestamp": self.timestamp,
+            "data": self.data,
+            "target_id": self.target_id
+        }).encode("utf-8")
+
+    @classmethod
+    def from_payload(cls, payload) -> "LegacyMessage":
+        data = json.loads(str(payload, "utf-8"))
+        msg = cls(
+            msg_type=MessageType(data["type"]),
+            sender_id=data["sender_id"],
+            sender_name=data["sender_name"],
+            data=data.get("data"),
+            target_id=data.get("target_id")
+        )
+        msg.timestamp = data.get("timestamp", msg.timestamp)
+        # The GUI parsed the ISO timestamp again for every received message
+        datetime.fromisoformat(msg.timestamp)
+        return msg
+
+
+def _throughput(func, count: int) -> str:
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    elapsed = time.perf_counter() - start
+    return f"{count / elapsed / 1000:.1f} k/s"
+
+
+def _instance_size(factory, count: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [factory() for _ in range(count)]
+    size = (tracemalloc.get_traced_memory()[0] - before) / count
+    tracemalloc.stop()
+    del objects
+    return size
+
+
+def bench_message(args):
+    """Throughput construct/encode/decode Message vs class lama"""
+    count = args.rounds * 100
+    sender_id = "0123456789abcdef"
+    for cls in (LegacyMessage, Message):
+        def construct():
+            return cls(MessageType.MESSAGE, sender_id, "alice", {"text": "halo"}, "fedcba9876543210")
+
+        sample = construct()
+        payload = sample.to_payload()
+        _report(cls.__name__, [
+            ("construct", _throughput(construct, count)),
+            ("encode", _throughput(sample.to_payload, count)),
+            ("decode", _throughput(lambda: cls.from_payload(payload), count)),
+            ("encoded size", f"{len(payload)} B"),
+            ("memory per instance", f"{_instance_size(construct, count):.0f} B"),
+        ])
+
+
+def _sample_messages():
+    sender_id = "0123456789abcdef"
+    target_id = "fedcba9876543210"
+    peers = [
+        {"peer_id": f"{i:016x}", "name": f"peer{i}", "host": f"192.168.1.{i}", "port": 5000 + i}
+        for i in range(10)
+    ]
+    return {
+        "MESSAGE": Message(MessageType.MESSAGE, sender_id, "alice", {"text": "halo apa kabar?"}, target_id),
+        "BROADCAST": Message(MessageType.BROADCAST, sender_id, "alice", {"text": "halo semua"}),
+        "PING": Message(MessageType.PING, sender_id, "alice"),
+        "JOIN": Message(MessageType.JOIN, sender_id, "alice", {"host": "192.168.1.2", "port": 5000}),
+        "PEERS": Message(MessageType.PEERS, sender_id, "alice", {"peers": peers}),
+    }
+
+
+def bench_codec(args):
+    """Ukuran dan waktu encode/decode per tipe pesan untuk tiap codec"""
+    count = args.rounds * 20
+    for type_name, message in _sample_messages().items():
+        rows = []
+        for codec in CODECS.values():
+            payload = codec.encode(message)
+            start = time.perf_counter()
+            for _ in range(count):
+                codec.encode(message)
+            encode_us = (time.perf_counter() - start) / count * 1e6
+            start = time.perf_counter()
+            for _ in range(count):
+                codec.decode(payload)
+            decode_us = (time.perf_counter() - start) / count * 1e6
+            rows.append((codec.name, f"{len(payload):>5} B  enc {encode_us:6.2f} us  dec {decode_us:6.2f} us"))
+        _report(f"codec {type_name}", rows)
+
+
+def bench_alias(args):
+    """Byte per frame dan alokasi per pesan: alias peer id vs string penuh"""
+    codec = CODECS["binary"]
+    count = args.rounds * 10
+    message = _sample_messages()["MESSAGE"]
+    for use_aliases in (False, True):
+        tx = AliasTable() if use_aliases else None
+        rx = AliasTable() if use_aliases else None
+        payloads = [codec.encode(message, tx) for _ in range(count)]
+
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        decoded = [codec.decode(payload, rx) for payload in payloads]
+        elapsed = time.perf_counter() - start
+        retained = (tracemalloc.get_traced_memory()[0] - before) / count
+        tracemalloc.stop()
+
+        _report(f"alias={'on' if use_aliases else 'off'} ({count} MESSAGE frames)", [
+            ("bytes per frame", f"{sum(map(len, payloads)) / count:.1f} B"),
+            ("decode", f"{elapsed / count * 1e6:.2f} us/msg"),
+            ("retained per decoded message", f"{retained:.0f} B"),
+        ])
+        del decoded
+
+
+def bench_relay(args):
+    """Biaya meneruskan frame: decode penuh + encode ulang vs header saja"""
+    count = args.rounds * 20
+    # Direct messages carry a TTL since routing, relays decrement it
+    message = Message(
+        MessageType.MESSAGE, "0123456789abcdef", "alice",
+        {"text": "x" * args.payload, "extra": list(range(20))}, "fedcba9876543210",
+        msg_id=1, ttl=MAX_HOPS
+    )
+    for codec in CODECS.values():
+        payload = codec.encode(message)
+        rows = []
+        for mode in ("eager", "lazy"):
+            out = AliasTable()
+            decoded = 0
+            start = time.perf_counter()
+            for _ in range(count):
+                # Same steps as Peer._relay_message + ConnectionHandler._enqueue
+                received = codec.decode(payload)
+                if mode == "eager":
+                    # Previous path: full decode, then serialize again for the next hop
+                    received.data = received.data
+                received.hop()
+                codec.encode_header(received, out)
+                codec.encode_body(received)
+                decoded += received.raw_body(codec.name) is None
+            rows.append((mode, f"{(time.perf_counter() - start) / count * 1e6:.2f} us/frame, "
+                               f"{decoded / count:.0%} re-serialized"))
+        _report(f"relay codec={codec.name} payload={args.payload}B", rows)
+
+
+def _converge(tables, links, pending):
+    # sebarkan delta rute per ronde sampai tidak ada perubahan lagi
+    rounds = messages = 0
+    while pending:
+        rounds += 1
+        outgoing = {}
+        for (src, dst), entries in pending.items():
+            if dst not in tables or src not in links[dst]:
+                continue
+            messages += 1
+            changed = tables[dst].update(src, entries)
+            if changed:
+                for neighbor in links[dst]:
+                    outgoing.setdefault((dst, neighbor), set()).update(changed)
+        pending = {}
+        for (src, dst), changed in outgoing.items():
+            entries = tables[src].advertise(dst, changed)
+            if entries:
+                pending[(src, dst)] = entries
+    return rounds, messages
+
+
+def _walk(tables, src, dst):
+    # ikuti next hop seperti _relay_message, return jumlah hop atau None
+    hops = 0
+    node = src
+    while node != dst:
+        node = tables[node].next_hop(dst)
+        hops += 1
+        if node is None or hops > MAX_HOPS:
+            return None
+    return hops
+
+
+def _bfs(links, src):
+    dist = {src: 0}
+    frontier = [src]
+    while frontier:
+        nxt = []
+        for node in frontier:
+            for neighbor in links[node]:
+                if neighbor not in dist:
+                    dist[neighbor] = dist[node] + 1
+                    nxt.append(neighbor)
+        frontier = nxt
+    return dist
+
+
+def _overlay(rng, count: int, degree: int):
+    # ring plus random chords, sekitar `degree` link per node
+    nodes = [f"{rng.getrandbits(64):016x}" for _ in range(count)]
+    links = {node: set() for node in nodes}
+    for i, node in enumerate(nodes):
+        links[node].add(nodes[i - 1])
+        links[nodes[i - 1]].add(node)
+        while len(links[node]) < degree:
+            other = rng.choice(nodes)
+            if other != node:
+                links[node].add(other)
+                links[other].add(node)
+    return nodes, links
+
+
+def bench_routing(args):
+    """Simulasi distance-vector: delivery rate dan jumlah hop di N node"""
+    rng = random.Random(1)
+    nodes, links = _overlay(rng, args.nodes, max(int(math.log2(args.nodes)), 2))
+
+    tables = {node: RoutingTable(node) for node in nodes}
+    start = time.perf_counter()
+    for node in nodes:
+        for neighbor in links[node]:
+            tables[node].add_neighbor(neighbor)
+    pending = {
+        (node, neighbor): tables[node].advertise(neighbor)
+        for node in nodes for neighbor in links[node]
+    }
+    rounds, messages = _converge(tables, links, pending)
+    elapsed = time.perf_counter() - start
+
+    def sample(count):
+        delivered = total_hops = max_hops = stretch_sum = 0
+        alive = list(tables)
+        pairs = [tuple(rng.sample(alive, 2)) for _ in range(count)]
+        shortest = {}
+        for src, dst in pairs:
+            hops = _walk(tables, src, dst)
+            if hops is None:
+                continue
+            if src not in shortest:
+                shortest[src] = _bfs(links, src)
+            delivered += 1
+            total_hops += hops
+            max_hops = max(max_hops, hops)
+            stretch_sum += hops / shortest[src][dst]
+        reachable = delivered or 1
+        return [
+            ("delivery rate", f"{delivered / count * 100:.1f}%"),
+            ("average hops", f"{total_hops / reachable:.2f}"),
+            ("max hops", max_hops),
+            ("stretch vs shortest path", f"{stretch_sum / reachable:.3f}"),
+        ]
+
+    _report(f"routing nodes={args.nodes} links/node={sum(map(len, links.values())) / args.nodes:.1f}", [
+        ("convergence rounds", rounds),
+        ("route updates sent", messages),
+        ("simulation time", f"{elapsed:.1f} s"),
+        ("routes per table", f"{sum(map(len, tables.values())) / args.nodes:.0f}"),
+    ] + sample(args.rounds * 5))
+
+    # Fail 5% of the nodes and let the survivors reconverge
+    failed = rng.sample(nodes, args.nodes // 20)
+    pending = {}
+    for node in failed:
+        for neighbor in links.pop(node):
+            if neighbor in links:
+                links[neighbor].discard(node)
+                changed = tables[neighbor].remove_neighbor(node)
+                for other in links[neighbor]:
+                    entries = tables[neighbor].advertise(other, changed)
+                    if entries:
+                        pending.setdefault((neighbor, other), {}).update(entries)
+        del tables[node]
+    rounds, messages = _converge(tables, links, pending)
+    _report(f"routing after {len(failed)} node failures", [
+        ("convergence rounds", rounds),
+        ("route updates sent", messages),
+    ] + sample(args.rounds * 5))
+
+
+def _spread(links, origin, fanout, ttl, rng, latency):
+    # simulasi satu broadcast seperti Peer._handle_broadcast (event-driven)
+    reached = {}
+    sent = dict.fromkeys(links, 0)
+    events = [(0.0, origin, None, ttl + 1)]
+    while events:
+        now, node, source, ttl_left = heapq.heappop(events)
+        if node in reached:
+            continue  # duplicate, dropped by the seen set
+        reached[node] = now
+        ttl_left -= 1
+        if ttl_left <= 0:
+            continue
+        targets = [other for other in links[node] if other != source and other != origin]
+        if fanout is not None and len(targets) > fanout:
+            targets = rng.sample(targets, fanout)
+        sent[node] += len(targets)
+        for other in targets:
+            heapq.heappush(events, (now + latency(), other, node, ttl_left))
+    return reached, sent
+
+
+def bench_gossip(args):
+    """Simulasi broadcast epidemic: coverage, redundansi, waktu sampai semua node"""
+    rng = random.Random(1)
+    nodes, links = _overlay(rng, args.nodes, 6)
+    degree = sum(map(len, links.values())) / len(nodes)
+
+    def latency():
+        # per-hop latency in ms
+        return rng.uniform(1.0, 20.0)
+
+    for fanout in (None, 4, 3, 2):
+        coverage = redundancy = full_time = avg_sent = max_sent = 0.0
+        samples = 20
+        complete = 0
+        for _ in range(samples):
+            origin = rng.choice(nodes)
+            reached, sent = _spread(links, origin, fanout, MAX_HOPS, rng, latency)
+            transmissions = sum(sent.values())
+            coverage += len(reached) / len(nodes)
+            redundancy += transmissions / max(len(reached) - 1, 1)
+            avg_sent += transmissions / len(reached)
+            max_sent = max(max_sent, max(sent.values()))
+            if len(reached) == len(nodes):
+                complete += 1
+                full_time += max(reached.values())
+        _report(f"gossip nodes={args.nodes} links/node={degree:.1f} fanout={fanout or 'all'}", [
+            ("coverage", f"{coverage / samples * 100:.2f}%"),
+            ("broadcasts reaching every node", f"{complete}/{samples}"),
+            ("redundancy (sends per delivery)", f"{redundancy / samples:.2f}"),
+            ("sends per node (avg/max)", f"{avg_sent / samples:.2f} / {int(max_sent)}"),
+            ("time to full coverage", f"{full_time / complete:.0f} ms" if complete else "-"),
+        ])
+
+
+class _MeteredPeer(Peer):
+    # Peer yang menghitung byte frame MESSAGE vs ACK yang dikirim
+    drop_rate = 0.0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wire = {"MESSAGE": 0, "ACK": 0}
+        self.rng = random.Random(1)
+
+    def _transmit(self, peer_id, message):
+        with self.lock:
+            handler = self._route_handler(peer_id)
+        if handler is not None and message.msg_type.value in self.wire:
+            self.wire[message.msg_type.value] += len(handler.codec.encode(message))
+        return super()._transmit(peer_id, message)
+
+    def _handle_message(self, message, handler):
+        # Simulated loss on the receiving side
+        if message.msg_type == MessageType.MESSAGE and self.rng.random() < self.drop_rate:
+            return
+        super()._handle_message(message, handler)
+
+
+def bench_reliability(args):
+    """Overhead ACK vs payload dan retransmit pada beban terus-menerus"""
+    count = args.rounds * 50
+    text = "x" * args.payload
+    for loss in (0.0, 0.01, 0.05):
+        sender = _MeteredPeer("sender", args.port, host="127.0.0.1", transport="selector")
+        receiver = _MeteredPeer("receiver", args.port + 1, host="127.0.0.1", transport="selector")
+        receiver.drop_rate = loss
+        for peer in (sender, receiver):
+            peer.local_ip = "127.0.0.1"
+            peer.start()
+        sender.connect_to_peer("127.0.0.1", args.port + 1)
+        while receiver.peer_id not in sender.connections:
+            time.sleep(0.01)
+
+        start = time.perf_counter()
+        deliveries = [sender.send_message(text, receiver.peer_id) for _ in range(count)]
+        delivered = sum(delivery.wait(30.0) for delivery in deliveries)
+        elapsed = time.perf_counter() - start
+
+        sent = sender.get_reliability_stats()
+        acks = receiver.get_reliability_stats()["acks_sent"]
+        payload_bytes = sender.wire["MESSAGE"]
+        _report(f"reliability loss={loss:.0%} messages={count} payload={args.payload}B", [
+            ("delivered", f"{delivered}/{count}"),
+            ("throughput", f"{count / elapsed / 1000:.1f} k msg/s"),
+            ("ACK frames per 100 messages", f"{acks / count * 100:.2f}"),
+            ("ACK bytes / MESSAGE bytes", f"{receiver.wire['ACK'] / payload_bytes * 100:.3f}%"),
+            ("retransmits", f"{sent['retransmits']} ({sent['retransmits'] / count * 100:.1f}%)"),
+        ])
+        for peer in (sender, receiver):
+            peer.stop()
+        time.sleep(0.5)
+        args.port += 2
+
+
+def _bytes_written(paths) -> int:
+    # byte yang ditulis proses ini (Linux), fallback ke ukuran file
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+def bench_outbox(args):
+    """Throughput append outbox, write amplification, dan replay setelah reconnect"""
+    count = args.rounds * 50
+    text = "x" * args.payload
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "outbox.db")
+        files = [path, path + "-wal"]
+        outbox = Outbox(path)
+        message = Message(MessageType.MESSAGE, "0123456789abcdef", "alice", {"text": text}, "fedcba9876543210")
+        payload_bytes = len(message.to_payload()) * count
+
+        written = _bytes_written(files)
+        start = time.perf_counter()
+        for _ in range(count):
+            outbox.put("fedcba9876543210", message)
+        append_time = time.perf_counter() - start
+        written = _bytes_written(files) - written
+
+        start = time.perf_counter()
+        drained = 0
+        while True:
+            batch = outbox.peek("fedcba9876543210", 1024)
+            if not batch:
+                break
+            outbox.remove("fedcba9876543210", batch[-1][0])
+            drained += len(batch)
+        read_time = time.perf_counter() - start
+        outbox.close()
+
+        _report(f"outbox sqlite-wal messages={count} payload={args.payload}B", [
+            ("append", f"{count / append_time / 1000:.1f} k msg/s"),
+            ("write amplification", f"{written / payload_bytes:.2f}x ({written / 1e6:.1f} MB written)"),
+            ("read + delete in batches", f"{drained / read_time / 1000:.1f} k msg/s"),
+        ])
+
+        # End-to-end: queue while the peer is away, then replay on reconnect
+        received = []
+        sender = Peer("sender", args.port, host="127.0.0.1", transport="selector",
+                      outbox_path=os.path.join(tmp, "replay.db"))
+        sender.local_ip = "127.0.0.1"
+        sender.start()
+        target = "fedcba9876543210"
+        for _ in range(count):
+            sender.send_message(text, target)
+
+        receiver = Peer("receiver", args.port + 1, host="127.0.0.1", transport="selector",
+                        on_message=lambda *event: received.append(event), identity=target)
+        receiver.local_ip = "127.0.0.1"
+        receiver.start()
+        start = time.perf_counter()
+        receiver.connect_to_peer("127.0.0.1", args.port)
+        while len(received) < count and time.perf_counter() - start < 60:
+            time.sleep(0.005)
+        replay_time = time.perf_counter() - start
+        _report(f"outbox replay after reconnect messages={count}", [
+            ("replayed", f"{len(received)}/{count}"),
+            ("replay throughput", f"{len(received) / replay_time / 1000:.1f} k msg/s"),
+            ("time to empty outbox", f"{replay_time * 1000:.0f} ms"),
+        ])
+        receiver.stop()
+        sender.stop()
+
+
+class _CountingPeer(Peer):
+    # Peer yang menghitung handshake JOIN yang diterima
+    joins = 0
+
+    def _handle_join(self, message, handler):
+        _CountingPeer.joins += 1
+        super()._handle_join(message, handler)
+
+
+def _wait_link(a, b, old, timeout: float = 10.0) -> bool:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        ab, ba = a.connections.get(b.peer_id), b.connections.get(a.peer_id)
+        if ab is not None and ba is not None and old not in (ab, ba) and ab.tx_aliases is not None:
+            return True
+        time.sleep(0.0005)
+    return False
+
+
+def bench_reconnect(args):
+    """Waktu sampai link yang putus tersambung lagi: redial + resume otomatis vs JOIN ulang langsung"""
+    flaps = max(args.rounds // 10, 5)
+    for mode in ("resume", "rejoin"):
+        port = find_available_port(args.port, args.port + 1000)
+        # session_ttl=0 turns automatic redial off
+        ttl = 60.0 if mode == "resume" else 0.0
+        a = Peer("a", port, host="127.0.0.1", transport="selector", session_ttl=ttl)
+        b = Peer("b", port + 1, host="127.0.0.1", transport="selector", session_ttl=ttl)
+        lower, higher = sorted((a, b), key=lambda p: p.peer_id)
+        for peer in (a, b):
+            peer.local_ip = "127.0.0.1"
+            peer.start()
+        higher.connect_to_peer("127.0.0.1", lower.port)
+        _wait_link(a, b, None)
+
+        times = []
+        for _ in range(flaps):
+            old = lower.connections[higher.peer_id]
+            start = time.perf_counter()
+            old.socket.shutdown(socket.SHUT_RDWR)
+            if mode == "rejoin":
+                while higher.peer_id in lower.connections:
+                    time.sleep(0.0005)
+                lower.connect_to_peer("127.0.0.1", higher.port)
+            if not _wait_link(a, b, old):
+                break
+            times.append(time.perf_counter() - start)
+            time.sleep(0.05)
+
+        times.sort()
+        _report(f"reconnect {mode} flaps={flaps}", [
+            ("reconnected", f"{len(times)}/{flaps}"),
+            ("median", f"{statistics.median(times) * 1000:.1f} ms" if times else "-"),
+            ("max", f"{times[-1] * 1000:.1f} ms" if times else "-"),
+        ])
+        a.stop()
+        b.stop()
+
+
+def bench_members(args):
+    """Byte dan CPU handshake + sinkronisasi member: daftar penuh vs digest + delta"""
+    codec = CODECS["json"]
+    sender_id = "0123456789abcdef"
+    for size in (100, 1000, args.nodes * 5):
+        entries = [
+            {"peer_id": f"{i:016x}", "name": f"peer{i}", "host": f"10.0.{i // 250}.{i % 250}",
+             "port": 5000 + i % 1000, "incarnation": 0, "alive": True}
+            for i in range(size)
+        ]
+        table = MemberTable(sender_id)
+        table.merge(entries, source="seed")
+        peer_list = [{key: e[key] for key in ("peer_id", "name", "host", "port")} for e in entries]
+
+        # Old handshake: the full peer list in PEERS, walked by the receiver
+        full = codec.encode(Message(MessageType.PEERS, sender_id, "alice", {"peers": peer_list}))
+        start = time.perf_counter()
+        for peer in codec.decode(full).data["peers"]:
+            PeerInfo.from_dict(peer)
+        full_time = time.perf_counter() - start
+
+        # New handshake carries a digest; equal digests mean nothing to sync
+        digest = codec.encode(Message(MessageType.PEERS, sender_id, "alice", {"digest": table.digest_hex()}))
+
+        # Ten changes later only those ten entries travel
+        since = table.version
+        for i in range(10):
+            table.mark_dead(entries[i * 7]["peer_id"])
+        changes, upto = table.delta(since)
+        delta = codec.encode(Message(MessageType.PEERS, sender_id, "alice", {"members": changes, "version": upto}))
+        replica = MemberTable("fedcba9876543210")
+        replica.merge(entries, source="seed")
+        start = time.perf_counter()
+        replica.merge(codec.decode(delta).data["members"], source=sender_id)
+        delta_time = time.perf_counter() - start
+
+        # A newcomer still pulls the table once, in bounded frames after the handshake
+        sync_bytes, frames, since = 0, 0, 0
+        while since < table.version:
+            chunk, since = table.delta(since)
+            sync_bytes += len(codec.encode(Message(MessageType.PEERS, sender_id, "alice", {"members": chunk, "version": since})))
+            frames += 1
+
+        _report(f"members size={size}", [
+            ("full list handshake", f"{len(full):>9} B  {full_time * 1000:7.2f} ms"),
+            ("digest handshake", f"{len(digest):>9} B"),
+            ("delta after 10 changes", f"{len(delta):>9} B  {delta_time * 1000:7.2f} ms"),
+            ("digests equal after delta", replica.digest == table.digest),
+            ("newcomer sync", f"{sync_bytes:>9} B in {frames} frames"),
+        ])
+
+
+def bench_dial(args):
+    """Warm start ke banyak alamat: connect_many dengan dial tak terbatas vs dibatasi"""
+    targets = []
+    base = args.port
+    for i in range(args.peers):
+        peer = Peer(f"t{i}", base + i, host="127.0.0.1", transport="selector", max_connections=1000)
+        peer.local_ip = "127.0.0.1"
+        peer.start()
+        targets.append(peer)
+    # Half as many again that refuse the connection
+    addresses = [("127.0.0.1", base + i) for i in range(args.peers + args.peers // 2)]
+
+    for max_dials in (len(addresses), 8):
+        port = find_available_port(base + len(addresses), base + len(addresses) + 1000)
+        peer = Peer("d", port, host="127.0.0.1", transport="selector",
+                    max_connections=1000, max_dials=max_dials)
+        peer.local_ip = "127.0.0.1"
+        peer.start()
+        threads = threading.active_count()
+        peak = [threads]
+        sampling = True
+
+        def sample():
+            while sampling:
+                peak[0] = max(peak[0], threading.active_count())
+                time.sleep(0.001)
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        start = time.perf_counter()
+        result = peer.connect_many(addresses)
+        elapsed = time.perf_counter() - start
+        sampling = False
+        sampler.join()
+
+        _report(f"dial max_dials={max_dials} addresses={len(addresses)}", [
+            ("connected", f"{sum(result.values())} / {args.peers}"),
+            ("time", f"{elapsed * 1000:.0f} ms"),
+            ("extra threads (peak)", peak[0] - threads - 1),
+        ])
+        peer.stop()
+        time.sleep(0.5)
+
+    for peer in targets:
+        peer.stop()
+
+
+def _wait_connections(peer, count: int, start: float, timeout: float = 10.0) -> Optional[float]:
+    # seconds from `start` until the peer has `count` links
+    while time.perf_counter() - start < timeout:
+        if len(peer.connections) >= count:
+            return time.perf_counter() - start
+        time.sleep(0.0005)
+    return None
+
+
+def bench_warmstart(args):
+    """Restart sampai terkoneksi lagi: tanpa cache (dial manual 1 seed) vs cache peer"""
+    nodes = max(args.peers // 5, 6)
+    active = 4
+    network = []
+    base = args.port
+    for i in range(nodes):
+        peer = Peer(f"n{i}", base + i, host="127.0.0.1", transport="selector",
+                    max_connections=active, shuffle_interval=0.5)
+        peer.local_ip = "127.0.0.1"
+        peer.start()
+        if network:
+            peer.connect_to_peer("127.0.0.1", base)
+        network.append(peer)
+    time.sleep(2.0)
+
+    path = os.path.join(tempfile.mkdtemp(), "peers.json")
+    port = base + nodes
+    # First run fills the cache
+    first = Peer("w", port, host="127.0.0.1", transport="selector", max_connections=active,
+                 shuffle_interval=0.5, peer_cache_path=path)
+    first.local_ip = "127.0.0.1"
+    first.start()
+    first.connect_to_peer("127.0.0.1", base)
+    time.sleep(3.0)
+    first.stop()
+    with open(path) as f:
+        cached = len(json.load(f)["peers"])
+
+    for mode in ("manual", "cache"):
+        time.sleep(1.0)
+        peer = Peer("w", port, host="127.0.0.1", transport="selector", max_connections=active,
+                    shuffle_interval=0.5, peer_cache_path=path if mode == "cache" else None)
+        peer.local_ip = "127.0.0.1"
+        start = time.perf_counter()
+        peer.start()
+        started = time.perf_counter() - start
+        if mode == "manual":
+            peer.connect_to_peer("127.0.0.1", base)
+        first_link = _wait_connections(peer, 1, start)
+        time.sleep(max(1.0 - (time.perf_counter() - start), 0))
+        settled = len(peer.connections)
+
+        _report(f"warmstart {mode} nodes={nodes} cached={cached}", [
+            ("start()", f"{started * 1000:.1f} ms"),
+            ("first connected peer", f"{first_link * 1000:.1f} ms" if first_link is not None else "-"),
+            ("connections after 1 s", f"{settled} / {active}"),
+        ])
+        peer.stop()
+
+    for peer in network:
+        peer.stop()
+
+
+class _RttPeer(Peer):
+    # Peer yang mencatat RTT setiap PONG
+    samples = None
+
+    def _handle_pong(self, message, handler):
+        ts = message.data.get("ts") if isinstance(message.data, dict) else None
+        if self.samples is not None and isinstance(ts, int):
+            self.samples.append((now_us() - ts) / 1000)
+        super()._handle_pong(message, handler)
+
+
+class _UiLoop:
+    # Event loop satu thread seperti Tk: after(ms, fn) boleh dipanggil dari
+    # thread lain, callback dijalankan berurutan di thread loop
+    def __init__(self):
+        self._timers = []
+        self._seq = 0
+        self._cond = threading.Condition()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def after(self, ms: int, fn):
+        with self._cond:
+            self._seq += 1
+            heapq.heappush(self._timers, (time.perf_counter() + ms / 1000, self._seq, fn))
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self.running = False
+            self._cond.notify()
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self.running and (not self._timers or self._timers[0][0] > time.perf_counter()):
+                    timeout = self._timers[0][0] - time.perf_counter() if self._timers else None
+                    self._cond.wait(timeout)
+                if not self.running:
+                    return
+                _, _, fn = heapq.heappop(self._timers)
+            fn()
+
+
+def _spin(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def _median_ms(func, repeat: int = 5) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def bench_search(args):
+    """Pencarian riwayat: LIKE scan vs index FTS5 (bm25, filter peer/waktu)"""
+    count = args.nodes * 1000
+    rng = random.Random(1)
+    # Zipf-like vocabulary, short words most frequent like real chat text
+    vocab = sorted({
+        "".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(2, 10)))
+        for _ in range(30000)
+    }, key=len)
+    weights = [1 / (rank + 1) for rank in range(len(vocab))]
+    sentences = [" ".join(rng.choices(vocab, weights, k=rng.randint(3, 15))) for _ in range(20011)]
+
+    def share(word):
+        found = sum(word in sentence.split() for sentence in sentences)
+        return f"{found / len(sentences):.2%} of messages"
+
+    common, mid, rare = vocab[0], vocab[300], vocab[10000]
+    queries = [
+        (f"common word ({share(common)})", {"query": common}),
+        (f"mid word ({share(mid)})", {"query": mid}),
+        (f"rare word ({share(rare)})", {"query": rare}),
+        ("no match", {"query": "zzzzzzzzzzzz"}),
+        ("two words", {"query": f"{common} {mid}"}),
+        ("prefix (3 letters)", {"query": mid[:3]}),
+        ("mid word, one peer", {"query": mid, "peer_id": "peer3"}),
+        ("mid word, newest 10%", {"query": mid, "since": count - count // 10}),
+        ("mid word, oldest 10%", {"query": mid, "until": count // 10}),
+        ("common word, page 10", {"query": common, "offset": 180}),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.db")
+        history = History(path, batch_size=4096)
+        start = time.perf_counter()
+        for i in range(count):
+            history.append(f"peer{i % 50}", "alice", sentences[i % len(sentences)], i)
+        history.flush()
+        write_time = time.perf_counter() - start
+        history.close()
+        history = History(path)
+
+        for mode in ("like", "fts5"):
+            history.searchable = mode == "fts5"
+            repeat = 5 if mode == "fts5" else 1
+            rows = [("messages indexed by batch writer", f"{count / write_time / 1000:.0f} k msg/s")] \
+                if mode == "fts5" else []
+            for label, params in queries:
+                found = []
+                elapsed = _median_ms(lambda: found.append(len(history.search(**params))), repeat)
+                rows.append((label, f"{elapsed:.1f} ms ({found[-1]} results)"))
+            _report(f"search {mode} messages={count}", rows)
+        history.close()
+
+
+def bench_history(args):
+    """Riwayat chat: list dict di memori vs History SQLite (tulis batch, baca per halaman)"""
+    count = args.nodes * 1000
+    text = "x" * min(args.payload, 64)
+
+    tracemalloc.start()
+    chat_history = {}
+    for i in range(count):
+        chat_history.setdefault(f"peer{i % 10}", []).append(
+            {"sender": "alice", "text": text, "timestamp": i, "is_own": False}
+        )
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    _report(f"history in-memory messages={count}", [
+        ("resident (python objects)", f"{memory / 1e6:.0f} MB, lost on exit"),
+    ])
+    del chat_history
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.db")
+        history = History(path)
+        start = time.perf_counter()
+        for i in range(count):
+            history.append(f"peer{i % 10}", "alice", text, i)
+        append_time = time.perf_counter() - start
+        history.flush()
+        total_time = time.perf_counter() - start
+        history.close()
+
+        history = History(path)
+        tracemalloc.start()
+        start = time.perf_counter()
+        page = history.page("peer3", limit=100)
+        open_time = time.perf_counter() - start
+        start = time.perf_counter()
+        older = history.page("peer3", before=page[0]["id"], limit=100)
+        older_time = time.perf_counter() - start
+        memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        history.close()
+        size = sum(os.path.getsize(f) for f in (path, path + "-wal") if os.path.exists(f))
+
+        _report(f"history sqlite-wal messages={count}", [
+            ("append (UI thread)", f"{count / append_time / 1000:.0f} k msg/s"),
+            ("written by batch writer", f"{count / total_time / 1000:.0f} k msg/s"),
+            ("open conversation (newest 100)", f"{open_time * 1000:.2f} ms"),
+            ("previous page", f"{older_time * 1000:.2f} ms ({len(older)} messages)"),
+            ("peak memory while paging", f"{memory / 1e3:.0f} KB"),
+            ("file size", f"{size / 1e6:.0f} MB"),
+        ])
+
+
+def bench_pump(args):
+    """Banjir 10k pesan/detik ke GUI: after(0) per pesan vs EventPump 16 ms"""
+    rate, duration = 10000, 2.0
+    # Per message: store + append to the chat view; per update: render + sidebar
+    per_event, redraw = 0.000005, 0.001
+    for mode in ("after", "pump"):
+        loop = _UiLoop()
+        latency = []
+
+        def handle_one(posted):
+            latency.append(time.perf_counter() - posted)
+            _spin(per_event + redraw)
+
+        def handle_batch(events):
+            for _ in events:
+                _spin(per_event)
+            _spin(redraw)
+
+        pump = EventPump(loop.after, handle_batch, window=rate * 4)
+        if mode == "pump":
+            pump.start()
+
+        # A click or keypress every frame, measured until it runs
+        probes = []
+        stop = threading.Event()
+
+        def probe():
+            while not stop.is_set():
+                posted = time.perf_counter()
+                loop.after(0, lambda posted=posted: probes.append(time.perf_counter() - posted))
+                time.sleep(0.016)
+
+        prober = threading.Thread(target=probe)
+        prober.start()
+        start = time.perf_counter()
+        for i in range(int(rate * duration)):
+            # Paced like a socket thread delivering `rate` messages per second
+            while time.perf_counter() < start + i / rate:
+                time.sleep(0.0005)
+            if mode == "pump":
+                pump.post("message", i)
+            else:
+                posted = time.perf_counter()
+                loop.after(0, lambda posted=posted: handle_one(posted))
+        flooded = time.perf_counter() - start
+        # Let the backlog drain (bounded, the per-message mode may never catch up)
+        deadline = time.perf_counter() + 5.0
+        while time.perf_counter() < deadline:
+            done = pump.counters["events"] if mode == "pump" else len(latency)
+            if done >= rate * duration:
+                break
+            time.sleep(0.01)
+        stop.set()
+        prober.join()
+        pump.stop()
+        loop.stop()
+
+        if mode == "pump":
+            stats = pump.stats()
+            event_p50, event_p99 = stats["latency_ms"]["p50"], stats["latency_ms"]["p99"]
+            frame = f"{stats['frame_ms']['p50']:.1f} / {stats['frame_ms']['p99']:.1f} ms"
+            updates = stats["frames"]
+        else:
+            latency.sort()
+            event_p50 = latency[len(latency) // 2] * 1000 if latency else float("nan")
+            event_p99 = latency[int(len(latency) * 0.99)] * 1000 if latency else float("nan")
+            frame = f"{(per_event + redraw) * 1000:.1f} ms per message"
+            updates = len(latency)
+        probes.sort()
+        _report(f"pump {mode} rate={rate}/s duration={duration:.0f}s", [
+            ("messages posted", f"{int(rate * duration)} in {flooded:.2f} s"),
+            ("messages handled", pump.counters["events"] if mode == "pump" else len(latency)),
+            ("UI updates (redraws)", updates),
+            ("frame time p50 / p99", frame),
+            ("message latency p50 / p99", f"{event_p50:.1f} / {event_p99:.1f} ms"),
+            ("input latency p50 / p99", f"{probes[len(probes) // 2] * 1000:.1f} / {probes[int(len(probes) * 0.99)] * 1000:.1f} ms" if probes else "-"),
+        ])
+
+
+def bench_priority(args):
+    """RTT ping selama transfer chat besar: frame utuh (length) vs lane + fragment (chunked)"""
+    size = max(args.payload, 4 * 1024 * 1024)
+    supported = list(framing.SUPPORTED_FRAMINGS)
+    for mode in ("length", "chunked"):
+        # Offering only "length" makes both sides skip fragmentation
+        framing.SUPPORTED_FRAMINGS[:] = [name for name in supported if name != "chunked" or mode == "chunked"]
+        port = find_available_port(args.port, args.port + 1000)
+        a = _RttPeer("a", port, host="127.0.0.1", transport="selector")
+        b = Peer("b", port + 1, host="127.0.0.1", transport="selector")
+        for peer in (a, b):
+            peer.local_ip = "127.0.0.1"
+            peer.start()
+        a.connect_to_peer("127.0.0.1", b.port)
+        _wait_link(a, b, None)
+        handler = a.connections[b.peer_id]
+
+        def measure(duration):
+            a.samples = []
+            end = time.perf_counter() + duration
+            while time.perf_counter() < end:
+                handler.send(Message(
+                    msg_type=MessageType.PING, sender_id=a.peer_id,
+                    sender_name=a.name, data={"ts": now_us()}
+                ))
+                time.sleep(0.01)
+            time.sleep(0.5)
+            samples, a.samples = sorted(a.samples), None
+            return samples
+
+        # First samples still overlap the handshake and member sync
+        measure(0.5)
+        idle = measure(1.0)
+        delivered = [0]
+        b.on_message = lambda *_: delivered.__setitem__(0, delivered[0] + 1)
+        text = "x" * size
+        stop = threading.Event()
+
+        def bulk():
+            while not stop.is_set():
+                if handler.queue_depth < 4:
+                    a.send_message(text, target_peer_id=b.peer_id)
+                else:
+                    time.sleep(0.001)
+
+        sender = threading.Thread(target=bulk)
+        sender.start()
+        time.sleep(0.3)
+        busy = measure(2.0)
+        stop.set()
+        sender.join()
+
+        def pct(samples, q):
+            return samples[min(int(len(samples) * q), len(samples) - 1)] if samples else float("nan")
+
+        _report(f"priority framing={handler.framing.name} payload={size >> 10} KB", [
+            ("ping idle p50 / p99", f"{pct(idle, 0.5):.2f} / {pct(idle, 0.99):.2f} ms"),
+            ("ping during transfer p50 / p99", f"{pct(busy, 0.5):.1f} / {pct(busy, 0.99):.1f} ms"),
+            ("pongs during transfer", len(busy)),
+            ("chat messages delivered", delivered[0]),
+        ])
+        a.stop()
+        b.stop()
+        args.port = port + 2
+    framing.SUPPORTED_FRAMINGS[:] = supported
+
+
+def bench_discovery(args):
+    """Pembentukan mesh di LAN: connect manual ke satu seed vs discovery multicast"""
+    nodes = max(args.peers // 2, 10)
+    for mode in ("manual", "discovery"):
+        base = find_available_port(args.port, args.port + 1000)
+        peers = []
+        start = time.perf_counter()
+        for i in range(nodes):
+            peer = Peer(f"n{i}", base + i, host="127.0.0.1", transport="selector",
+                        max_connections=4, discovery=mode == "discovery",
+                        discovery_port=base + nodes)
+            peer.local_ip = "127.0.0.1"
+            peer.start()
+            if mode == "manual" and peers:
+                peer.connect_to_peer("127.0.0.1", base)
+            peers.append(peer)
+        started = time.perf_counter() - start
+
+        mesh = None
+        while time.perf_counter() - start < 10.0:
+            if all(len(peer.get_routes()) == nodes - 1 for peer in peers):
+                mesh = time.perf_counter() - start
+                break
+            time.sleep(0.001)
+
+        announcements = sum(peer.discovery.stats["sent"] for peer in peers) if mode == "discovery" else 0
+        _report(f"discovery {mode} nodes={nodes}", [
+            ("start all nodes", f"{started * 1000:.0f} ms"),
+            ("every node reaches every node", f"{mesh * 1000:.0f} ms" if mesh is not None else "-"),
+            ("announcements per node", f"{announcements / nodes:.1f}"),
+        ])
+        for peer in peers:
+            peer.stop()
+        time.sleep(1.0)
+        args.port = base + nodes + 1
+
+
+def bench_membership(args):
+    """Koneksi dan handshake per node: active view tak terbatas vs terbatas"""
+    for active in (args.peers, 5):
+        _CountingPeer.joins = 0
+        peers = []
+        rng = random.Random(1)
+        base = args.port
+        start = time.perf_counter()
+        for i in range(args.peers):
+            peer = _CountingPeer(
+                f"n{i}", base + i, host="127.0.0.1", transport="selector",
+                max_connections=active, passive_view_size=30, shuffle_interval=1.0
+            )
+            peer.local_ip = "127.0.0.1"
+            peer.start()
+            if peers:
+                peer.connect_to_peer("127.0.0.1", base + rng.randrange(i))
+            peers.append(peer)
+            time.sleep(0.02)
+        time.sleep(3.0)
+        elapsed = time.perf_counter() - start
+
+        degrees = [len(peer.connections) for peer in peers]
+        passive = [len(peer.view.passive) for peer in peers]
+        reachable = [len(peer.get_routes()) for peer in peers]
+        _report(f"membership max_connections={active} peers={args.peers}", [
+            ("connections per node (avg/max)", f"{sum(degrees) / len(degrees):.1f} / {max(degrees)}"),
+            ("passive view per node (avg)", f"{sum(passive) / len(passive):.1f}"),
+            ("JOIN handshakes per node", f"{_CountingPeer.joins / args.peers:.1f}"),
+            ("peers reachable (min)", f"{min(reachable)} / {args.peers - 1}"),
+            ("threads", threading.active_count()),
+            ("setup time", f"{elapsed:.1f} s"),
+        ])
+        for peer in peers:
+            peer.stop()
+        time.sleep(1.0)
+        args.port += args.peers
+
+
+BENCHMARKS = {
+    "search": bench_search,
+    "history": bench_history,
+    "pump": bench_pump,
+    "priority": bench_priority,
+    "discovery": bench_discovery,
+    "warmstart": bench_warmstart,
+    "dial": bench_dial,
+    "members": bench_members,
+    "reconnect": bench_reconnect,
+    "outbox": bench_outbox,
+    "reliability": bench_reliability,
+    "gossip": bench_gossip,
+    "membership": bench_membership,
+    "routing": bench_routing,
+    "relay": bench_relay,
+    "alias": bench_alias,
+    "codec": bench_codec,
+    "message": bench_message,
+    "broadcast": bench_broadcast,
+    "transport": bench_transport,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="P2P Messaging benchmarks")
+    parser.add_argument("name", choices=sorted(BENCHMARKS) + ["all"])
+    parser.add_argument("--connections", type=int, default=500)
+    parser.add_argument("--idle", type=float, default=3.0)
+    parser.add_argument("--port", type=int, default=7000)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--payload", type=int, default=1024)
+    parser.add_argument("--nodes", type=int, default=1000)
+    parser.add_argument("--peers", type=int, default=50)
+    args = parser.parse_args()
+
+    names = sorted(BENCHMARKS) if args.name == "all" else [args.name]
+    for name in names:
+        BENCHMARKS[name](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,24 @@
 import customtkinter as ctk
 from tkinter import messagebox
+import os
+import sqlite3
 import threading
 import logging
-from datetime import datetime
-from typing import Optional
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 from p2p_messaging import Peer
+from p2p_messaging.events import EventPump
+from p2p_messaging.history import History
+from p2p_messaging.utils import now_us, format_timestamp, load_identity
 
 logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
 
+# Full comparison of the sidebar with Peer.get_connected_peers()
+PEER_SYNC_INTERVAL_MS = 5000
+
 
 class LoginWindow(ctk.CTkToplevel):
     def __init__(self, parent, callback):
@@ -126,9 +134,11 @@ class LoginWindow(ctk.CTkToplevel):
 
 
 class ConnectDialog(ctk.CTkToplevel):
-    def __init__(self, parent, callback):
+    def __init__(self, parent, callback, address: Optional[Tuple[str, int]] = None):
         super().__init__(parent)
         self.callback = callback
+        # alamat awal di form (peer terakhir yang berhasil), None = kosong
+        self.address = address
         
         self.title("Hubungkan ke Peer")
         self.geometry("400x300")
@@ -162,7 +172,6 @@ class ConnectDialog(ctk.CTkToplevel):
         ctk.CTkLabel(ip_frame, text="Alamat IP:", width=80, anchor="w").pack(side="left")
         self.ip_entry = ctk.CTkEntry(ip_frame, placeholder_text="192.168.43.60")
         self.ip_entry.pack(side="left", fill="x", expand=True, padx=(10, 0))
-        self.ip_entry.insert(0, "192.168.43.60")
         
         port_frame = ctk.CTkFrame(container, fg_color="transparent")
         port_frame.pack(fill="x", pady=5)
@@ -170,6 +179,9 @@ class ConnectDialog(ctk.CTkToplevel):
         ctk.CTkLabel(port_frame, text="Port:", width=80, anchor="w").pack(side="left")
         self.port_entry = ctk.CTkEntry(port_frame, placeholder_text="5000")
         self.port_entry.pack(side="left", fill="x", expand=True, padx=(10, 0))
+        if self.address:
+            self.ip_entry.insert(0, self.address[0])
+            self.port_entry.insert(0, str(self.address[1]))
         
         btn_frame = ctk.CTkFrame(container, fg_color="transparent")
         btn_frame.pack(fill="x", pady=(20, 0))
@@ -209,55 +221,773 @@ class ConnectDialog(ctk.CTkToplevel):
         self.destroy()
 
 
+class SearchDialog(ctk.CTkToplevel):
+    # Hasil pencarian riwayat, PAGE_SIZE per halaman; klik hasil membuka
+    # percakapannya di sekitar pesan itu. Tidak modal, chat tetap bisa dipakai.
+    PAGE_SIZE = 20
+    RANGES = {
+        "Kapan saja": None,
+        "24 jam terakhir": 24 * 3600,
+        "7 hari terakhir": 7 * 24 * 3600,
+        "30 hari terakhir": 30 * 24 * 3600,
+    }
+    
+    def __init__(self, parent, history: History, name_of: Callable[[str], str], callback,
+                 query: str = "", peer_id: Optional[str] = None):
+        super().__init__(parent)
+        self.history = history
+        self.name_of = name_of      # identity -> nama, untuk pesan milik sendiri
+        self.callback = callback    # callback(hasil) saat hasil diklik
+        self.peer_id = peer_id      # percakapan aktif, untuk filter "hanya peer ini"
+        self.results = []
+        self._rows = []
+        self._params = None
+        
+        self.title("Cari Pesan")
+        self.geometry("480x520")
+        self.resizable(True, True)
+        self.minsize(400, 350)
+        
+        self.update_idletasks()
+        x = (self.winfo_screenwidth() // 2) - (480 // 2)
+        y = (self.winfo_screenheight() // 2) - (520 // 2)
+        self.geometry(f"480x520+{x}+{y}")
+        
+        self.transient(parent)
+        
+        self._create_widgets()
+        if query:
+            self.query_entry.insert(0, query)
+            self._on_search()
+    
+    def _create_widgets(self):
+        container = ctk.CTkFrame(self, fg_color="transparent")
+        container.pack(fill="both", expand=True, padx=20, pady=20)
+        
+        query_frame = ctk.CTkFrame(container, fg_color="transparent")
+        query_frame.pack(fill="x")
+        
+        self.query_entry = ctk.CTkEntry(query_frame, placeholder_text="Cari pesan...")
+        self.query_entry.pack(side="left", fill="x", expand=True, padx=(0, 10))
+        self.query_entry.bind("<Return>", lambda e: self._on_search())
+        
+        ctk.CTkButton(
+            query_frame,
+            text="Cari",
+            width=80,
+            command=self._on_search
+        ).pack(side="right")
+        
+        filter_frame = ctk.CTkFrame(container, fg_color="transparent")
+        filter_frame.pack(fill="x", pady=(10, 0))
+        
+        scopes = ["Semua peer"]
+        if self.peer_id:
+            scopes.append(f"Hanya {self.name_of(self.peer_id)}")
+        self.scope_menu = ctk.CTkOptionMenu(
+            filter_frame,
+            values=scopes,
+            command=lambda choice: self._on_search()
+        )
+        self.scope_menu.pack(side="left")
+        
+        self.range_menu = ctk.CTkOptionMenu(
+            filter_frame,
+            values=list(self.RANGES),
+            command=lambda choice: self._on_search()
+        )
+        self.range_menu.pack(side="right")
+        
+        self.status_label = ctk.CTkLabel(
+            container,
+            text="",
+            font=ctk.CTkFont(size=11),
+            text_color="gray"
+        )
+        self.status_label.pack(anchor="w", pady=(10, 0))
+        
+        self.results_frame = ctk.CTkScrollableFrame(container)
+        self.results_frame.pack(fill="both", expand=True, pady=(5, 0))
+        
+        self.more_btn = ctk.CTkButton(
+            container,
+            text="Muat lebih banyak",
+            height=30,
+            fg_color="gray",
+            command=self._load_more
+        )
+        
+        self.query_entry.focus()
+    
+    def _on_search(self):
+        query = self.query_entry.get().strip()
+        for row in self._rows:
+            row.destroy()
+        self._rows = []
+        self.results = []
+        if not query:
+            self._params = None
+            self.status_label.configure(text="")
+            self.more_btn.pack_forget()
+            return
+        
+        seconds = self.RANGES[self.range_menu.get()]
+        self._params = {
+            "query": query,
+            "peer_id": self.peer_id if self.scope_menu.get() != "Semua peer" else None,
+            "since": now_us() - seconds * 1_000_000 if seconds else None,
+        }
+        self._load_more()
+    
+    def _load_more(self):
+        # halaman hasil berikutnya di bawah yang sudah ada
+        if self._params is None:
+            return
+        page = self.history.search(limit=self.PAGE_SIZE, offset=len(self.results), **self._params)
+        self.results.extend(page)
+        for result in page:
+            self._add_row(result)
+        
+        if not self.results:
+            self.status_label.configure(text="Tidak ada pesan yang cocok")
+        else:
+            self.status_label.configure(text=f"{len(self.results)} hasil, paling relevan dulu")
+        if len(page) == self.PAGE_SIZE:
+            self.more_btn.pack(fill="x", pady=(10, 0))
+        else:
+            self.more_btn.pack_forget()
+    
+    def _add_row(self, result: dict):
+        if result["is_own"]:
+            peer_name = self.name_of(result["peer_id"])
+            sender = f"{result['sender']} → {peer_name}"
+        else:
+            sender = result["sender"]
+        snippet = " ".join(result["snippet"].split())
+        row = ctk.CTkButton(
+            self.results_frame,
+            text=f"{sender} · {format_timestamp(result['timestamp'], '%d/%m/%Y %H:%M')}\n{snippet}",
+            anchor="w",
+            fg_color="transparent",
+            hover_color=("gray80", "gray30"),
+            text_color=("gray10", "gray90"),
+            command=lambda: self.callback(result)
+        )
+        row.pack(fill="x", pady=2)
+        self._rows.append(row)
+
+
+def _event_inside(event, widget) -> bool:
+    # event mouse wheel (bind_all) berasal dari widget ini atau anaknya
+    path = str(widget)
+    source = str(event.widget)
+    return source == path or source.startswith(path + ".")
+
+
+def _wheel_direction(event) -> int:
+    # -1 ke atas, 1 ke bawah (Windows/macOS: delta, Linux: Button-4/5)
+    return -1 if event.num == 4 or event.delta > 0 else 1
+
+
 class MessageBubble(ctk.CTkFrame):
-    def __init__(self, parent, sender: str, message: str, timestamp: str, is_own: bool = False, is_system: bool = False):
+    # Satu baris chat. ChatView memakai ulang bubble untuk pesan lain lewat
+    # show(), jadi widget dan font hanya dibuat sekali.
+    def __init__(self, parent, fonts: dict):
         super().__init__(parent, fg_color="transparent")
         
-        self.pack(fill="x", padx=10, pady=3)
+        self.sys_label = ctk.CTkLabel(
+            self,
+            text="",
+            font=fonts["system"],
+            text_color="#888888"
+        )
+        
+        self.bubble_frame = ctk.CTkFrame(self)
+        
+        self.sender_label = ctk.CTkLabel(
+            self.bubble_frame,
+            text="",
+            font=fonts["sender"],
+            text_color="#4da6ff"
+        )
+        
+        self.msg_label = ctk.CTkLabel(
+            self.bubble_frame,
+            text="",
+            font=fonts["message"],
+            wraplength=300,
+            justify="left"
+        )
+        
+        self.time_label = ctk.CTkLabel(
+            self.bubble_frame,
+            text="",
+            font=fonts["time"],
+            text_color="#888888"
+        )
+    
+    def show(self, sender: str, message: str, timestamp: str, is_own: bool = False, is_system: bool = False):
+        for widget in (self.sys_label, self.bubble_frame, self.sender_label, self.msg_label, self.time_label):
+            widget.pack_forget()
         
         if is_system:
-            sys_label = ctk.CTkLabel(
-                self,
-                text=f"── {message} ──",
-                font=ctk.CTkFont(size=11, slant="italic"),
-                text_color="#888888"
+            self.sys_label.configure(text=f"── {message} ──")
+            self.sys_label.pack(pady=5)
+            return
+        
+        if is_own:
+            self.bubble_frame.configure(fg_color="#1f6aa5")
+            self.bubble_frame.pack(anchor="e", padx=(60, 10))
+        else:
+            self.bubble_frame.configure(fg_color="#2b2b2b")
+            self.bubble_frame.pack(anchor="w", padx=(10, 60))
+        
+        if not is_own:
+            self.sender_label.configure(text=sender)
+            self.sender_label.pack(anchor="w", padx=12, pady=(8, 0))
+        
+        self.msg_label.configure(text=message)
+        self.msg_label.pack(anchor="w", padx=12, pady=(4 if not is_own else 10, 4))
+        
+        self.time_label.configure(text=timestamp)
+        self.time_label.pack(anchor="e", padx=12, pady=(0, 6))
+
+
+class ChatView(ctk.CTkFrame):
+    # Daftar chat yang di-virtualisasi: hanya pesan di layar (plus MARGIN
+    # piksel di atas dan bawah) yang punya MessageBubble, bubble yang keluar
+    # layar dipakai ulang. Posisi scroll disimpan sebagai index pesan teratas
+    # plus offset piksel, jadi pesan baru dan scroll tidak bergantung pada
+    # panjang riwayat. Dengan loader older/newer hanya paling banyak
+    # MAX_ITEMS pesan yang dimuat; halaman berikutnya diambil saat scroll
+    # mendekati ujung dan ujung yang lain dibuang.
+    MARGIN = 200
+    GAP = 6
+    WHEEL_STEP = 40
+    PAGE = 100
+    PREFETCH = 20
+    MAX_ITEMS = 1000
+    
+    def __init__(self, parent, welcome: str):
+        super().__init__(parent)
+        
+        self.fonts = {
+            "system": ctk.CTkFont(size=11, slant="italic"),
+            "sender": ctk.CTkFont(size=11, weight="bold"),
+            "message": ctk.CTkFont(size=13),
+            "time": ctk.CTkFont(size=9),
+        }
+        
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y", padx=(0, 3), pady=3)
+        
+        self.canvas = ctk.CTkCanvas(
+            self,
+            highlightthickness=0,
+            bg=self._apply_appearance_mode(self.cget("fg_color"))
+        )
+        self.canvas.pack(side="left", fill="both", expand=True, padx=(3, 0), pady=3)
+        
+        self.welcome_label = ctk.CTkLabel(
+            self.canvas,
+            text=welcome,
+            font=ctk.CTkFont(size=14),
+            text_color="gray"
+        )
+        self._welcome_item = self.canvas.create_window(0, 50, window=self.welcome_label, anchor="n")
+        
+        self.items = []             # pesan yang dimuat (dict dari History, atau pesan sistem)
+        self._older = None          # older(id pertama, limit) -> pesan sebelumnya
+        self._newer = None          # newer(id terakhir, limit) -> pesan sesudahnya
+        self._has_older = False
+        self._has_newer = False     # pesan terbaru belum dimuat
+        self._show_welcome = True
+        self._top = 0               # index pesan paling atas di layar
+        self._offset = 0            # piksel pesan teratas yang sudah lewat di atas layar
+        self._follow = True         # ikut ke pesan terbaru
+        self._heights = {}          # index -> tinggi bubble + GAP
+        self._bound = {}            # index -> MessageBubble
+        self._pool = []             # bubble yang sedang tidak dipakai
+        self._visible = 0
+        self._width = 1
+        self._view_height = 1
+        self._render_pending = False
+        
+        self.canvas.bind("<Configure>", self._on_configure)
+        self.bind_all("<MouseWheel>", self._on_wheel, add="+")
+        self.bind_all("<Button-4>", self._on_wheel, add="+")
+        self.bind_all("<Button-5>", self._on_wheel, add="+")
+    
+    def show(self, items, welcome: bool = False, older=None, newer=None, at: Optional[int] = None):
+        # ganti seluruh isi (misal pindah peer) dengan halaman terbaru,
+        # scroll ke pesan terakhir; dengan `at` items adalah halaman di
+        # sekitar pesan items[at] (misal hasil pencarian) yang ditampilkan
+        # sepertiga dari atas, pesan sesudahnya dimuat lewat newer
+        self.items = list(items)
+        self._show_welcome = welcome
+        self._older, self._newer = older, newer
+        self._has_older = older is not None and (at is not None or len(self.items) >= self.PAGE)
+        self._has_newer = at is not None and newer is not None
+        self._heights.clear()
+        for index in list(self._bound):
+            self._release(index)
+        self._follow = at is None
+        if at is not None:
+            # Negative offset: _normalize walks up from the message
+            self._top, self._offset = at, -(self._view_height // 3)
+        self._schedule_render()
+    
+    def append(self, item: dict):
+        # pesan baru di bawah; hanya dirender kalau view sedang di bawah
+        self._show_welcome = False
+        if self._has_newer:
+            # The newest page is not loaded, scrolling down fetches it
+            return
+        self.items.append(item)
+        if self._follow:
+            excess = len(self.items) - self.MAX_ITEMS
+            if excess >= self.PAGE:
+                self._drop_head(excess)
+            self._schedule_render()
+        else:
+            self._update_scrollbar()
+    
+    def _load_older(self) -> bool:
+        # muat halaman sebelum pesan pertama; return True kalau ada yang dimuat
+        first = next((item["id"] for item in self.items if "id" in item), None)
+        page = self._older(first, self.PAGE) if first is not None else []
+        if len(page) < self.PAGE:
+            self._has_older = False
+        if not page:
+            return False
+        self.items[:0] = page
+        self._heights = {index + len(page): height for index, height in self._heights.items()}
+        self._bound = {index + len(page): bubble for index, bubble in self._bound.items()}
+        self._top += len(page)
+        excess = len(self.items) - self.MAX_ITEMS
+        if excess > 0:
+            self._drop_tail(len(self.items) - excess)
+        return True
+    
+    def _load_newer(self) -> bool:
+        last = next((item["id"] for item in reversed(self.items) if "id" in item), None)
+        page = self._newer(last, self.PAGE) if last is not None else []
+        if len(page) < self.PAGE:
+            self._has_newer = False
+        if not page:
+            return False
+        self.items.extend(page)
+        excess = len(self.items) - self.MAX_ITEMS
+        if excess > 0:
+            self._drop_head(excess)
+        return True
+    
+    def _drop_head(self, count: int):
+        # buang `count` pesan teratas dari memori
+        for index in [index for index in self._bound if index < count]:
+            self._release(index)
+        del self.items[:count]
+        self._heights = {index - count: height for index, height in self._heights.items() if index >= count}
+        self._bound = {index - count: bubble for index, bubble in self._bound.items()}
+        self._top = max(self._top - count, 0)
+        self._has_older = self._older is not None
+    
+    def _drop_tail(self, keep: int):
+        # buang pesan mulai index `keep` dari memori
+        for index in [index for index in self._bound if index >= keep]:
+            self._release(index)
+        del self.items[keep:]
+        self._heights = {index: height for index, height in self._heights.items() if index < keep}
+        self._has_newer = self._newer is not None
+        self._follow = False
+    
+    def _schedule_render(self):
+        # beberapa pesan dalam satu giliran event loop cukup dirender sekali
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self._render)
+    
+    def _render(self):
+        self._render_pending = False
+        count = len(self.items)
+        self.canvas.itemconfigure(
+            self._welcome_item,
+            state="normal" if self._show_welcome and not count else "hidden"
+        )
+        if not count:
+            self._visible = 0
+            self._update_scrollbar()
+            return
+        
+        if self._follow:
+            self._top, self._offset = count - 1, self._height(count - 1) - self._view_height
+        self._clamp()
+        # Fetch the next page before the user reaches the end of the loaded ones
+        if self._has_older and self._top < self.PREFETCH:
+            self._load_older()
+        if self._has_newer and len(self.items) - self._top < self.PREFETCH:
+            self._load_newer()
+        count = len(self.items)
+        
+        # Walk up from the top message into the margin, then lay out downwards
+        first, y = self._top, -self._offset
+        while first > 0 and y > -self.MARGIN:
+            first -= 1
+            y -= self._height(first)
+        
+        placed = []
+        index = first
+        self._visible = 0
+        while index < count and y < self._view_height + self.MARGIN:
+            placed.append((index, y))
+            if 0 <= y < self._view_height:
+                self._visible += 1
+            y += self._height(index)
+            index += 1
+        
+        for bound in list(self._bound):
+            if not first <= bound < index:
+                self._release(bound)
+        for bound, y in placed:
+            bubble = self._acquire(bound)
+            self.canvas.coords(bubble.item, 0, y)
+            self.canvas.itemconfigure(bubble.item, state="normal")
+        self._update_scrollbar()
+    
+    def _clamp(self):
+        # offset dalam [0, tinggi pesan teratas); tidak bisa scroll melewati
+        # pesan terakhir, di posisi itu view ikut pesan baru lagi
+        self._normalize()
+        while True:
+            count = len(self.items)
+            y, index = -self._offset, self._top
+            while index < count and y < self._view_height:
+                y += self._height(index)
+                index += 1
+            if index < count or y > self._view_height:
+                return
+            if not (self._has_newer and self._load_newer()):
+                break
+        self._follow = True
+        self._top, self._offset = count - 1, self._height(count - 1) - self._view_height
+        self._normalize()
+    
+    def _normalize(self):
+        while self._offset < 0:
+            if self._top == 0 and not (self._has_older and self._load_older()):
+                break
+            self._top -= 1
+            self._offset += self._height(self._top)
+        self._offset = max(self._offset, 0)
+        count = len(self.items)
+        while self._top < count - 1 and self._offset >= self._height(self._top):
+            self._offset -= self._height(self._top)
+            self._top += 1
+    
+    def _height(self, index: int) -> int:
+        height = self._heights.get(index)
+        if height is None:
+            bubble = self._acquire(index)
+            bubble.update_idletasks()
+            height = self._heights[index] = bubble.winfo_reqheight() + self.GAP
+        return height
+    
+    def _acquire(self, index: int) -> MessageBubble:
+        # bubble untuk pesan index, dari pool kalau ada
+        bubble = self._bound.get(index)
+        if bubble is not None:
+            return bubble
+        if self._pool:
+            bubble = self._pool.pop()
+        else:
+            bubble = MessageBubble(self.canvas, self.fonts)
+            bubble.item = self.canvas.create_window(
+                0, 0, window=bubble, anchor="nw", width=self._width, state="hidden"
             )
-            sys_label.pack(pady=5)
+        item = self.items[index]
+        bubble.show(
+            item.get("sender", ""),
+            item["text"],
+            format_timestamp(item["timestamp"]) if "timestamp" in item else "",
+            is_own=item.get("is_own", False),
+            is_system=item.get("is_system", False)
+        )
+        self._bound[index] = bubble
+        return bubble
+    
+    def _release(self, index: int):
+        bubble = self._bound.pop(index)
+        self.canvas.itemconfigure(bubble.item, state="hidden")
+        self._pool.append(bubble)
+    
+    def _scroll(self, pixels: float):
+        if not self.items:
+            return
+        self._follow = False
+        self._offset += pixels
+        self._clamp()
+        self._render()
+    
+    def _update_scrollbar(self):
+        count = len(self.items)
+        if not count:
+            self.scrollbar.set(0.0, 1.0)
+            return
+        top = self._top + self._offset / self._heights.get(self._top, 1)
+        self.scrollbar.set(top / count, min((top + max(self._visible, 1)) / count, 1.0))
+    
+    def _on_scrollbar(self, action, amount, unit=None):
+        count = len(self.items)
+        if not count:
+            return
+        if action == "moveto":
+            position = min(max(float(amount), 0.0), 1.0) * count
+            self._follow = False
+            self._top = min(int(position), count - 1)
+            self._offset = int((position - self._top) * self._height(self._top))
+            self._clamp()
+            self._render()
+        elif action == "scroll":
+            step = self._view_height * 0.9 if unit == "pages" else self.WHEEL_STEP
+            self._scroll(float(amount) * step)
+    
+    def _on_wheel(self, event):
+        if _event_inside(event, self.canvas):
+            self._scroll(_wheel_direction(event) * self.WHEEL_STEP)
+    
+    def _set_appearance_mode(self, mode_string):
+        super()._set_appearance_mode(mode_string)
+        self.canvas.configure(bg=self._apply_appearance_mode(self.cget("fg_color")))
+    
+    def _on_configure(self, event):
+        self.canvas.coords(self._welcome_item, event.width // 2, 50)
+        if event.width != self._width:
+            self._width = event.width
+            for bubble in list(self._bound.values()) + self._pool:
+                self.canvas.itemconfigure(bubble.item, width=self._width)
+            # Message labels wrap at a fixed width, bubble heights stay valid
+        self._view_height = event.height
+        self._schedule_render()
+
+
+class PeerSidebar(ctk.CTkFrame):
+    # Daftar peer dengan key peer id: put()/remove() hanya mengubah baris
+    # yang berubah, select() hanya mengganti warna dua baris. Urutan nama
+    # dan index kata nama (untuk pencarian prefix) disimpan sebagai list
+    # terurut. Tinggi baris tetap, jadi hanya baris yang terlihat yang
+    # punya tombol; tombol dipakai ulang saat scroll.
+    ROW_HEIGHT = 40
+    ROW_GAP = 4
+    
+    def __init__(self, parent, on_select):
+        super().__init__(parent, fg_color="transparent")
+        self.on_select = on_select  # on_select(peer_id)
+        
+        self.search_entry = ctk.CTkEntry(self, placeholder_text="Cari peer...", height=30)
+        self.search_entry.pack(fill="x", padx=5, pady=(0, 5))
+        self.search_entry.bind("<KeyRelease>", lambda e: self.set_query(self.search_entry.get()))
+        
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        
+        self.canvas = ctk.CTkCanvas(
+            self,
+            highlightthickness=0,
+            # Transparent frame: the canvas takes the sidebar color
+            bg=self._apply_appearance_mode(self._bg_color)
+        )
+        self.canvas.pack(side="left", fill="both", expand=True)
+        
+        self.names: Dict[str, str] = {}             # peer_id -> nama
+        self._order: List[Tuple[str, str]] = []     # (nama casefold, peer_id) terurut
+        self._words: List[Tuple[str, str]] = []     # (kata nama, peer_id) terurut
+        self._query: List[str] = []
+        self._shown = self._order                   # hasil filter, sama dengan _order kalau tanpa query
+        self.selected: Optional[str] = None
+        self._scroll_y = 0
+        self._bound: Dict[str, ctk.CTkButton] = {}  # peer_id -> tombol
+        self._pool: List[ctk.CTkButton] = []
+        self._width = 1
+        self._view_height = 1
+        self._render_pending = False
+        
+        self.canvas.bind("<Configure>", self._on_configure)
+        self.bind_all("<MouseWheel>", self._on_wheel, add="+")
+        self.bind_all("<Button-4>", self._on_wheel, add="+")
+        self.bind_all("<Button-5>", self._on_wheel, add="+")
+    
+    def __len__(self) -> int:
+        return len(self.names)
+    
+    def put(self, peer_id: str, name: str):
+        # tambah peer, atau ganti namanya; tidak ada yang dirender ulang kalau sama
+        old = self.names.get(peer_id)
+        if old == name:
+            return
+        if old is not None:
+            self._unindex(peer_id, old)
+        self.names[peer_id] = name
+        key = (name.casefold(), peer_id)
+        insort(self._order, key)
+        for word in set(name.casefold().split()):
+            insort(self._words, (word, peer_id))
+        if self._shown is not self._order and self._matches(name):
+            insort(self._shown, key)
+        self._schedule_render()
+    
+    def remove(self, peer_id: str):
+        name = self.names.pop(peer_id, None)
+        if name is None:
+            return
+        self._unindex(peer_id, name)
+        if peer_id == self.selected:
+            self.selected = None
+        self._schedule_render()
+    
+    def sync(self, peers: Iterable[Tuple[str, str]]):
+        # samakan dengan daftar (peer_id, nama) lengkap; hanya selisihnya yang diterapkan
+        current = dict(peers)
+        for peer_id in [pid for pid in self.names if pid not in current]:
+            self.remove(peer_id)
+        for peer_id, name in current.items():
+            self.put(peer_id, name)
+    
+    def select(self, peer_id: Optional[str]):
+        old, self.selected = self.selected, peer_id
+        for pid in (old, peer_id):
+            button = self._bound.get(pid)
+            if button is not None:
+                self._style(button, pid)
+    
+    def set_query(self, text: str):
+        # filter prefix per kata: "al bo" cocok dengan "Alice Bob"
+        query = text.casefold().split()
+        if query == self._query:
+            return
+        self._query = query
+        if not query:
+            self._shown = self._order
         else:
-            bubble_frame = ctk.CTkFrame(self)
-            
-            if is_own:
-                bubble_frame.configure(fg_color="#1f6aa5")
-                bubble_frame.pack(anchor="e", padx=(50, 0))
-            else:
-                bubble_frame.configure(fg_color="#2b2b2b")
-                bubble_frame.pack(anchor="w", padx=(0, 50))
-            
-            if not is_own:
-                sender_label = ctk.CTkLabel(
-                    bubble_frame,
-                    text=sender,
-                    font=ctk.CTkFont(size=11, weight="bold"),
-                    text_color="#4da6ff"
-                )
-                sender_label.pack(anchor="w", padx=12, pady=(8, 0))
-            
-            msg_label = ctk.CTkLabel(
-                bubble_frame,
-                text=message,
-                font=ctk.CTkFont(size=13),
-                wraplength=300,
-                justify="left"
+            matches = None
+            for term in query:
+                found = set()
+                index = bisect_left(self._words, (term, ""))
+                while index < len(self._words) and self._words[index][0].startswith(term):
+                    found.add(self._words[index][1])
+                    index += 1
+                matches = found if matches is None else matches & found
+            self._shown = [key for key in self._order if key[1] in matches]
+        self._scroll_y = 0
+        self._schedule_render()
+    
+    def _matches(self, name: str) -> bool:
+        words = name.casefold().split()
+        return all(any(word.startswith(term) for word in words) for term in self._query)
+    
+    def _unindex(self, peer_id: str, name: str):
+        key = (name.casefold(), peer_id)
+        self._order.pop(bisect_left(self._order, key))
+        for word in set(name.casefold().split()):
+            self._words.pop(bisect_left(self._words, (word, peer_id)))
+        if self._shown is not self._order:
+            index = bisect_left(self._shown, key)
+            if index < len(self._shown) and self._shown[index] == key:
+                self._shown.pop(index)
+    
+    def _schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self._render)
+    
+    def _render(self):
+        self._render_pending = False
+        row = self.ROW_HEIGHT + self.ROW_GAP
+        total = len(self._shown) * row
+        self._scroll_y = max(min(self._scroll_y, total - self._view_height), 0)
+        first = self._scroll_y // row
+        last = min((self._scroll_y + self._view_height) // row + 1, len(self._shown))
+        visible = [peer_id for _, peer_id in self._shown[first:last]]
+        
+        keep = set(visible)
+        for peer_id in [pid for pid in self._bound if pid not in keep]:
+            button = self._bound.pop(peer_id)
+            self.canvas.itemconfigure(button.item, state="hidden")
+            self._pool.append(button)
+        
+        for offset, peer_id in enumerate(visible):
+            button = self._bound.get(peer_id)
+            if button is None:
+                button = self._acquire(peer_id)
+            elif button.cget("text") != f"● {self.names[peer_id]}":
+                button.configure(text=f"● {self.names[peer_id]}")
+            self.canvas.coords(button.item, 0, (first + offset) * row - self._scroll_y)
+            self.canvas.itemconfigure(button.item, state="normal")
+        
+        if total:
+            self.scrollbar.set(self._scroll_y / total, min((self._scroll_y + self._view_height) / total, 1.0))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+    
+    def _acquire(self, peer_id: str) -> ctk.CTkButton:
+        if self._pool:
+            button = self._pool.pop()
+        else:
+            button = ctk.CTkButton(
+                self.canvas,
+                text="",
+                height=self.ROW_HEIGHT,
+                anchor="w",
+                command=lambda: self.on_select(button.peer_id)
             )
-            msg_label.pack(anchor="w", padx=12, pady=(4 if not is_own else 10, 4))
-            
-            time_label = ctk.CTkLabel(
-                bubble_frame,
-                text=timestamp,
-                font=ctk.CTkFont(size=9),
-                text_color="#888888"
+            button.item = self.canvas.create_window(
+                0, 0, window=button, anchor="nw", width=self._width, state="hidden"
             )
-            time_label.pack(anchor="e", padx=12, pady=(0, 6))
+            button.selected = None
+        button.peer_id = peer_id
+        button.configure(text=f"● {self.names[peer_id]}")
+        self._style(button, peer_id)
+        self._bound[peer_id] = button
+        return button
+    
+    def _style(self, button: ctk.CTkButton, peer_id: str):
+        # warna baris terpilih, hanya di-configure kalau berubah
+        selected = peer_id == self.selected
+        if button.selected == selected:
+            return
+        button.selected = selected
+        button.configure(
+            fg_color=("#2a2a2a" if not selected else "#1f6aa5"),
+            hover_color=("#3a3a3a" if not selected else "#1a5490")
+        )
+    
+    def _scroll(self, pixels: float):
+        self._scroll_y = int(self._scroll_y + pixels)
+        self._render()
+    
+    def _on_scrollbar(self, action, amount, unit=None):
+        total = len(self._shown) * (self.ROW_HEIGHT + self.ROW_GAP)
+        if action == "moveto":
+            self._scroll_y = int(float(amount) * total)
+            self._render()
+        elif action == "scroll":
+            step = self._view_height * 0.9 if unit == "pages" else self.ROW_HEIGHT
+            self._scroll(float(amount) * step)
+    
+    def _on_wheel(self, event):
+        if _event_inside(event, self.canvas):
+            self._scroll(_wheel_direction(event) * self.ROW_HEIGHT)
+    
+    def _set_appearance_mode(self, mode_string):
+        super()._set_appearance_mode(mode_string)
+        self.canvas.configure(bg=self._apply_appearance_mode(self._bg_color))
+    
+    def _on_configure(self, event):
+        if event.width != self._width:
+            self._width = event.width
+            for button in list(self._bound.values()) + self._pool:
+                self.canvas.itemconfigure(button.item, width=self._width)
+        self._view_height = event.height
+        self._schedule_render()
 
 
 class P2PMessengerApp(ctk.CTk):
@@ -266,8 +996,12 @@ class P2PMessengerApp(ctk.CTk):
         
         self.peer: Optional[Peer] = None
         self.is_connected = False
-        self.active_peer_id = None
-        self.chat_history = {}  # peer_id: list of messages
+        self.active_peer_id = None  # peer tujuan kirim; None = percakapan hanya-baca
+        self.active_key = None      # identity percakapan yang ditampilkan
+        self.history: Optional[History] = None  # riwayat chat per identity, dibuka saat login
+        self.peer_names: Dict[str, str] = {}  # identity -> nama terakhir
+        # Peer callbacks run on network threads; the GUI applies them once per frame
+        self.events = EventPump(self.after, self._on_events)
         
         self.title("Pesan P2P")
         self.geometry("900x600")
@@ -344,8 +1078,8 @@ class P2PMessengerApp(ctk.CTk):
         )
         self.peers_count.pack(side="right")
         
-        self.peers_scroll = ctk.CTkScrollableFrame(self.sidebar, fg_color="transparent")
-        self.peers_scroll.pack(fill="both", expand=True, padx=5, pady=5)
+        self.peer_list = PeerSidebar(self.sidebar, on_select=self._select_peer)
+        self.peer_list.pack(fill="both", expand=True, padx=5, pady=5)
         
         info_frame = ctk.CTkFrame(self.sidebar, height=80)
         info_frame.pack(fill="x", side="bottom")
@@ -379,16 +1113,19 @@ class P2PMessengerApp(ctk.CTk):
         )
         self.chat_title.pack(side="left", padx=20, pady=10)
         
-        self.chat_frame = ctk.CTkScrollableFrame(self.content)
-        self.chat_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        self.search_entry = ctk.CTkEntry(
+            chat_header,
+            placeholder_text="🔍 Cari pesan...",
+            width=200
+        )
+        self.search_entry.pack(side="right", padx=10, pady=10)
+        self.search_entry.bind("<Return>", lambda e: self._show_search_dialog())
         
-        self.welcome_label = ctk.CTkLabel(
-            self.chat_frame,
-            text="👋 Selamat Datang di Pesan P2P!\n\nHubungkan ke peer lain untuk mulai chatting.",
-            font=ctk.CTkFont(size=14),
-            text_color="gray"
+        self.chat_view = ChatView(
+            self.content,
+            welcome="👋 Selamat Datang di Pesan P2P!\n\nHubungkan ke peer lain untuk mulai chatting."
         )
-        self.welcome_label.pack(expand=True, pady=50)
+        self.chat_view.pack(fill="both", expand=True, padx=10, pady=10)
         
         input_frame = ctk.CTkFrame(self.content, height=60, corner_radius=0)
         input_frame.pack(fill="x", side="bottom")
@@ -420,15 +1157,36 @@ class P2PMessengerApp(ctk.CTk):
             self.destroy()
             return
         
+        data_dir = os.path.join(os.path.expanduser("~"), ".p2p_messaging")
+        try:
+            os.makedirs(data_dir, exist_ok=True)
+            self.history = History(os.path.join(data_dir, f"history_{result['port']}.db"))
+        except (OSError, sqlite3.Error) as e:
+            logging.warning(f"Chat history not persisted: {e}")
+            self.history = History()
+        try:
+            identity = load_identity(os.path.join(data_dir, f"identity_{result['port']}"))
+        except OSError as e:
+            logging.warning(f"Identity not persisted, outbox only lasts this run: {e}")
+            identity = None
+        
         self.peer = Peer(
             name=result["name"],
             port=result["port"],
             on_message=self._on_message_received,
             on_peer_join=self._on_peer_join,
-            on_peer_leave=self._on_peer_leave
+            on_peer_leave=self._on_peer_leave,
+            # Peers from the last run are dialed again on start
+            peer_cache_path=os.path.join(data_dir, f"peers_{result['port']}.json"),
+            # Peers on the same LAN find each other without ConnectDialog
+            discovery=True,
+            # Undelivered messages survive a restart on either side
+            outbox_path=os.path.join(data_dir, f"outbox_{result['port']}.db"),
+            identity=identity
         )
         
         try:
+            self.events.start()
             self.peer.start()
             self.is_connected = True
             
@@ -439,6 +1197,7 @@ class P2PMessengerApp(ctk.CTk):
             
             # Enable send button
             self.send_btn.configure(state="normal")
+            self.after(PEER_SYNC_INTERVAL_MS, self._sync_peers)
             
             self.deiconify()
             
@@ -452,7 +1211,51 @@ class P2PMessengerApp(ctk.CTk):
     def _show_connect_dialog(self):
         if not self.peer:
             return
-        ConnectDialog(self, self._on_connect_peer)
+        # Prefill with the peer we last reached, the LAN ones come by discovery
+        latest = self.peer.peer_cache.latest() if self.peer.peer_cache else None
+        address = (latest["host"], latest["port"]) if latest else None
+        ConnectDialog(self, self._on_connect_peer, address)
+    
+    def _show_search_dialog(self):
+        if not self.history:
+            return
+        SearchDialog(
+            self,
+            self.history,
+            self._peer_name,
+            self._open_search_result,
+            query=self.search_entry.get().strip(),
+            peer_id=self.active_key
+        )
+        self.search_entry.delete(0, "end")
+    
+    def _open_search_result(self, result: dict):
+        # buka percakapan hasil pencarian di sekitar pesan yang ditemukan
+        key = result["peer_id"]
+        for peer_id in self.peer_list.names:
+            if self.peer.identity_of(peer_id) == key:
+                self._select_peer(peer_id, around=result["id"])
+                return
+        
+        # Nobody with this identity is connected (or the conversation is from
+        # an old run keyed by peer id): show it read-only instead of letting
+        # typed messages disappear into the outbox
+        self.active_peer_id = None
+        self.active_key = key
+        self.chat_title.configure(text=f"💬 Riwayat dengan {self._peer_name(key)} (offline)")
+        self._set_sending(False)
+        self.peer_list.select(None)
+        self._refresh_chat_display(result["id"])
+    
+    def _peer_name(self, key: str) -> str:
+        # nama untuk identity percakapan, juga yang sudah tidak terhubung
+        name = self.peer_names.get(key) or (self.history.peer_name(key) if self.history else None)
+        return name or key[:8]
+    
+    def _set_sending(self, enabled: bool):
+        state = "normal" if enabled else "disabled"
+        self.msg_entry.configure(state=state)
+        self.send_btn.configure(state=state)
     
     def _on_connect_peer(self, ip: str, port: int):
         if self.peer.connect_to_peer(ip, port):
@@ -471,138 +1274,133 @@ class P2PMessengerApp(ctk.CTk):
         # Send to specific peer
         self.peer.send_message(message, target_peer_id=self.active_peer_id)
         
-        timestamp = datetime.now().strftime("%H:%M")
+        # Store in chat history (raw timestamp, formatted when rendered)
+        self._store_message(self.active_peer_id, "Anda", message, now_us(), is_own=True)
         
-        # Store in chat history
-        if self.active_peer_id not in self.chat_history:
-            self.chat_history[self.active_peer_id] = []
-        
-        self.chat_history[self.active_peer_id].append({
-            "sender": "Anda",
+        self.msg_entry.delete(0, "end")
+    
+    def _store_message(self, peer_id: str, sender: str, text: str, timestamp: int, is_own: bool = False):
+        # simpan ke riwayat (ditulis thread writer) dengan identity peer,
+        # supaya percakapan tetap sama setelah peer restart; tampilkan hanya
+        # kalau percakapan ini sedang dibuka
+        key = self.peer.identity_of(peer_id)
+        if not is_own:
+            self.peer_names[key] = sender
+        entry = self.history.append(key, sender, text, timestamp, is_own)
+        if key == self.active_key:
+            self.chat_view.append(entry)
+    
+    def _add_message_bubble(self, sender: str, message: str, timestamp: int, is_own: bool = False):
+        self.chat_view.append({
+            "sender": sender,
             "text": message,
             "timestamp": timestamp,
-            "is_own": True
+            "is_own": is_own
         })
-        
-        # Refresh display
-        self._refresh_chat_display()
-        
-        self.msg_entry.delete(0, "end")
-    
-    def _add_message_bubble(self, sender: str, message: str, timestamp: str, is_own: bool = False):
-        if hasattr(self, 'welcome_label') and self.welcome_label.winfo_exists():
-            self.welcome_label.pack_forget()
-        
-        MessageBubble(self.chat_frame, sender, message, timestamp, is_own)
-        
-        self.chat_frame._parent_canvas.yview_moveto(1.0)
     
     def _add_system_message(self, message: str):
-        if hasattr(self, 'welcome_label') and self.welcome_label.winfo_exists():
-            self.welcome_label.pack_forget()
-        
-        MessageBubble(self.chat_frame, "", message, "", is_system=True)
-        self.chat_frame._parent_canvas.yview_moveto(1.0)
+        # hanya di tampilan, tidak masuk riwayat chat
+        self.chat_view.append({"text": message, "is_system": True})
     
-    def _select_peer(self, peer):
-        self.active_peer_id = peer.peer_id
-        self.chat_title.configure(text=f"💬 Chat dengan {peer.name}")
-        self.send_btn.configure(state="normal")
+    def _select_peer(self, peer_id: str, around: Optional[int] = None):
+        self.active_peer_id = peer_id
+        self.active_key = self.peer.identity_of(peer_id)
+        self.chat_title.configure(text=f"💬 Chat dengan {self.peer_list.names.get(peer_id, peer_id)}")
+        self._set_sending(True)
         
-        # Refresh peer list to show selection
-        self._update_peers_list()
+        # Only the old and new selection are restyled
+        self.peer_list.select(peer_id)
         
         # Load chat history for this peer
-        self._refresh_chat_display()
-    
-    def _refresh_chat_display(self):
-        # Clear current chat display
-        for widget in self.chat_frame.winfo_children():
-            widget.destroy()
-        
-        if not self.active_peer_id:
-            self.welcome_label = ctk.CTkLabel(
-                self.chat_frame,
-                text="👋 Selamat Datang di Pesan P2P!\n\nHubungkan ke peer lain untuk mulai chatting.",
-                font=ctk.CTkFont(size=14),
-                text_color="gray"
-            )
-            self.welcome_label.pack(expand=True, pady=50)
+        self._refresh_chat_display(around)
+    
+    def _refresh_chat_display(self, around: Optional[int] = None):
+        # Ganti isi chat view dengan riwayat peer aktif; hanya bubble yang
+        # terlihat yang dibuat. Dengan `around` (id pesan) yang dimuat
+        # halaman di sekitar pesan itu, bukan yang terbaru
+        if not self.active_key:
+            self.chat_view.show([], welcome=True)
             return
         
-        # Display chat history for active peer
-        if self.active_peer_id in self.chat_history:
-            for msg in self.chat_history[self.active_peer_id]:
-                MessageBubble(
-                    self.chat_frame,
-                    msg["sender"],
-                    msg["text"],
-                    msg["timestamp"],
-                    is_own=msg["is_own"]
-                )
-        
-        self.chat_frame._parent_canvas.yview_moveto(1.0)
+        # Only one page is read; older/newer pages load while scrolling
+        peer_id = self.active_key
+        at = None
+        if around is None:
+            items = self.history.page(peer_id, limit=ChatView.PAGE)
+        else:
+            items = self.history.page(peer_id, before=around + 1, limit=ChatView.PAGE // 2)
+            at = len(items) - 1 if items else None
+            items += self.history.page_after(peer_id, around, ChatView.PAGE // 2)
+        self.chat_view.show(
+            items,
+            older=lambda first_id, limit: self.history.page(peer_id, before=first_id, limit=limit),
+            newer=lambda last_id, limit: self.history.page_after(peer_id, last_id, limit),
+            at=at
+        )
     
     def _update_peers_list(self):
-        for widget in self.peers_scroll.winfo_children():
-            widget.destroy()
-        
+        # Join/leave events update the sidebar row by row; this full
+        # comparison only catches anything they missed
         peers = self.peer.get_connected_peers() if self.peer else []
-        self.peers_count.configure(text=f"({len(peers)})")
-        
-        for peer in peers:
-            # Create clickable button for each peer
-            peer_btn = ctk.CTkButton(
-                self.peers_scroll,
-                text=f"● {peer.name}",
-                height=40,
-                fg_color=("#2a2a2a" if peer.peer_id != self.active_peer_id else "#1f6aa5"),
-                hover_color=("#3a3a3a" if peer.peer_id != self.active_peer_id else "#1a5490"),
-                anchor="w",
-                command=lambda p=peer: self._select_peer(p)
-            )
-            peer_btn.pack(fill="x", pady=2)
-            
-            # Store peer info for reference
-            peer_btn.peer_info = peer
+        self.peer_list.sync((peer.peer_id, peer.name) for peer in peers)
+        self.peers_count.configure(text=f"({len(self.peer_list)})")
     
-    def _on_message_received(self, sender_name: str, text: str, timestamp: str, sender_peer_id: str = None):
-        try:
-            dt = datetime.fromisoformat(timestamp)
-            time_str = dt.strftime("%H:%M")
-        except:
-            time_str = datetime.now().strftime("%H:%M")
-        
-        # Store message in sender's chat history
-        if sender_peer_id:
-            if sender_peer_id not in self.chat_history:
-                self.chat_history[sender_peer_id] = []
-            
-            self.chat_history[sender_peer_id].append({
-                "sender": sender_name,
-                "text": text,
-                "timestamp": time_str,
-                "is_own": False
-            })
-            
-            # Only display if this peer is currently selected
-            if sender_peer_id == self.active_peer_id:
-                self.after(0, lambda: self._refresh_chat_display())
-        else:
-            # Fallback for system messages or unknown sender
-            self.after(0, lambda: self._add_message_bubble(sender_name, text, time_str, is_own=False))
+    def _sync_peers(self):
+        if not self.peer:
+            return
+        self._update_peers_list()
+        self.after(PEER_SYNC_INTERVAL_MS, self._sync_peers)
+    
+    def _on_message_received(self, sender_name: str, text: str, timestamp: int, sender_peer_id: str = None):
+        self.events.post("message", sender_name, text, timestamp, sender_peer_id)
+    
+    def _on_peer_join(self, peer_name: str, peer_id: str):
+        self.events.post("join", peer_name, peer_id)
     
-    def _on_peer_join(self, peer_name: str):
-        self.after(0, lambda: self._add_system_message(f"🟢 {peer_name} bergabung ke jaringan"))
-        self.after(0, self._update_peers_list)
+    def _on_peer_leave(self, peer_name: str, peer_id: str):
+        self.events.post("leave", peer_name, peer_id)
     
-    def _on_peer_leave(self, peer_name: str):
-        self.after(0, lambda: self._add_system_message(f"🔴 {peer_name} meninggalkan jaringan"))
-        self.after(0, self._update_peers_list)
+    def _on_events(self, events):
+        # Semua event satu frame sekaligus: chat view render sekali, daftar
+        # peer dan counter di-update sekali
+        peers_changed = False
+        for kind, args in events:
+            if kind == "message":
+                sender_name, text, timestamp, sender_peer_id = args
+                if sender_peer_id:
+                    # Store message in sender's chat history
+                    self._store_message(sender_peer_id, sender_name, text, timestamp)
+                else:
+                    # Fallback for system messages or unknown sender
+                    self._add_message_bubble(sender_name, text, timestamp, is_own=False)
+            elif kind == "join":
+                peer_name, peer_id = args
+                self._add_system_message(f"🟢 {peer_name} bergabung ke jaringan")
+                self.peer_list.put(peer_id, peer_name)
+                key = self.peer.identity_of(peer_id)
+                self.peer_names[key] = peer_name
+                if self.active_peer_id is None and key == self.active_key:
+                    # The read-only conversation's peer is back: chat again
+                    self.active_peer_id = peer_id
+                    self.chat_title.configure(text=f"💬 Chat dengan {peer_name}")
+                    self._set_sending(True)
+                    self.peer_list.select(peer_id)
+                peers_changed = True
+            elif kind == "leave":
+                peer_name, peer_id = args
+                self._add_system_message(f"🔴 {peer_name} meninggalkan jaringan")
+                self.peer_list.remove(peer_id)
+                peers_changed = True
+        
+        if peers_changed:
+            self.peers_count.configure(text=f"({len(self.peer_list)})")
     
     def _on_close(self):
+        self.events.stop()
         if self.peer:
             self.peer.stop()
+        if self.history:
+            self.history.close()
         self.destroy()
 
 
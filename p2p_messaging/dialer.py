@@ -0,0 +1,113 @@
+# Dialer: antrian koneksi keluar dengan batas konkurensi
+import threading
+import logging
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+Address = Tuple[str, int]
+
+
+class Dialer:
+    # Semua dial keluar lewat sini: paling banyak `max_concurrent` koneksi
+    # dibuka bersamaan oleh worker tetap, sisanya antri. Alamat yang sedang
+    # di-dial tidak di-dial lagi; setiap pemanggil mendapat Future sendiri
+    # (waiter) yang selesai bersama dial itu. Dial yang masih antri baru
+    # dibatalkan kalau semua waiter-nya dibatalkan.
+
+    def __init__(self, connect: Callable[..., bool], max_concurrent: int = 8):
+        self.connect = connect  # connect(host, port, *args) -> bool
+        self.max_concurrent = max_concurrent
+        self._pending: Dict[Address, Future] = {}
+        self._waiters: Dict[Address, Set[Future]] = {}
+        # RLock: cancel() di bawah lock langsung menjalankan callback _done
+        self._lock = threading.RLock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self):
+        with self._lock:
+            self._executor = ThreadPoolExecutor(self.max_concurrent, thread_name_prefix="dialer")
+
+    def stop(self):
+        # dial yang belum jalan dibatalkan (waiter-nya dapat False), yang
+        # sedang jalan dibiarkan selesai
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def pending(self) -> List[Address]:
+        with self._lock:
+            return list(self._pending)
+
+    def submit(self, host: str, port: int, *args) -> Future:
+        # jadwalkan dial, hasilnya Future[bool]; langsung False kalau dialer
+        # belum start atau sudah stop
+        address = (host, port)
+        waiter = Future()
+        with self._lock:
+            if self._executor is None:
+                waiter.set_result(False)
+                return waiter
+            dial = self._pending.get(address)
+            started = dial is None
+            if started:
+                dial = self._executor.submit(self._dial, address, args)
+                self._pending[address] = dial
+                self._waiters[address] = set()
+            self._waiters[address].add(waiter)
+        if started:
+            dial.add_done_callback(lambda _: self._done(address, dial))
+        dial.add_done_callback(lambda _: self._resolve(dial, waiter))
+        waiter.add_done_callback(lambda _: self._release(address, dial, waiter))
+        return waiter
+
+    def connect_many(
+        self,
+        addresses: Iterable[Address],
+        *args,
+        timeout: Optional[float] = None
+    ) -> Dict[Address, bool]:
+        # dial banyak alamat sekaligus; yang belum selesai setelah timeout
+        # dihitung gagal. Hanya waiter milik panggilan ini yang dibatalkan,
+        # pemanggil lain yang menunggu alamat yang sama tidak terpengaruh
+        waiters = {(host, port): self.submit(host, port, *args) for host, port in addresses}
+        _, not_done = wait(waiters.values(), timeout)
+        for waiter in not_done:
+            waiter.cancel()
+        return {
+            address: not waiter.cancelled() and waiter.result()
+            for address, waiter in waiters.items()
+        }
+
+    def _dial(self, address: Address, args: tuple) -> bool:
+        try:
+            return bool(self.connect(address[0], address[1], *args))
+        except Exception as e:
+            logger.error(f"Error dialing {address[0]}:{address[1]}: {e}")
+            return False
+
+    def _resolve(self, dial: Future, waiter: Future):
+        # dial yang dibatalkan (stop) dihitung gagal
+        result = not dial.cancelled() and dial.result()
+        try:
+            waiter.set_result(result)
+        except InvalidStateError:
+            pass  # waiter sudah dibatalkan pemiliknya
+
+    def _release(self, address: Address, dial: Future, waiter: Future):
+        with self._lock:
+            waiters = self._waiters.get(address)
+            if self._pending.get(address) is not dial:
+                return
+            waiters.discard(waiter)
+            if not waiters and waiter.cancelled():
+                # Nobody waits for it anymore: drop it if it is still queued
+                dial.cancel()
+
+    def _done(self, address: Address, future: Future):
+        with self._lock:
+            if self._pending.get(address) is future:
+                del self._pending[address]
+                del self._waiters[address]
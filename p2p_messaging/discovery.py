@@ -0,0 +1,184 @@
+# Discovery peer di LAN lewat UDP multicast (atau broadcast)
+import ipaddress
+import random
+import socket
+import struct
+import threading
+import time
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .failure import TimingWheel
+from .message import Message, MessageType
+
+logger = logging.getLogger(__name__)
+
+# Multicast administratively scoped (239/8), TTL 1: tidak keluar dari segmen LAN
+DISCOVERY_GROUP = "239.255.42.99"
+DISCOVERY_PORT = 45678
+
+
+class Discovery:
+    # Peer mengumumkan alamat TCP-nya ke grup multicast saat start ("query")
+    # dan setiap `interval` detik. Yang menerima query ikut mengumumkan diri,
+    # paling sering sekali per `min_interval` detik: query yang datang
+    # berdekatan dijawab dengan satu pengumuman. Entry yang tidak diumumkan
+    # lagi selama `ttl` detik dibuang dari tabel.
+
+    def __init__(
+        self,
+        wheel: TimingWheel,
+        info: Callable[[], dict],
+        on_found: Callable[[dict], None],
+        group: str = DISCOVERY_GROUP,
+        port: int = DISCOVERY_PORT,
+        interval: float = 5.0,
+        ttl: float = 15.0,
+        min_interval: float = 0.5,
+        max_entries: int = 256
+    ):
+        self.wheel = wheel
+        self.info = info            # PeerInfo dict peer ini
+        self.on_found = on_found    # dipanggil untuk peer yang baru terlihat
+        self.group = group
+        self.port = port
+        self.interval = interval
+        self.ttl = ttl
+        self.min_interval = min_interval
+        self.max_entries = max_entries
+        self.multicast = ipaddress.ip_address(group).is_multicast
+        self.stats = {"sent": 0, "received": 0}
+        self.running = False
+        self._table: Dict[str, Tuple[dict, float]] = {}  # peer_id -> (info, expires)
+        self._last_sent = 0.0
+        self._reply_timer = None
+        self._lock = threading.Lock()
+        self._socket: Optional[socket.socket] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        # Several peers on one host (or in one process) share the port
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(("", self.port))
+        if self.multicast:
+            membership = struct.pack("4s4s", socket.inet_aton(self.group), socket.inet_aton("0.0.0.0"))
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        else:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.settimeout(1.0)
+        self._socket = sock
+        self.running = True
+
+        self._thread = threading.Thread(target=self._receive_loop, daemon=True)
+        self._thread.start()
+        self._send(query=True)
+        self.wheel.schedule(self._next_interval(), self._announce_tick)
+
+    def stop(self):
+        self.running = False
+        if self._reply_timer:
+            self._reply_timer.cancel()
+        if self._socket:
+            self._socket.close()
+
+    def peers(self) -> List[dict]:
+        # peer yang masih terlihat di LAN
+        now = time.monotonic()
+        with self._lock:
+            return [info for info, expires in self._table.values() if expires >= now]
+
+    def expire(self, now: Optional[float] = None) -> int:
+        now = now if now is not None else time.monotonic()
+        with self._lock:
+            stale = [pid for pid, (_, expires) in self._table.items() if expires < now]
+            for pid in stale:
+                del self._table[pid]
+        return len(stale)
+
+    def _next_interval(self) -> float:
+        # jitter supaya peer yang start bersamaan tidak mengumumkan serentak
+        return self.interval * random.uniform(0.8, 1.2)
+
+    def _announce_tick(self):
+        if not self.running:
+            return
+        self.wheel.schedule(self._next_interval(), self._announce_tick)
+        self.expire()
+        self._send()
+
+    def _send(self, query: bool = False):
+        info = self.info()
+        message = Message(
+            msg_type=MessageType.DISCOVERY,
+            sender_id=info["peer_id"],
+            sender_name=info["name"],
+            data={"host": info["host"], "port": info["port"], "query": query}
+        )
+        with self._lock:
+            self._last_sent = time.monotonic()
+            # This announcement also answers a reply still waiting
+            timer, self._reply_timer = self._reply_timer, None
+        if timer is not None:
+            timer.cancel()
+        try:
+            self._socket.sendto(message.to_payload(), (self.group, self.port))
+            self.stats["sent"] += 1
+        except OSError as e:
+            if self.running:
+                logger.warning(f"Discovery announcement failed: {e}")
+
+    def _reply(self):
+        # jawab query, paling sering sekali per min_interval (dipanggil dengan self._lock dipegang)
+        if self._reply_timer is not None:
+            return
+        delay = self._last_sent + self.min_interval - time.monotonic()
+        self._reply_timer = self.wheel.schedule(max(delay, 0.0), self._send)
+
+    def _receive_loop(self):
+        own_id = self.info()["peer_id"]
+        while self.running:
+            try:
+                payload, address = self._socket.recvfrom(65535)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                if self.running:
+                    logger.error(f"Discovery receive error: {e}")
+                break
+
+            try:
+                message = Message.from_payload(payload)
+                data = message.data
+                if message.msg_type != MessageType.DISCOVERY or message.sender_id == own_id:
+                    continue
+                host = data.get("host")
+                if not host or host == "0.0.0.0":
+                    host = address[0]
+                info = {
+                    "peer_id": message.sender_id,
+                    "name": message.sender_name,
+                    "host": host,
+                    "port": int(data["port"])
+                }
+            except (ValueError, KeyError, TypeError, AttributeError):
+                continue
+            self.stats["received"] += 1
+
+            with self._lock:
+                new = info["peer_id"] not in self._table
+                if new and len(self._table) >= self.max_entries:
+                    continue
+                self._table[info["peer_id"]] = (info, time.monotonic() + self.ttl)
+                if data.get("query"):
+                    self._reply()
+
+            if new:
+                try:
+                    self.on_found(info)
+                except Exception as e:
+                    logger.error(f"Error handling discovered peer: {e}")
@@ -0,0 +1,91 @@
+# Pompa event dari thread jaringan ke thread GUI
+import time
+import logging
+from collections import deque
+from typing import Callable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+Event = Tuple[str, tuple]
+
+
+class EventPump:
+    # Callback Peer berjalan di thread jaringan dan hanya memanggil post().
+    # Thread GUI mengambil semua event yang antri sekali per `interval` detik
+    # dan memberikannya sekaligus ke handler, jadi banjir pesan menjadi satu
+    # update per frame, bukan satu callback Tk per pesan.
+
+    def __init__(
+        self,
+        schedule: Callable[[int, Callable[[], None]], object],
+        handler: Callable[[List[Event]], None],
+        interval: float = 0.016,
+        max_batch: int = 10000,
+        window: int = 1024
+    ):
+        self.schedule = schedule    # schedule(ms, fn), misal widget.after
+        self.handler = handler      # handler([(kind, args), ...]) di thread GUI
+        self.interval = interval
+        self.max_batch = max_batch  # sisanya diambil frame berikutnya
+        self.running = False
+        self.counters = {"posted": 0, "frames": 0, "events": 0, "max_batch": 0}
+        self._events = deque()  # (waktu post, kind, args); append/popleft thread-safe
+        self._latency = deque(maxlen=window)  # detik dari post() sampai diproses
+        self._frames = deque(maxlen=window)   # durasi handler per frame
+
+    def post(self, kind: str, *args):
+        # boleh dipanggil dari thread mana saja
+        self._events.append((time.perf_counter(), kind, args))
+        self.counters["posted"] += 1
+
+    def pending(self) -> int:
+        return len(self._events)
+
+    def start(self):
+        self.running = True
+        self.schedule(int(self.interval * 1000), self._drain)
+
+    def stop(self):
+        self.running = False
+
+    def stats(self) -> dict:
+        # counter plus latency event (post sampai diproses) dan durasi frame
+        # dalam ms, dari `window` sampel terakhir
+        def percentiles(samples):
+            ordered = sorted(samples)
+            if not ordered:
+                return {"p50": None, "p99": None, "max": None}
+            pick = lambda q: ordered[min(int(len(ordered) * q), len(ordered) - 1)] * 1000
+            return {"p50": pick(0.5), "p99": pick(0.99), "max": ordered[-1] * 1000}
+
+        return dict(
+            self.counters,
+            pending=len(self._events),
+            latency_ms=percentiles(self._latency),
+            frame_ms=percentiles(self._frames)
+        )
+
+    def _drain(self):
+        if not self.running:
+            return
+        start = time.perf_counter()
+        batch = []
+        events = self._events
+        while events and len(batch) < self.max_batch:
+            posted, kind, args = events.popleft()
+            self._latency.append(start - posted)
+            batch.append((kind, args))
+
+        if batch:
+            try:
+                self.handler(batch)
+            except Exception as e:
+                logger.error(f"Error handling UI events: {e}")
+            self.counters["frames"] += 1
+            self.counters["events"] += len(batch)
+            self.counters["max_batch"] = max(self.counters["max_batch"], len(batch))
+            self._frames.append(time.perf_counter() - start)
+
+        # The next frame is timed from the start of this one
+        elapsed = time.perf_counter() - start
+        self.schedule(max(int((self.interval - elapsed) * 1000), 1), self._drain)
@@ -0,0 +1,192 @@
+# Deteksi kegagalan peer: phi-accrual detector, estimasi RTT, timing wheel
+import math
+import threading
+import time
+import logging
+from collections import deque
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Timer:
+    # timer yang dijadwalkan di TimingWheel
+
+    __slots__ = ("deadline", "callback", "args", "cancelled")
+
+    def __init__(self, deadline: int, callback: Callable, args: tuple):
+        self.deadline = deadline  # tick absolut
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimingWheel:
+    # Hashed timing wheel: satu thread untuk semua timer, schedule/cancel O(1).
+    # Resolusi timer = tick; timer lebih panjang dari satu putaran tetap di
+    # slotnya sampai tick absolutnya tercapai.
+
+    def __init__(self, tick: float = 0.05, slots: int = 512):
+        self.tick = tick
+        self.slots = slots
+        self.running = False
+        self.thread = None
+        self._wheel: List[List[Timer]] = [[] for _ in range(slots)]
+        self._cursor = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def start(self):
+        self.running = True
+        self._stopped.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self._stopped.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2.0)
+
+    def schedule(self, delay: float, callback: Callable, *args) -> Timer:
+        # panggil callback(*args) setelah `delay` detik (dari thread wheel)
+        with self._lock:
+            deadline = self._cursor + max(1, math.ceil(delay / self.tick))
+            timer = Timer(deadline, callback, args)
+            self._wheel[deadline % self.slots].append(timer)
+        return timer
+
+    def advance(self, ticks: int = 1):
+        # maju `ticks` tick dan panggil timer yang jatuh tempo di thread
+        # pemanggil (dipakai _run; test bisa memutar wheel tanpa start())
+        for _ in range(ticks):
+            with self._lock:
+                self._cursor += 1
+                bucket = self._wheel[self._cursor % self.slots]
+                due = [timer for timer in bucket if timer.deadline <= self._cursor]
+                if due:
+                    bucket[:] = [timer for timer in bucket if timer.deadline > self._cursor]
+
+            for timer in due:
+                if timer.cancelled:
+                    continue
+                try:
+                    timer.callback(*timer.args)
+                except Exception as e:
+                    logger.error(f"Error in timer callback: {e}")
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while self.running:
+            next_tick += self.tick
+            delay = next_tick - time.monotonic()
+            if delay > 0 and self._stopped.wait(delay):
+                break
+            self.advance()
+
+
+class PhiAccrualDetector:
+    # Phi accrual failure detector (Hayashibara et al.): phi naik terus
+    # selama tidak ada heartbeat, relatif terhadap distribusi interval
+    # heartbeat yang pernah diamati. phi 8 ~ peluang salah 1e-8.
+
+    def __init__(
+        self,
+        first_interval: float,
+        window: int = 100,
+        min_std: float = 0.1,
+        acceptable_pause: float = 0.0
+    ):
+        self.window = window
+        self.min_std = min_std
+        self.acceptable_pause = acceptable_pause
+        self.last: Optional[float] = None
+        self._intervals = deque()
+        self._sum = 0.0
+        self._sq_sum = 0.0
+        # Seed with the expected interval so the first phi values are sane
+        self._add(first_interval - first_interval / 4)
+        self._add(first_interval + first_interval / 4)
+
+    def heartbeat(self, now: float):
+        if self.last is not None:
+            self._add(now - self.last)
+        self.last = now
+
+    def phi(self, now: float) -> float:
+        if self.last is None:
+            return 0.0
+        count = len(self._intervals)
+        mean = self._sum / count
+        std = max(math.sqrt(max(self._sq_sum / count - mean * mean, 0.0)), self.min_std)
+        # Logistic approximation of the normal CDF
+        y = (now - self.last - mean - self.acceptable_pause) / std
+        e = math.exp(-y * (1.5976 + 0.070566 * y * y))
+        if y > 0:
+            return -math.log10(e / (1.0 + e))
+        return -math.log10(1.0 - 1.0 / (1.0 + e))
+
+    def _add(self, interval: float):
+        if len(self._intervals) >= self.window:
+            old = self._intervals.popleft()
+            self._sum -= old
+            self._sq_sum -= old * old
+        self._intervals.append(interval)
+        self._sum += interval
+        self._sq_sum += interval * interval
+
+
+class RttEstimator:
+    # smoothed RTT dan variasinya (Jacobson/Karels, RFC 6298), dalam detik
+
+    def __init__(self, alpha: float = 0.125, beta: float = 0.25):
+        self.alpha = alpha
+        self.beta = beta
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+
+    def update(self, sample: float):
+        if self.srtt is None:
+            self.srtt = sample
+            self.rttvar = sample / 2
+        else:
+            self.rttvar = (1 - self.beta) * self.rttvar + self.beta * abs(self.srtt - sample)
+            self.srtt = (1 - self.alpha) * self.srtt + self.alpha * sample
+
+    def rto(self, minimum: float = 0.2, maximum: float = 60.0) -> float:
+        # retransmission timeout
+        if self.srtt is None:
+            return 1.0
+        return min(max(self.srtt + 4 * self.rttvar, minimum), maximum)
+
+
+class PeerHealth:
+    # status kesehatan satu peer: detector + RTT
+
+    __slots__ = ("detector", "rtt", "since")
+
+    def __init__(self, now: float, heartbeat_interval: float):
+        # Tolerate two missed heartbeats before phi starts climbing fast
+        self.detector = PhiAccrualDetector(
+            heartbeat_interval,
+            min_std=heartbeat_interval / 5,
+            acceptable_pause=2 * heartbeat_interval
+        )
+        self.detector.heartbeat(now)
+        self.rtt = RttEstimator()
+        self.since = now
+
+    def silence(self, now: float) -> float:
+        return now - self.detector.last
+
+    def to_dict(self, now: float) -> dict:
+        srtt = self.rtt.srtt
+        return {
+            "phi": round(self.detector.phi(now), 3),
+            "rtt_ms": None if srtt is None else round(srtt * 1000, 3),
+            "rttvar_ms": None if srtt is None else round(self.rtt.rttvar * 1000, 3),
+            "silence": round(self.silence(now), 3)
+        }
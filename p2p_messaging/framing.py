@@ -0,0 +1,301 @@
+# Framing stream TCP: newline (lama) dan length-prefixed (biner)
+import socket
+import struct
+from typing import Dict, List, Optional, Tuple
+
+LENGTH_HEADER = struct.Struct(">I")
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+# Buffer receive dialokasikan saat pertama kali dibaca, mulai kecil supaya
+# ribuan koneksi idle murah, dan membesar (x2) hanya kalau dibutuhkan
+DEFAULT_BUFFER_SIZE = 4 * 1024
+# Ukuran recv maksimal untuk stream frame kecil yang terus-menerus
+MAX_READ_SIZE = 64 * 1024
+
+# Framing "chunked": frame besar dipecah jadi fragment. Bit teratas header
+# panjang menandai fragment, diikuti 1 byte: stream (lane) + bit fragment terakhir
+FRAGMENT_SIZE = 16 * 1024
+FRAGMENT_FLAG = 0x80000000
+FRAGMENT_LAST = 0x80
+FRAGMENT_HEADER = struct.Struct(">IB")
+
+
+class FrameError(Exception):
+    # frame tidak valid (misal terlalu besar)
+    pass
+
+
+class FrameDecoder:
+    # Buffer receive yang dipakai ulang.
+    # Data dibaca langsung dengan recv_into ke bytearray, frame dikembalikan
+    # sebagai memoryview ke buffer itu (tanpa copy). View hanya valid sampai
+    # pemanggilan recv_into berikutnya. Buffer baru dibuat saat data pertama
+    # datang; recv yang mengisi penuh ruang kosong menggandakan ukuran recv
+    # berikutnya sampai MAX_READ_SIZE, frame yang lebih besar dari buffer
+    # menggandakan buffer. release() melepas buffer lagi saat link sepi.
+
+    def __init__(self, initial: bytes = b"", buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self._buffer_size = buffer_size
+        self._read_size = buffer_size
+        self._filled = False  # recv terakhir mengisi semua ruang kosong
+        self._buf = bytearray(initial)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._end = len(initial)
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def recv_into(self, sock: socket.socket) -> int:
+        # baca dari socket ke ruang kosong buffer
+        self._reserve(self._want())
+        free = len(self._buf) - self._end
+        n = sock.recv_into(self._view[self._end:])
+        self._end += n
+        self._filled = n == free
+        if self._filled and self._read_size < MAX_READ_SIZE:
+            # The socket had more than fit, read bigger chunks from now on
+            self._read_size *= 2
+        return n
+
+    def release(self):
+        # dipanggil setelah semua frame diproses: tanpa data tertunda dan
+        # tanpa stream, buffer dilepas (frame yang sudah dikembalikan tetap
+        # memegang buffer lamanya sendiri)
+        if self._start != self._end:
+            return
+        if not self._filled and self._read_size > self._buffer_size:
+            self._read_size //= 2
+        if self._read_size == self._buffer_size and self._buf:
+            self._buf = bytearray()
+            self._view = memoryview(self._buf)
+            self._start = self._end = 0
+
+    def feed(self, data: bytes):
+        # tambah data secara manual (untuk transport tanpa recv_into)
+        self._reserve(len(data))
+        self._view[self._end:self._end + len(data)] = data
+        self._end += len(data)
+
+    def remaining(self) -> bytes:
+        # sisa byte yang belum jadi frame (dipakai saat ganti framing)
+        return bytes(self._view[self._start:self._end])
+
+    def next_frame(self) -> Optional[memoryview]:
+        raise NotImplementedError
+
+    def _want(self) -> int:
+        # minimal ruang kosong yang dibutuhkan untuk recv berikutnya
+        return self._read_size
+
+    def _reserve(self, need: int):
+        # pastikan ada `need` byte kosong setelah _end
+        if len(self._buf) - self._end >= need:
+            return
+
+        pending = self._end - self._start
+        if pending + need > len(self._buf):
+            # Grow: first read, busy stream or a frame larger than the buffer
+            size = max(len(self._buf), self._buffer_size)
+            while size < pending + need:
+                size *= 2
+            new_buf = bytearray(size)
+            new_buf[:pending] = self._view[self._start:self._end]
+            self._buf = new_buf
+            self._view = memoryview(self._buf)
+        elif pending:
+            # Compact: move the partial frame to the front of the buffer
+            self._view[:pending] = bytes(self._view[self._start:self._end])
+        self._start = 0
+        self._end = pending
+
+
+class LineDecoder(FrameDecoder):
+    # frame dipisah newline (JSON per baris)
+
+    def __init__(self, initial: bytes = b"", buffer_size: int = DEFAULT_BUFFER_SIZE):
+        super().__init__(initial, buffer_size)
+        self._scanned = 0
+
+    def next_frame(self) -> Optional[memoryview]:
+        while True:
+            # Only scan bytes not already checked for a newline
+            idx = self._buf.find(b"\n", self._start + self._scanned, self._end)
+            if idx < 0:
+                self._scanned = self._end - self._start
+                if self._scanned > MAX_FRAME_SIZE:
+                    raise FrameError(f"Line exceeds {MAX_FRAME_SIZE} bytes")
+                return None
+
+            frame = self._view[self._start:idx]
+            self._start = idx + 1
+            self._scanned = 0
+            # Skip blank lines (keep-alives from older peers)
+            if len(frame) > 2 or bytes(frame).strip():
+                return frame
+
+
+class LengthDecoder(FrameDecoder):
+    # frame dengan header panjang 4 byte (big-endian)
+
+    def next_frame(self) -> Optional[memoryview]:
+        available = self._end - self._start
+        if available < LENGTH_HEADER.size:
+            return None
+
+        (length,) = LENGTH_HEADER.unpack_from(self._buf, self._start)
+        if length > MAX_FRAME_SIZE:
+            raise FrameError(f"Frame of {length} bytes exceeds {MAX_FRAME_SIZE}")
+        if available < LENGTH_HEADER.size + length:
+            return None
+
+        begin = self._start + LENGTH_HEADER.size
+        self._start = begin + length
+        return self._view[begin:self._start]
+
+    def _want(self) -> int:
+        # Reserve room for the whole pending frame so it arrives contiguous
+        available = self._end - self._start
+        if available >= LENGTH_HEADER.size:
+            (length,) = LENGTH_HEADER.unpack_from(self._buf, self._start)
+            return max(LENGTH_HEADER.size + min(length, MAX_FRAME_SIZE) - available, self._read_size)
+        return self._read_size
+
+
+class ChunkedDecoder(LengthDecoder):
+    # seperti LengthDecoder, fragment dikumpulkan per stream sampai lengkap.
+    # Frame hasil gabungan ada di buffer sendiri, bukan view ke buffer receive.
+
+    def __init__(self, initial: bytes = b"", buffer_size: int = DEFAULT_BUFFER_SIZE):
+        super().__init__(initial, buffer_size)
+        self._partial: Dict[int, bytearray] = {}
+
+    def next_frame(self) -> Optional[memoryview]:
+        while True:
+            available = self._end - self._start
+            if available < LENGTH_HEADER.size:
+                return None
+            (word,) = LENGTH_HEADER.unpack_from(self._buf, self._start)
+            if not word & FRAGMENT_FLAG:
+                return super().next_frame()
+
+            length = word & ~FRAGMENT_FLAG
+            if not 0 < length <= FRAGMENT_SIZE + 1:
+                raise FrameError(f"Fragment of {length} bytes")
+            if available < LENGTH_HEADER.size + length:
+                return None
+            begin = self._start + LENGTH_HEADER.size
+            self._start = begin + length
+            flags = self._buf[begin]
+            stream = flags & ~FRAGMENT_LAST
+            partial = self._partial.get(stream)
+            if partial is None:
+                partial = self._partial[stream] = bytearray()
+            partial += self._view[begin + 1:self._start]
+            if len(partial) > MAX_FRAME_SIZE:
+                raise FrameError(f"Fragmented frame exceeds {MAX_FRAME_SIZE} bytes")
+            if flags & FRAGMENT_LAST:
+                del self._partial[stream]
+                return memoryview(partial)
+
+    def _want(self) -> int:
+        available = self._end - self._start
+        if available >= LENGTH_HEADER.size:
+            (word,) = LENGTH_HEADER.unpack_from(self._buf, self._start)
+            if word & FRAGMENT_FLAG:
+                return max(LENGTH_HEADER.size + (word & ~FRAGMENT_FLAG) - available, self._read_size)
+        return super()._want()
+
+
+class Framing:
+    # format framing di wire
+    name = ""
+    binary_safe = False  # payload boleh berisi byte apa saja
+
+    def decoder(self, initial: bytes = b"") -> FrameDecoder:
+        raise NotImplementedError
+
+    def encode(self, *parts: bytes) -> Tuple[bytes, ...]:
+        # Returns the frame as separate buffers so payload parts are handed
+        # to sendmsg as-is and can be shared between recipients
+        raise NotImplementedError
+
+    def fragments(self, parts: Tuple[bytes, ...], stream: int) -> List[Tuple[bytes, ...]]:
+        # frame sebagai potongan yang boleh diselingi frame lain;
+        # framing tanpa fragmentasi selalu satu potongan
+        return [self.encode(*parts)]
+
+
+class LineFraming(Framing):
+    name = "line"
+
+    def decoder(self, initial: bytes = b"") -> FrameDecoder:
+        return LineDecoder(initial)
+
+    def encode(self, *parts: bytes) -> Tuple[bytes, ...]:
+        return tuple(part for part in parts if part) + (b"\n",)
+
+
+class LengthFraming(Framing):
+    name = "length"
+    binary_safe = True
+
+    def decoder(self, initial: bytes = b"") -> FrameDecoder:
+        return LengthDecoder(initial)
+
+    def encode(self, *parts: bytes) -> Tuple[bytes, ...]:
+        parts = tuple(part for part in parts if part)
+        return (LENGTH_HEADER.pack(sum(map(len, parts))),) + parts
+
+
+class ChunkedFraming(LengthFraming):
+    name = "chunked"
+
+    def decoder(self, initial: bytes = b"") -> FrameDecoder:
+        return ChunkedDecoder(initial)
+
+    def fragments(self, parts: Tuple[bytes, ...], stream: int) -> List[Tuple[bytes, ...]]:
+        parts = tuple(part for part in parts if part)
+        if sum(map(len, parts)) <= FRAGMENT_SIZE:
+            return [self.encode(*parts)]
+
+        # Slice the parts in place, the payload is not copied
+        chunks = []
+        current, size = [], 0
+        for part in parts:
+            view = memoryview(part)
+            while view:
+                take = min(len(view), FRAGMENT_SIZE - size)
+                current.append(view[:take])
+                size += take
+                view = view[take:]
+                if size == FRAGMENT_SIZE:
+                    chunks.append((current, size))
+                    current, size = [], 0
+        if current:
+            chunks.append((current, size))
+
+        last = len(chunks) - 1
+        return [
+            (FRAGMENT_HEADER.pack(FRAGMENT_FLAG | (size + 1), stream | (FRAGMENT_LAST if i == last else 0)),)
+            + tuple(chunk)
+            for i, (chunk, size) in enumerate(chunks)
+        ]
+
+
+FRAMINGS: Dict[str, Framing] = {
+    "chunked": ChunkedFraming(),
+    "length": LengthFraming(),
+    "line": LineFraming(),
+}
+
+# Urutan preferensi, "line" selalu jadi fallback untuk peer lama
+SUPPORTED_FRAMINGS: List[str] = ["chunked", "length", "line"]
+DEFAULT_FRAMING = "line"
+
+
+def negotiate_framing(offered: Optional[List[str]]) -> str:
+    """Pick the first framing we prefer that the remote peer also offered"""
+    for name in SUPPORTED_FRAMINGS:
+        if offered and name in offered:
+            return name
+    return DEFAULT_FRAMING
@@ -0,0 +1,32 @@
+# Filter duplikat untuk broadcast epidemic
+from typing import Hashable, Set
+
+# Default jumlah id pesan yang diingat
+SEEN_CAPACITY = 65536
+
+
+class SeenSet:
+    # Set id pesan dengan memori terbatas. Dua generasi: saat generasi
+    # sekarang penuh, generasi lama dibuang. Id diingat minimal capacity/2
+    # pesan terakhir, jauh lebih lama dari umur broadcast di jaringan.
+
+    def __init__(self, capacity: int = SEEN_CAPACITY):
+        self.capacity = capacity
+        self._current: Set[Hashable] = set()
+        self._previous: Set[Hashable] = set()
+
+    def __len__(self) -> int:
+        return len(self._current) + len(self._previous)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._current or key in self._previous
+
+    def add(self, key: Hashable) -> bool:
+        # tandai sebagai sudah dilihat, return False kalau ternyata duplikat
+        if key in self._current or key in self._previous:
+            return False
+        if len(self._current) >= self.capacity // 2:
+            self._previous = self._current
+            self._current = set()
+        self._current.add(key)
+        return True
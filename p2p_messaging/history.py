@@ -0,0 +1,293 @@
+# Riwayat chat per peer di SQLite, ditulis per batch oleh thread writer
+import sqlite3
+import threading
+import logging
+from collections import deque
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    peer_id TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    text TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    is_own INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_peer ON messages (peer_id, id);
+"""
+
+# Index full-text di samping tabel messages (external content, teks tidak
+# disimpan dua kali). Tidak semua build SQLite punya FTS5.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    text,
+    content='messages',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+"""
+
+COLUMNS = "id, sender, text, timestamp, is_own"
+
+
+class History:
+    RANK_WINDOW = 1000  # pesan cocok terbaru yang diurutkan dengan bm25
+
+    # Pesan per percakapan (identity lawan bicara, lihat Peer.identity_of),
+    # urut berdasarkan id.
+    # append() langsung memberi id dan hanya memasukkan pesan ke antrian;
+    # thread writer menulis antrian dalam satu transaksi per batch (WAL,
+    # synchronous=NORMAL), paling lambat flush_interval setelah pesan pertama
+    # di antrian. Pembacaan per halaman lewat index (peer_id, id),
+    # jadi biayanya tidak bergantung jumlah pesan yang tersimpan. Pesan yang
+    # belum ditulis ikut dikembalikan oleh page(). Index FTS5 di-update
+    # dalam transaksi batch yang sama, search() melihat pesan setelah batch-nya
+    # ditulis.
+
+    def __init__(self, path: str = ":memory:", batch_size: int = 1024, flush_interval: float = 0.05):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval  # detik menunggu batch terisi
+        self.closed = False
+        self.written = 0
+        self._lock = threading.Lock()       # koneksi baca
+        self._cond = threading.Condition()  # antrian tulis
+        self._pending = deque()             # (id, peer_id, sender, text, timestamp, is_own)
+        self._writing = []                  # batch yang sedang ditulis, masih terbaca
+        self._db = self._connect()
+        self._db.executescript(SCHEMA)
+        self.searchable = self._create_index()
+        if path == ":memory:":
+            # One in-memory database, reads and writes share the connection
+            self._writer_db = self._db
+            self._write_lock = self._lock
+        else:
+            self._writer_db = self._connect()
+            self._write_lock = threading.Lock()
+        self._next_id = (self._db.execute("SELECT MAX(id) FROM messages").fetchone()[0] or 0) + 1
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def _create_index(self) -> bool:
+        try:
+            exists = self._db.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'"
+            ).fetchone()
+            self._db.executescript(FTS_SCHEMA)
+            if not exists:
+                # Messages stored before the index existed
+                self._db.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SQLite without FTS5 ({e}), search scans messages")
+            return False
+        return True
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        if self.path != ":memory:":
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def append(self, peer_id: str, sender: str, text: str, timestamp: int, is_own: bool = False) -> dict:
+        # simpan pesan (asinkron), return entry dengan id-nya
+        with self._cond:
+            row = (self._next_id, peer_id, sender, text, timestamp, int(is_own))
+            self._next_id += 1
+            self._pending.append(row)
+            # The first row starts the flush_interval timer, a full batch
+            # cuts it short
+            if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                self._cond.notify()
+        return self._entry(row[0], sender, text, timestamp, is_own)
+
+    def page(self, peer_id: str, before: Optional[int] = None, limit: int = 50) -> List[dict]:
+        # `limit` pesan terbaru dengan id < before (None = paling baru), urut lama ke baru
+        before = before if before is not None else self._next_id
+        with self._cond:
+            # Unwritten rows are always newer than everything on disk
+            queued = [row for row in list(self._writing) + list(self._pending)
+                      if row[1] == peer_id and row[0] < before][-limit:]
+        rows = self._select(
+            f"SELECT {COLUMNS} FROM messages WHERE peer_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+            (peer_id, queued[0][0] if queued else before, limit - len(queued))
+        ) if len(queued) < limit else []
+        rows.reverse()
+        return [self._entry(*row) for row in rows] + [
+            self._entry(row[0], *row[2:]) for row in queued
+        ]
+
+    def page_after(self, peer_id: str, after: int, limit: int = 50) -> List[dict]:
+        # `limit` pesan berikutnya dengan id > after, urut lama ke baru
+        rows = self._select(
+            f"SELECT {COLUMNS} FROM messages WHERE peer_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (peer_id, after, limit)
+        )
+        entries = [self._entry(*row) for row in rows]
+        if len(entries) < limit:
+            last = entries[-1]["id"] if entries else after
+            with self._cond:
+                queued = [row for row in list(self._writing) + list(self._pending)
+                          if row[1] == peer_id and row[0] > last]
+            entries += [self._entry(row[0], *row[2:]) for row in queued[:limit - len(entries)]]
+        return entries
+
+    def peer_name(self, peer_id: str) -> Optional[str]:
+        # nama terakhir yang dipakai lawan bicara di percakapan ini, untuk
+        # percakapan dengan peer yang sudah tidak terhubung
+        with self._cond:
+            queued = [row for row in list(self._writing) + list(self._pending)
+                      if row[1] == peer_id and not row[5]]
+        if queued:
+            return queued[-1][2]
+        rows = self._select(
+            "SELECT sender FROM messages WHERE peer_id = ? AND is_own = 0 ORDER BY id DESC LIMIT 1",
+            (peer_id,)
+        )
+        return rows[0][0] if rows else None
+
+    def search(
+        self,
+        query: str,
+        peer_id: Optional[str] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> List[dict]:
+        # cari pesan yang mengandung semua kata di query (kata terakhir boleh
+        # prefix), yang paling relevan (bm25) dulu; bisa difilter per peer dan
+        # rentang timestamp [since, until) dalam mikrodetik. Yang diurutkan
+        # hanya RANK_WINDOW pesan cocok terbaru (atau sampai halaman yang
+        # diminta), jadi kata yang muncul di jutaan pesan tidak perlu dinilai
+        # semuanya.
+        terms = query.split()
+        if not terms:
+            return []
+        where, params = [], []
+        if peer_id is not None:
+            where.append("m.peer_id = ?")
+            params.append(peer_id)
+        if since is not None:
+            where.append("m.timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("m.timestamp < ?")
+            params.append(until)
+
+        if self.searchable:
+            # Each word as a quoted string, so FTS5 operators in the input are plain text
+            match = " ".join('"' + term.replace('"', '""') + '"' for term in terms) + "*"
+            # FTS5 walks the matches newest first without scoring the rest
+            sql = (
+                "SELECT id, peer_id, sender, text, timestamp, is_own, snippet FROM ("
+                "SELECT m.id, m.peer_id, m.sender, m.text, m.timestamp, m.is_own, "
+                "snippet(messages_fts, 0, '[', ']', '…', 10) AS snippet, "
+                "bm25(messages_fts) AS score "
+                "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+                "WHERE messages_fts MATCH ?"
+                + "".join(f" AND {clause}" for clause in where)
+                + " ORDER BY messages_fts.rowid DESC LIMIT ?"
+                ") ORDER BY score, id DESC LIMIT ? OFFSET ?"
+            )
+            params = [match] + params + [max(self.RANK_WINDOW, offset + limit)]
+        else:
+            for term in terms:
+                where.append("m.text LIKE ? ESCAPE '\\'")
+                escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                params.append(f"%{escaped}%")
+            sql = (
+                "SELECT m.id, m.peer_id, m.sender, m.text, m.timestamp, m.is_own, m.text "
+                "FROM messages m WHERE " + " AND ".join(where)
+                + " ORDER BY m.id DESC LIMIT ? OFFSET ?"
+            )
+
+        try:
+            rows = self._select(sql, tuple(params) + (limit, offset))
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Search failed for {query!r}: {e}")
+            return []
+        results = []
+        for row_id, conversation, sender, text, timestamp, is_own, snippet in rows:
+            entry = self._entry(row_id, sender, text, timestamp, is_own)
+            entry["peer_id"] = conversation
+            entry["snippet"] = snippet
+            results.append(entry)
+        return results
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        # tunggu sampai semua pesan di antrian tertulis
+        with self._cond:
+            self._cond.notify()
+            return self._cond.wait_for(lambda: not self._pending and not self._writing, timeout)
+
+    def close(self):
+        # tulis sisa antrian lalu tutup file
+        with self._cond:
+            if self.closed:
+                return
+            self.closed = True
+            self._cond.notify()
+        self._thread.join()
+        with self._lock:
+            try:
+                self._db.close()
+                if self._writer_db is not self._db:
+                    self._writer_db.close()
+            except sqlite3.Error as e:
+                logger.error(f"Error closing history: {e}")
+
+    def _select(self, sql: str, params: tuple) -> list:
+        with self._lock:
+            if self.closed:
+                return []
+            return self._db.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _entry(row_id: int, sender: str, text: str, timestamp: int, is_own) -> dict:
+        return {"id": row_id, "sender": sender, "text": text, "timestamp": timestamp, "is_own": bool(is_own)}
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                if not self._pending and not self.closed:
+                    self._cond.wait()
+                if self._pending and len(self._pending) < self.batch_size and not self.closed:
+                    # Give a burst a moment to fill the batch
+                    self._cond.wait(self.flush_interval)
+                if not self._pending:
+                    if self.closed:
+                        return
+                    continue
+                count = min(len(self._pending), self.batch_size)
+                self._writing = [self._pending.popleft() for _ in range(count)]
+                batch = self._writing
+
+            with self._write_lock:
+                db = self._writer_db
+                try:
+                    db.execute("BEGIN")
+                    db.executemany("INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?)", batch)
+                    if self.searchable:
+                        db.executemany(
+                            "INSERT INTO messages_fts (rowid, text) VALUES (?, ?)",
+                            [(row[0], row[3]) for row in batch]
+                        )
+                    db.execute("COMMIT")
+                    self.written += len(batch)
+                except sqlite3.Error as e:
+                    logger.error(f"Error writing history, {len(batch)} messages lost: {e}")
+                    # Otherwise the next batch's BEGIN fails on the open transaction
+                    if db.in_transaction:
+                        try:
+                            db.execute("ROLLBACK")
+                        except sqlite3.Error as e:
+                            logger.error(f"Error rolling back history: {e}")
+
+            with self._cond:
+                self._writing = []
+                self._cond.notify_all()
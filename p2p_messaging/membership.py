@@ -0,0 +1,240 @@
+# Membership gossip ala HyParView: active view (terkoneksi) dan passive view (cadangan),
+# plus daftar seluruh member dengan versi untuk sinkronisasi delta
+import hashlib
+import random
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+# Dial ke peer lain: "high" selalu diterima, "low" ditolak kalau active view penuh
+PRIORITY_HIGH = "high"
+PRIORITY_LOW = "low"
+
+# Diumumkan di JOIN dan PEERS. SHUFFLE/SHUFFLE_REPLY dan delta member hanya
+# dikirim ke peer yang mengumumkannya; peer lama tidak mengenal tipe pesannya
+MEMBERSHIP_PROTOCOL = "hyparview"
+
+
+class PartialView:
+    # Active view berisi peer yang sedang terkoneksi (ukurannya dibatasi),
+    # passive view berisi alamat peer lain untuk mengganti link yang putus.
+    # Isi passive view diperbarui lewat shuffle berkala dengan neighbor.
+    # Entry berupa dict PeerInfo ({"peer_id", "identity", "name", "host", "port"}).
+
+    def __init__(
+        self,
+        self_id: str,
+        active_size: int = 8,
+        passive_size: int = 32,
+        rng: Optional[random.Random] = None
+    ):
+        self.self_id = self_id
+        self.active_size = active_size
+        self.passive_size = passive_size
+        self.active: Dict[str, dict] = {}   # peer_id -> info
+        self.passive: Dict[str, dict] = {}  # peer_id -> info
+        self.rng = rng or random.Random()
+
+    def is_full(self) -> bool:
+        return len(self.active) >= self.active_size
+
+    def add_active(self, info: dict) -> Optional[str]:
+        # tambah ke active view, return peer_id yang harus diputus kalau penuh
+        peer_id = info["peer_id"]
+        self.passive.pop(peer_id, None)
+        self.active[peer_id] = info
+        if len(self.active) <= self.active_size:
+            return None
+        victims = [pid for pid in self.active if pid != peer_id]
+        return self.rng.choice(victims)
+
+    def remove_active(self, peer_id: str, keep: bool = True):
+        # hapus dari active view; keep=True memindahkannya ke passive view
+        info = self.active.pop(peer_id, None)
+        if info is not None and keep:
+            self.add_passive([info])
+
+    def add_passive(self, entries: Iterable[dict], replace: Iterable[str] = ()):
+        # tambah entry ke passive view; kalau penuh buang yang ada di
+        # `replace` dulu (entry yang baru saja kita kirim), lalu acak
+        replace = [pid for pid in replace if pid in self.passive]
+        for info in entries:
+            peer_id = info.get("peer_id")
+            if not peer_id or peer_id == self.self_id or peer_id in self.active:
+                continue
+            if peer_id not in self.passive and len(self.passive) >= self.passive_size:
+                if replace:
+                    self.passive.pop(replace.pop(), None)
+                else:
+                    self.passive.pop(self.rng.choice(list(self.passive)))
+            self.passive[peer_id] = info
+
+    def remove_passive(self, peer_id: str):
+        self.passive.pop(peer_id, None)
+
+    def sample(self, count: int, exclude: Iterable[str] = ()) -> List[dict]:
+        # sampel acak dari kedua view, untuk balasan JOIN dan shuffle
+        exclude = set(exclude)
+        pool = [
+            info for pid, info in list(self.active.items()) + list(self.passive.items())
+            if pid not in exclude
+        ]
+        return self.rng.sample(pool, min(count, len(pool)))
+
+    def candidates(self, count: int, exclude: Iterable[str] = ()) -> List[dict]:
+        # peer dari passive view untuk dipromosikan ke active view
+        exclude = set(exclude)
+        pool = [info for pid, info in self.passive.items() if pid not in exclude]
+        return self.rng.sample(pool, min(count, len(pool)))
+
+    def shuffle_target(self, exclude: Iterable[str] = ()) -> Optional[str]:
+        # neighbor acak untuk diajak shuffle
+        exclude = set(exclude)
+        pool = [pid for pid in self.active if pid not in exclude]
+        if not pool:
+            return None
+        return self.rng.choice(pool)
+
+
+# Maksimal entry member per frame PEERS saat sinkronisasi
+MEMBERS_PER_FRAME = 256
+# Field PeerInfo yang disimpan dari entry member
+MEMBER_INFO_KEYS = ("peer_id", "identity", "name", "host", "port")
+
+
+def _entry_hash(peer_id: str, incarnation: int, alive: bool) -> int:
+    # hash 64-bit yang sama di semua proses (hash() bawaan diacak per proses)
+    data = f"{peer_id}:{incarnation}:{int(alive)}".encode()
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+class Member:
+    # satu entry di MemberTable
+
+    __slots__ = ("info", "incarnation", "alive", "version", "source", "since")
+
+    def __init__(self, info: dict, incarnation: int, alive: bool, version: int, source: Optional[str]):
+        self.info = info
+        self.incarnation = incarnation
+        self.alive = alive
+        self.version = version  # versi lokal saat entry terakhir berubah
+        self.source = source    # neighbor asal perubahan (None = kita sendiri)
+        self.since = time.monotonic()
+
+    def to_dict(self) -> dict:
+        entry = dict(self.info)
+        entry["incarnation"] = self.incarnation
+        entry["alive"] = self.alive
+        return entry
+
+
+class MemberTable:
+    # Daftar semua peer di jaringan (bukan hanya neighbor), diberi versi
+    # lokal: setiap perubahan entry mendapat versi baru, jadi neighbor cukup
+    # dikirimi entry dengan versi di atas yang terakhir mereka terima.
+    # Konflik diselesaikan dengan incarnation yang hanya dinaikkan oleh peer
+    # pemilik entry; pada incarnation yang sama "mati" menang. Digest = XOR
+    # hash semua entry, diperbarui per perubahan, untuk cek beda saat handshake.
+
+    def __init__(self, self_id: str, tombstone_ttl: float = 600.0):
+        self.self_id = self_id
+        self.tombstone_ttl = tombstone_ttl
+        self.version = 0
+        self.digest = 0
+        self._members: "OrderedDict[str, Member]" = OrderedDict()  # urut versi
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def get(self, peer_id: str) -> Optional[Member]:
+        return self._members.get(peer_id)
+
+    def alive(self) -> List[dict]:
+        # info semua peer yang hidup, selain kita sendiri
+        return [
+            m.info for pid, m in self._members.items()
+            if m.alive and pid != self.self_id
+        ]
+
+    def announce(self, info: dict) -> bool:
+        # entry kita sendiri; incarnation naik kalau isinya berubah
+        current = self._members.get(self.self_id)
+        if current is not None and current.alive and current.info == info:
+            return False
+        incarnation = 0 if current is None else current.incarnation + 1
+        self._set(self.self_id, info, incarnation, True, None)
+        return True
+
+    def merge(self, entries: Iterable[dict], source: Optional[str] = None) -> int:
+        # terapkan entry dari neighbor, return jumlah yang mengubah tabel
+        changed = 0
+        for entry in entries:
+            peer_id = entry.get("peer_id")
+            if not peer_id:
+                continue
+            incarnation = entry.get("incarnation", 0)
+            alive = bool(entry.get("alive", True))
+            current = self._members.get(peer_id)
+
+            if peer_id == self.self_id:
+                # Someone thinks we are gone: outbid it with a higher incarnation
+                if current is not None and incarnation >= current.incarnation and not alive:
+                    self._set(peer_id, current.info, incarnation + 1, True, None)
+                    changed += 1
+                continue
+
+            if current is not None:
+                if incarnation < current.incarnation:
+                    continue
+                if incarnation == current.incarnation and (alive or not current.alive):
+                    continue
+            info = {key: entry[key] for key in MEMBER_INFO_KEYS if key in entry}
+            self._set(peer_id, info, incarnation, alive, source)
+            changed += 1
+        return changed
+
+    def mark_dead(self, peer_id: str) -> bool:
+        # peer keluar atau tidak bisa dihubungi lagi
+        current = self._members.get(peer_id)
+        if current is None or not current.alive or peer_id == self.self_id:
+            return False
+        self._set(peer_id, current.info, current.incarnation, False, None)
+        return True
+
+    def delta(self, since: int, limit: int = MEMBERS_PER_FRAME, exclude: Optional[str] = None):
+        # (entry dengan versi > since, versi terakhir yang tercakup); entry
+        # yang berasal dari `exclude` tidak perlu dikirim balik ke sana
+        newer = []
+        for member in reversed(self._members.values()):
+            if member.version <= since:
+                break
+            newer.append(member)
+        newer.reverse()
+        if not newer:
+            return [], self.version
+        chunk = newer[:limit]
+        entries = [m.to_dict() for m in chunk if m.source is None or m.source != exclude]
+        return entries, chunk[-1].version
+
+    def expire(self, now: Optional[float] = None) -> int:
+        # buang tombstone yang sudah lebih lama dari tombstone_ttl
+        now = time.monotonic() if now is None else now
+        expired = [
+            pid for pid, m in self._members.items()
+            if not m.alive and now - m.since > self.tombstone_ttl
+        ]
+        for pid in expired:
+            member = self._members.pop(pid)
+            self.digest ^= _entry_hash(pid, member.incarnation, member.alive)
+        return len(expired)
+
+    def digest_hex(self) -> str:
+        return f"{self.digest:016x}"
+
+    def _set(self, peer_id: str, info: dict, incarnation: int, alive: bool, source: Optional[str]):
+        old = self._members.pop(peer_id, None)
+        if old is not None:
+            self.digest ^= _entry_hash(peer_id, old.incarnation, old.alive)
+        self.version += 1
+        self._members[peer_id] = Member(info, incarnation, alive, self.version, source)
+        self.digest ^= _entry_hash(peer_id, incarnation, alive)
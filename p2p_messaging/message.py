@@ -1,8 +1,16 @@
 # Protokol pesan P2P
 import json
+import struct
+import sys
 from enum import Enum
-from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from .utils import now_us, parse_timestamp, format_timestamp
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
 
 
 class MessageType(Enum):
@@ -15,10 +23,71 @@ class MessageType(Enum):
     PING = "PING"               # Health check
     PONG = "PONG"               # Response to ping
     DISCOVERY = "DISCOVERY"     # Peer discovery request
+    SHUFFLE = "SHUFFLE"         # Tukar sampel passive view
+    SHUFFLE_REPLY = "SHUFFLE_REPLY"  # Balasan shuffle
+    ACK = "ACK"                 # Ack kumulatif/selektif untuk MESSAGE
+
+
+# Lane antrian kirim per koneksi: frame di lane control selalu dikirim lebih
+# dulu dari interactive, interactive lebih dulu dari bulk. Urutan frame hanya
+# dijamin di dalam satu lane, kecuali ORDERED_TYPES yang selalu keluar sesuai
+# urutan kirim.
+LANE_CONTROL = 0
+LANE_INTERACTIVE = 1
+LANE_BULK = 2
+LANES = 3
+
+# Chat dengan payload lebih besar dari ini lewat lane bulk
+BULK_THRESHOLD = 16 * 1024
+
+MESSAGE_LANES: Dict[MessageType, int] = {
+    MessageType.PING: LANE_CONTROL,
+    MessageType.PONG: LANE_CONTROL,
+    MessageType.ACK: LANE_CONTROL,
+    MessageType.JOIN: LANE_CONTROL,
+    MessageType.PEERS: LANE_CONTROL,
+    MessageType.SHUFFLE: LANE_CONTROL,
+    MessageType.SHUFFLE_REPLY: LANE_CONTROL,
+    MessageType.DISCOVERY: LANE_CONTROL,
+    MessageType.MESSAGE: LANE_INTERACTIVE,
+    MessageType.BROADCAST: LANE_INTERACTIVE,
+    # LEAVE closes the link, so it goes out after everything queued before it
+    MessageType.LEAVE: LANE_BULK,
+}
+
+# Chat dan LEAVE satu stream berurutan: chat kecil setelah chat besar ikut
+# menunggu di lane bulk, dan LEAVE tidak mendahului chat sebelumnya
+ORDERED_TYPES = frozenset((MessageType.MESSAGE, MessageType.BROADCAST, MessageType.LEAVE))
+
+
+def message_lane(msg_type: MessageType, size: int) -> int:
+    """Send lane for a frame of `size` bytes"""
+    lane = MESSAGE_LANES.get(msg_type, LANE_INTERACTIVE)
+    if lane == LANE_INTERACTIVE and size > BULK_THRESHOLD:
+        return LANE_BULK
+    return lane
+
+
+# TTL terbesar yang muat di header binary (1 byte)
+MAX_TTL = 255
+
+# Penanda data yang belum di-decode
+_UNDECODED = object()
+# to_json() menulis "data" paling akhir setelah field header. Kutip di dalam
+# string JSON selalu di-escape, jadi kemunculan pertama pola ini pasti key "data"
+_JSON_DATA = b', "data": '
 
 
 class Message:
     # Representasi pesan P2P
+    # timestamp = mikrodetik sejak epoch (int), diformat hanya saat ditampilkan
+    # Header routing (type, sender, target, msg_id, ttl, seq) selalu di-decode;
+    # data dari codec biner baru di-decode saat pertama kali dibaca.
+    
+    __slots__ = (
+        "msg_type", "sender_id", "sender_name", "timestamp", "target_id", "msg_id", "ttl", "seq",
+        "_data", "_raw", "_raw_codec", "_loads"
+    )
     
     def __init__(
         self,
@@ -26,49 +95,118 @@ class Message:
         sender_id: str,
         sender_name: str,
         data: Any = None,
-        target_id: Optional[str] = None
+        target_id: Optional[str] = None,
+        timestamp: Optional[int] = None,
+        msg_id: Optional[int] = None,
+        ttl: Optional[int] = None,
+        seq: Optional[int] = None
     ):
         self.msg_type = msg_type
         self.sender_id = sender_id
         self.sender_name = sender_name
-        self.timestamp = datetime.now().isoformat()
-        self.data = data
+        self.timestamp = now_us() if timestamp is None else timestamp
         self.target_id = target_id
+        self.msg_id = msg_id
+        self.ttl = ttl
+        self.seq = seq
+        self._data = data
+        self._raw = None
+        self._raw_codec = None
+        self._loads = None
     
-    def to_dict(self) -> Dict[str, Any]:
-        # ubah ke dict
-        return {
+    @property
+    def data(self) -> Any:
+        if self._data is _UNDECODED:
+            self._data = self._loads(self._raw)
+        return self._data
+    
+    @data.setter
+    def data(self, value: Any):
+        self._data = value
+        self._raw = None
+        self._raw_codec = None
+    
+    @property
+    def has_data(self) -> bool:
+        # ada data, tanpa men-decode data yang masih lazy
+        return self._data is not None
+    
+    def set_raw(self, raw: bytes, codec_name: str, loads: Optional[Callable[[bytes], Any]] = None):
+        # simpan bytes data asli dari codec; kalau loads diberikan, data di-decode nanti
+        self._raw = raw
+        self._raw_codec = codec_name
+        if loads is not None:
+            self._data = _UNDECODED
+            self._loads = loads
+    
+    def hop(self) -> bool:
+        # kurangi TTL sebelum diteruskan, False kalau TTL habis
+        if self.ttl is None:
+            return True
+        self.ttl -= 1
+        return self.ttl > 0
+    
+    def raw_body(self, codec_name: str) -> Optional[bytes]:
+        # bytes data asli untuk diteruskan apa adanya, None kalau formatnya beda
+        return self._raw if self._raw_codec == codec_name else None
+    
+    def format_time(self, fmt: str = "%H:%M") -> str:
+        # format timestamp untuk tampilan
+        return format_timestamp(self.timestamp, fmt)
+    
+    def header_dict(self) -> Dict[str, Any]:
+        # field header saja, data lazy tidak ikut di-decode
+        result = {
             "type": self.msg_type.value,
             "sender_id": self.sender_id,
             "sender_name": self.sender_name,
             "timestamp": self.timestamp,
-            "data": self.data,
             "target_id": self.target_id
         }
+        if self.msg_id is not None:
+            result["msg_id"] = self.msg_id
+        if self.ttl is not None:
+            result["ttl"] = self.ttl
+        if self.seq is not None:
+            result["seq"] = self.seq
+        return result
+    
+    def to_dict(self) -> Dict[str, Any]:
+        # ubah ke dict
+        result = self.header_dict()
+        # data paling akhir, lihat JsonCodec.decode
+        result["data"] = self.data
+        return result
     
     def to_json(self) -> str:
         # ubah ke JSON
         # Ubah pesan ke JSON
         return json.dumps(self.to_dict())
     
+    def to_payload(self) -> bytes:
+        # ubah ke payload JSON (tanpa framing)
+        return self.to_json().encode('utf-8')
+    
     def to_bytes(self) -> bytes:
         # ubah ke bytes
-        # Ubah pesan ke bytes untuk transmisi jaringan
+        # Ubah pesan ke bytes untuk transmisi jaringan (framing newline)
         return (self.to_json() + "\n").encode('utf-8')
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Message':
         # buat dari dict
         # Buat pesan dari dictionary
-        msg = cls(
+        return cls(
             msg_type=MessageType(data["type"]),
             sender_id=data["sender_id"],
             sender_name=data["sender_name"],
             data=data.get("data"),
-            target_id=data.get("target_id")
+            target_id=data.get("target_id"),
+            timestamp=parse_timestamp(data.get("timestamp")),
+            msg_id=data.get("msg_id"),
+            ttl=data.get("ttl"),
+            seq=data.get("seq")
         )
-        msg.timestamp = data.get("timestamp", msg.timestamp)
-        return msg
     
     @classmethod
     def from_json(cls, json_str: str) -> 'Message':
@@ -76,6 +214,11 @@ class Message:
         # Buat pesan dari JSON
         return cls.from_dict(json.loads(json_str))
     
+    @classmethod
+    def from_payload(cls, payload) -> 'Message':
+        # buat dari payload (bytes atau memoryview), decode UTF-8 sekali
+        return cls.from_dict(json.loads(str(payload, 'utf-8')))
+    
     @classmethod
     def from_bytes(cls, data: bytes) -> 'Message':
         # buat dari bytes
@@ -84,3 +227,342 @@ class Message:
     
     def __str__(self) -> str:
         return f"[{self.msg_type.value}] {self.sender_name}: {self.data}"
+
+
+# ---- Codec ----
+
+class AliasTable:
+    # Alias integer untuk (peer id, nama) per koneksi.
+    # tx dipakai saat encode, rx saat decode; keduanya di-reset saat
+    # protokol koneksi diganti sehingga kedua sisi selalu sinkron.
+    
+    MAX_ALIASES = 0xFFFF
+    
+    def __init__(self):
+        self.tx: Dict[Tuple[str, Optional[str]], int] = {}
+        self.rx: Dict[int, Tuple[str, Optional[str]]] = {}
+    
+    def outgoing(self, key: Tuple[str, Optional[str]]) -> Tuple[Optional[int], bool]:
+        # (alias, baru?) untuk key, alias None kalau tabel penuh
+        alias = self.tx.get(key)
+        if alias is not None:
+            return alias, False
+        if len(self.tx) >= self.MAX_ALIASES:
+            return None, False
+        alias = self.tx[key] = len(self.tx)
+        return alias, True
+    
+    def truncate(self, size: int):
+        # batalkan alias tx yang dibuat setelah tabel berisi `size` alias
+        for key in [key for key, alias in self.tx.items() if alias >= size]:
+            del self.tx[key]
+    
+    def define(self, alias: int, peer_id: str, name: Optional[str]):
+        # simpan alias dari peer, string di-intern supaya dipakai ulang per pesan
+        self.rx[alias] = (sys.intern(peer_id), sys.intern(name) if name is not None else None)
+
+
+class Codec:
+    # encode/decode Message ke payload satu frame
+    # Payload = header (per koneksi) + body (bisa dipakai bersama banyak penerima)
+    name = ""
+    binary = False  # payload boleh berisi newline, butuh framing "length"
+    
+    def encode_header(self, message: Message, aliases: Optional[AliasTable] = None) -> bytes:
+        return b""
+    
+    def encode_body(self, message: Message) -> bytes:
+        raise NotImplementedError
+    
+    def encode(self, message: Message, aliases: Optional[AliasTable] = None) -> bytes:
+        return self.encode_header(message, aliases) + self.encode_body(message)
+    
+    def decode(self, payload, aliases: Optional[AliasTable] = None) -> Message:
+        raise NotImplementedError
+
+
+class JsonCodec(Codec):
+    # format lama, JSON dengan nama field lengkap
+    name = "json"
+    
+    def encode_body(self, message: Message) -> bytes:
+        raw = message.raw_body(self.name)
+        if raw is None:
+            return message.to_payload()
+        # Relay: only the header is serialized again (with the decremented
+        # TTL), the data bytes are passed on as received
+        header = json.dumps(message.header_dict()).encode('utf-8')
+        return b"".join((header[:-1], _JSON_DATA, raw, b"}"))
+    
+    def decode(self, payload, aliases: Optional[AliasTable] = None) -> Message:
+        raw = bytes(payload)
+        split = raw.find(_JSON_DATA)
+        if split > 0 and raw.endswith(b"}"):
+            # Header first, data last: parse the header only, data waits
+            # for message.data
+            try:
+                header = json.loads(raw[:split] + b"}")
+            except ValueError:
+                header = None
+            # Older peers write target_id after data, parse those in full
+            if isinstance(header, dict) and "target_id" in header:
+                message = Message.from_dict(header)
+                data = raw[split + len(_JSON_DATA):-1]
+                if data != b"null":
+                    message.set_raw(data, self.name, self.loads)
+                return message
+        return Message.from_payload(payload)
+    
+    def loads(self, raw) -> Any:
+        return json.loads(str(raw, 'utf-8'))
+
+
+class BinaryCodec(Codec):
+    # Format biner dengan struct:
+    #   header  : type code (B), flags (H), timestamp mikrodetik (q)
+    #   msg_id  : (Q) hanya kalau FLAG_MSG_ID
+    #   ttl     : (B) hanya kalau FLAG_TTL
+    #   seq     : (I) hanya kalau FLAG_SEQ
+    #   sender  : alias (H) kalau FLAG_SENDER_ALIAS, selain itu
+    #             [alias baru (H) kalau FLAG_SENDER_DEFINE]
+    #             + 8 byte (peer id hex 16 char) atau panjang (B) + UTF-8
+    #             + nama: panjang (H) + UTF-8
+    #   target  : seperti sender tanpa nama, hanya kalau FLAG_TARGET
+    #   data    : sisa payload, JSON ringkas (atau msgpack di subclass),
+    #             di-decode lazy saat message.data dibaca
+    name = "binary"
+    binary = True
+    
+    HEADER = struct.Struct(">BHq")
+    MSG_ID = struct.Struct(">Q")
+    TTL = struct.Struct(">B")
+    SEQ = struct.Struct(">I")
+    LENGTH8 = struct.Struct(">B")
+    LENGTH16 = struct.Struct(">H")
+    ALIAS = struct.Struct(">H")
+    
+    FLAG_TARGET = 0x01
+    FLAG_SENDER_HEX = 0x02
+    FLAG_TARGET_HEX = 0x04
+    FLAG_DATA = 0x08
+    FLAG_SENDER_ALIAS = 0x10
+    FLAG_SENDER_DEFINE = 0x20
+    FLAG_TARGET_ALIAS = 0x40
+    FLAG_TARGET_DEFINE = 0x80
+    FLAG_MSG_ID = 0x100
+    FLAG_TTL = 0x200
+    FLAG_SEQ = 0x400
+    
+    # (alias, define, hex) flags per peer field
+    SENDER_FLAGS = (FLAG_SENDER_ALIAS, FLAG_SENDER_DEFINE, FLAG_SENDER_HEX)
+    TARGET_FLAGS = (FLAG_TARGET_ALIAS, FLAG_TARGET_DEFINE, FLAG_TARGET_HEX)
+    
+    # Codes follow declaration order; new MessageTypes must only be appended
+    TYPE_CODES = {msg_type: code for code, msg_type in enumerate(MessageType)}
+    TYPES = list(MessageType)
+    
+    def encode_header(self, message: Message, aliases: Optional[AliasTable] = None) -> bytes:
+        flags = 0
+        parts = [b""]
+        
+        if message.msg_id is not None:
+            flags |= self.FLAG_MSG_ID
+            parts.append(self.MSG_ID.pack(message.msg_id))
+        if message.ttl is not None:
+            flags |= self.FLAG_TTL
+            # TTL dari peer JSON bisa lebih dari 1 byte, potong ke MAX_TTL
+            parts.append(self.TTL.pack(min(max(message.ttl, 0), MAX_TTL)))
+        if message.seq is not None:
+            flags |= self.FLAG_SEQ
+            parts.append(self.SEQ.pack(message.seq))
+        
+        sender_flags, sender = self._pack_peer(
+            message.sender_id, message.sender_name, aliases, self.SENDER_FLAGS
+        )
+        flags |= sender_flags
+        parts.append(sender)
+        
+        if message.target_id is not None:
+            target_flags, target = self._pack_peer(message.target_id, None, aliases, self.TARGET_FLAGS)
+            flags |= self.FLAG_TARGET | target_flags
+            parts.append(target)
+        # Lazy data stays undecoded, a relayed frame keeps its original body
+        if message.has_data:
+            flags |= self.FLAG_DATA
+        
+        parts[0] = self.HEADER.pack(self.TYPE_CODES[message.msg_type], flags, message.timestamp)
+        return b"".join(parts)
+    
+    def encode_body(self, message: Message) -> bytes:
+        raw = message.raw_body(self.name)
+        if raw is not None:
+            return raw
+        return self.dumps(message.data) if message.has_data else b""
+    
+    def decode(self, payload, aliases: Optional[AliasTable] = None) -> Message:
+        view = memoryview(payload)
+        code, flags, timestamp = self.HEADER.unpack_from(view, 0)
+        offset = self.HEADER.size
+        
+        msg_id = None
+        if flags & self.FLAG_MSG_ID:
+            (msg_id,) = self.MSG_ID.unpack_from(view, offset)
+            offset += self.MSG_ID.size
+        ttl = None
+        if flags & self.FLAG_TTL:
+            (ttl,) = self.TTL.unpack_from(view, offset)
+            offset += self.TTL.size
+        seq = None
+        if flags & self.FLAG_SEQ:
+            (seq,) = self.SEQ.unpack_from(view, offset)
+            offset += self.SEQ.size
+        
+        sender_id, sender_name, offset = self._unpack_peer(
+            view, offset, flags, aliases, self.SENDER_FLAGS, True
+        )
+        
+        target_id = None
+        if flags & self.FLAG_TARGET:
+            target_id, _, offset = self._unpack_peer(
+                view, offset, flags, aliases, self.TARGET_FLAGS, False
+            )
+        
+        message = Message(
+            msg_type=self.TYPES[code],
+            sender_id=sender_id,
+            sender_name=sender_name,
+            target_id=target_id,
+            timestamp=timestamp,
+            msg_id=msg_id,
+            ttl=ttl,
+            seq=seq
+        )
+        if flags & self.FLAG_DATA:
+            # Copy out of the receive buffer; decoding waits for message.data
+            message.set_raw(bytes(view[offset:]), self.name, self.loads)
+        return message
+    
+    # Reused encoder; json.dumps() builds a new one when options are given
+    DATA_ENCODER = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+    
+    def dumps(self, data: Any) -> bytes:
+        return self.DATA_ENCODER.encode(data).encode('utf-8')
+    
+    def loads(self, raw) -> Any:
+        return json.loads(str(raw, 'utf-8'))
+    
+    def _pack_peer(self, peer_id: str, name: Optional[str], aliases: Optional[AliasTable],
+                   field_flags: Tuple[int, int, int]) -> Tuple[int, bytes]:
+        # encode peer (dan nama), return (flags, bytes)
+        flag_alias, flag_define, flag_hex = field_flags
+        flags = 0
+        prefix = b""
+        if aliases is not None:
+            alias, is_new = aliases.outgoing((peer_id, name))
+            if alias is not None and not is_new:
+                return flag_alias, self.ALIAS.pack(alias)
+            if is_new:
+                flags |= flag_define
+                prefix = self.ALIAS.pack(alias)
+        
+        raw, is_hex = self._pack_id(peer_id)
+        if is_hex:
+            flags |= flag_hex
+        if name is None:
+            return flags, prefix + raw
+        encoded_name = name.encode('utf-8')
+        return flags, prefix + raw + self.LENGTH16.pack(len(encoded_name)) + encoded_name
+    
+    def _unpack_peer(self, view: memoryview, offset: int, flags: int, aliases: Optional[AliasTable],
+                     field_flags: Tuple[int, int, int], has_name: bool):
+        # decode peer, return (peer_id, nama, offset baru)
+        flag_alias, flag_define, flag_hex = field_flags
+        if flags & flag_alias:
+            (alias,) = self.ALIAS.unpack_from(view, offset)
+            if aliases is None or alias not in aliases.rx:
+                raise ValueError(f"Unknown peer alias {alias}")
+            peer_id, name = aliases.rx[alias]
+            return peer_id, name, offset + self.ALIAS.size
+        
+        alias = None
+        if flags & flag_define:
+            (alias,) = self.ALIAS.unpack_from(view, offset)
+            offset += self.ALIAS.size
+        
+        peer_id, offset = self._unpack_id(view, offset, flags & flag_hex)
+        name = None
+        if has_name:
+            (length,) = self.LENGTH16.unpack_from(view, offset)
+            offset += self.LENGTH16.size
+            name = str(view[offset:offset + length], 'utf-8')
+            offset += length
+        
+        if alias is not None and aliases is not None:
+            aliases.define(alias, peer_id, name)
+            peer_id, name = aliases.rx[alias]
+        return peer_id, name, offset
+    
+    def _pack_id(self, peer_id: str) -> Tuple[bytes, bool]:
+        # peer id dari generate_peer_id (16 hex) disimpan sebagai 8 byte
+        if len(peer_id) == 16:
+            try:
+                raw = bytes.fromhex(peer_id)
+                if raw.hex() == peer_id:
+                    return raw, True
+            except ValueError:
+                pass
+        raw = peer_id.encode('utf-8')
+        return self.LENGTH8.pack(len(raw)) + raw, False
+    
+    def _unpack_id(self, view: memoryview, offset: int, is_hex: int) -> Tuple[str, int]:
+        if is_hex:
+            return view[offset:offset + 8].hex(), offset + 8
+        (length,) = self.LENGTH8.unpack_from(view, offset)
+        offset += self.LENGTH8.size
+        return str(view[offset:offset + length], 'utf-8'), offset + length
+
+
+class MsgpackCodec(BinaryCodec):
+    # sama dengan BinaryCodec, field data di-encode dengan msgpack
+    name = "msgpack"
+    
+    def dumps(self, data: Any) -> bytes:
+        return msgpack.packb(data, use_bin_type=True)
+    
+    def loads(self, raw) -> Any:
+        return msgpack.unpackb(raw, raw=False)
+
+
+CODECS: Dict[str, Codec] = {}
+
+# Urutan preferensi, "json" selalu jadi fallback
+SUPPORTED_CODECS: List[str] = []
+DEFAULT_CODEC = "json"
+
+
+def register_codec(codec: Codec, preferred: bool = False):
+    """Register a codec so it can be offered during the handshake"""
+    CODECS[codec.name] = codec
+    if codec.name in SUPPORTED_CODECS:
+        SUPPORTED_CODECS.remove(codec.name)
+    if preferred:
+        SUPPORTED_CODECS.insert(0, codec.name)
+    else:
+        SUPPORTED_CODECS.append(codec.name)
+
+
+def negotiate_codec(offered: Optional[List[str]], binary_safe: bool) -> str:
+    """Pick the first codec we prefer that the remote peer also offered"""
+    for name in SUPPORTED_CODECS:
+        if offered and name in offered:
+            # Binary payloads may contain newlines, skip them on line framing
+            if CODECS[name].binary and not binary_safe:
+                continue
+            return name
+    return DEFAULT_CODEC
+
+
+if msgpack is not None:
+    register_codec(MsgpackCodec())
+register_codec(BinaryCodec())
+register_codec(JsonCodec())
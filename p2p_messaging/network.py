@@ -2,11 +2,241 @@
 import socket
 import threading
 import logging
-from typing import Dict, Callable, Optional, Tuple
-from .message import Message
+from collections import deque
+from typing import Dict, Callable, List, Optional, Tuple
+from .message import (
+    Message, AliasTable, CODECS, DEFAULT_CODEC,
+    LANES, LANE_CONTROL, LANE_INTERACTIVE, LANE_BULK, ORDERED_TYPES, message_lane
+)
+from .framing import FRAMINGS, DEFAULT_FRAMING
 
 logger = logging.getLogger(__name__)
 
+# Kebijakan saat antrian kirim penuh
+OVERFLOW_BLOCK = "block"                # pengirim menunggu (dengan timeout)
+OVERFLOW_DROP_OLDEST = "drop_oldest"    # buang frame paling lama
+OVERFLOW_DISCONNECT = "disconnect"      # putuskan peer yang lambat
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DISCONNECT)
+
+# Batas buffer per syscall sendmsg (IOV_MAX minimal 1024 di Linux/macOS)
+MAX_IOV = 512
+MAX_BATCH_BYTES = 256 * 1024
+# Bulk data per batch is capped so a control frame never waits for much
+BULK_BATCH_BYTES = 64 * 1024
+# Default bytes the kernel may buffer per direction; anything beyond waits
+# in the lanes, where a control frame can still overtake it
+NOTSENT_LOWAT = 128 * 1024
+RECV_BUFFER = 256 * 1024
+
+
+def limit_buffers(
+    sock: socket.socket,
+    recv_buffer: Optional[int] = RECV_BUFFER,
+    notsent_lowat: Optional[int] = NOTSENT_LOWAT
+):
+    # buffer kernel dibuat kecil supaya prioritas lane berlaku untuk hampir
+    # semua data yang antri; None = biarkan default kernel
+    try:
+        if recv_buffer is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, recv_buffer)
+        if notsent_lowat is not None and hasattr(socket, "TCP_NOTSENT_LOWAT"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NOTSENT_LOWAT, notsent_lowat)
+    except OSError:
+        pass
+
+
+def send_buffers(sock: socket.socket, buffers: List[memoryview]) -> int:
+    """Write several frames with one syscall (writev) and return bytes sent"""
+    if hasattr(sock, "sendmsg"):
+        return sock.sendmsg(buffers[:MAX_IOV])
+    # Windows has no sendmsg, fall back to one joined write
+    return sock.send(b"".join(buffers[:MAX_IOV]))
+
+
+def consume_buffers(buffers: List[memoryview], sent: int) -> List[memoryview]:
+    """Drop `sent` bytes from the front of a buffer list"""
+    index = 0
+    while index < len(buffers) and sent >= len(buffers[index]):
+        sent -= len(buffers[index])
+        index += 1
+    remaining = buffers[index:]
+    if sent and remaining:
+        remaining[0] = remaining[0][sent:]
+    return remaining
+
+
+class SendQueue:
+    # antrian kirim terbatas per koneksi (thread-safe), satu deque per lane
+    # (dibuat saat dipakai). Item berisi satu frame (tuple buffer) atau list
+    # fragment; fragment diambil satu per satu sehingga frame lane lain bisa
+    # menyelip. Frame "ordered" (chat, LEAVE) tidak pernah masuk lane di atas
+    # frame ordered yang masih antri, jadi urutannya tetap.
+    
+    def __init__(
+        self,
+        max_frames: int = 1024,
+        policy: str = OVERFLOW_DROP_OLDEST,
+        block_timeout: float = 5.0
+    ):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.max_frames = max_frames
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self.closed = False
+        self._lanes: List[Optional[deque]] = [None] * LANES
+        self._ordered = [0] * LANES  # frame ordered yang antri per lane
+        self._count = 0
+        self._bytes = 0
+        self._cond = threading.Condition()
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    @property
+    def pending_bytes(self) -> int:
+        return self._bytes
+    
+    @property
+    def ordered_pending(self) -> bool:
+        # masih ada frame ordered yang belum diambil writer
+        return any(self._ordered)
+    
+    def ordered_lane(self, lane: int) -> int:
+        # lane untuk frame ordered: tidak di atas frame ordered yang masih antri
+        # (chat kecil setelah chat besar ikut ke bulk). Dipilih sebelum frame
+        # di-fragment karena fragment membawa nomor lane.
+        with self._cond:
+            return max([lane] + [index for index, count in enumerate(self._ordered) if count])
+    
+    def put(
+        self,
+        frame,
+        block: bool = True,
+        pinned: bool = False,
+        lane: int = LANE_INTERACTIVE,
+        ordered: bool = False
+    ) -> bool:
+        # masukkan frame (tuple buffer) atau list fragment, False kalau antrian
+        # ditutup atau peer harus diputus
+        # pinned: frame tidak boleh dibuang (misal mendefinisikan alias)
+        # ordered: frame stream berurutan, lane dari ordered_lane()
+        with self._cond:
+            if self.closed:
+                return False
+            
+            if self._count >= self.max_frames:
+                if self.policy == OVERFLOW_DISCONNECT:
+                    return False
+                if self.policy == OVERFLOW_BLOCK and block:
+                    has_room = self._cond.wait_for(
+                        lambda: self.closed or self._count < self.max_frames,
+                        self.block_timeout
+                    )
+                    if not has_room or self.closed:
+                        return False
+                else:
+                    # Drop oldest (also used when the caller must not block)
+                    self._drop_oldest()
+            
+            if isinstance(frame, list):
+                # Popped from the end, so store the fragments reversed
+                frame.reverse()
+                size = sum(len(part) for chunk in frame for part in chunk)
+            else:
+                size = sum(map(len, frame))
+            if ordered:
+                self._ordered[lane] += 1
+            queue = self._lanes[lane]
+            if queue is None:
+                queue = self._lanes[lane] = deque()
+            queue.append([frame, pinned, ordered])
+            self._count += 1
+            self._bytes += size
+            self._cond.notify_all()
+            return True
+    
+    def get_batch(self, block: bool = True) -> Optional[List[memoryview]]:
+        # ambil buffer dari beberapa frame sekaligus, lane tertinggi dulu;
+        # None kalau sudah ditutup dan kosong
+        with self._cond:
+            if block:
+                self._cond.wait_for(lambda: self._count or self.closed)
+            if not self._count:
+                return None if self.closed else []
+            
+            batch = []
+            size = 0
+            limit = MAX_BATCH_BYTES
+            while len(batch) < MAX_IOV and size < limit:
+                index = next((index for index, lane in enumerate(self._lanes) if lane), None)
+                if index is None:
+                    break
+                lane = self._lanes[index]
+                item = lane[0]
+                frame = item[0]
+                if isinstance(frame, list):
+                    parts = frame.pop()
+                    # A started frame must be sent whole
+                    item[1] = True
+                    done = not frame
+                else:
+                    parts = frame
+                    done = True
+                if done:
+                    lane.popleft()
+                    self._count -= 1
+                    if item[2]:
+                        self._ordered[index] -= 1
+                    if not lane:
+                        # Idle connections keep no deque around
+                        self._lanes[index] = None
+                for part in parts:
+                    batch.append(memoryview(part))
+                    size += len(part)
+                if index == LANE_BULK:
+                    limit = BULK_BATCH_BYTES
+            self._bytes -= size
+            self._cond.notify_all()
+            return batch
+    
+    def _drop_oldest(self):
+        # lane terendah dulu
+        for number in reversed(range(LANES)):
+            lane = self._lanes[number]
+            if not lane:
+                continue
+            for index, (frame, pinned, ordered) in enumerate(lane):
+                if not pinned:
+                    del lane[index]
+                    if isinstance(frame, list):
+                        self._bytes -= sum(len(part) for chunk in frame for part in chunk)
+                    else:
+                        self._bytes -= sum(map(len, frame))
+                    if ordered:
+                        self._ordered[number] -= 1
+                    if not lane:
+                        self._lanes[number] = None
+                    self._count -= 1
+                    self.dropped += 1
+                    return
+    
+    def close(self):
+        # tutup antrian, frame yang tersisa masih bisa diambil writer
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+    
+    def stats(self) -> dict:
+        return {
+            "depth": self._count,
+            "lanes": [len(lane) if lane else 0 for lane in self._lanes],
+            "bytes": self._bytes,
+            "dropped": self.dropped,
+            "policy": self.policy
+        }
+
 
 class ConnectionHandler:
     # handle koneksi peer
@@ -20,60 +250,139 @@ class ConnectionHandler:
         on_disconnect: Optional[Callable[['ConnectionHandler'], None]] = None
     ):
         self.socket = sock
+        self.recv_buffer = RECV_BUFFER
+        self.notsent_lowat = NOTSENT_LOWAT
         self.address = address
         self.peer_id = peer_id
         self.peer_name = None
         self.on_message = on_message
         self.on_disconnect = on_disconnect
         self.running = False
+        self.disconnected = False
         self.receive_thread = None
-        self.buffer = ""
+        self.writer_thread = None
+        self.send_lock = threading.Lock()
+        self.state_lock = threading.Lock()
+        self.send_queue = SendQueue()
+        self.framing = FRAMINGS[DEFAULT_FRAMING]
+        self.codec = CODECS[DEFAULT_CODEC]
+        self.decoder = self.framing.decoder()
+        self.tx_aliases: Optional[AliasTable] = None
+        self.rx_aliases: Optional[AliasTable] = None
+    
+    @property
+    def queue_depth(self) -> int:
+        # jumlah frame yang menunggu dikirim
+        return len(self.send_queue)
+    
+    def configure_send_queue(self, max_frames: int, policy: str):
+        # atur ukuran antrian kirim, dipanggil sebelum start()
+        self.send_queue = SendQueue(max_frames, policy)
+    
+    def configure_buffers(self, recv_buffer: Optional[int], notsent_lowat: Optional[int]):
+        # atur batas buffer kernel (None = default kernel), dipakai saat start()
+        self.recv_buffer = recv_buffer
+        self.notsent_lowat = notsent_lowat
     
     def start(self):
         # mulai receive pesan
+        limit_buffers(self.socket, self.recv_buffer, self.notsent_lowat)
         self.running = True
         self.receive_thread = threading.Thread(target=self._receive_loop, daemon=True)
         self.receive_thread.start()
+        self.writer_thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer_thread.start()
     
     def stop(self):
-        # stop koneksi
+        # stop koneksi, writer mengirim sisa antrian lalu menutup socket
         self.running = False
-        try:
-            self.socket.close()
-        except:
-            pass
+        self.send_queue.close()
+        if not (self.writer_thread and self.writer_thread.is_alive()):
+            self._close_socket()
     
-    def send(self, message: Message):
-        # kirim pesan
-        try:
-            self.socket.sendall(message.to_bytes())
-        except Exception as e:
-            logger.error(f"Error sending message to {self.address}: {e}")
+    def set_protocol(
+        self,
+        framing: str,
+        codec: str,
+        aliases: Optional[tuple] = None,
+        last: Optional[Message] = None
+    ):
+        # ganti framing dan codec setelah handshake, sisa buffer dibawa ke decoder baru
+        # aliases: (tx, rx) dari sesi yang di-resume, None = mulai dari kosong
+        # last: pesan handshake terakhir, dikirim dengan protokol lama
+        with self.send_lock:
+            # No frame from another thread may slip in between the two
+            if last is not None:
+                self._enqueue(last)
+            self.framing = FRAMINGS[framing]
+            self.codec = CODECS[codec]
+            self.decoder = self.framing.decoder(self.decoder.remaining())
+            # Peer id/name aliases are scoped to the negotiated session
+            self.tx_aliases, self.rx_aliases = aliases or (AliasTable(), AliasTable())
+    
+    def send(self, message: Message, encoded: Optional[Dict[str, bytes]] = None):
+        # masukkan pesan ke antrian kirim, tidak menunggu socket
+        # encoded: cache payload per codec, dipakai bersama saat broadcast
+        with self.send_lock:
+            queued = self._enqueue(message, encoded)
+        if not queued and not self.send_queue.closed:
+            logger.warning(f"Send queue full for {self.address}, disconnecting")
             self._handle_disconnect()
     
+    def _enqueue(self, message: Message, encoded: Optional[Dict[str, bytes]] = None) -> bool:
+        # encode dengan protokol sekarang lalu masukkan ke antrian (send_lock dipegang)
+        codec = self.codec
+        if encoded is None:
+            body = codec.encode_body(message)
+        else:
+            body = encoded.get(codec.name)
+            if body is None:
+                body = encoded[codec.name] = codec.encode_body(message)
+        
+        aliases = self.tx_aliases
+        ordered = message.msg_type in ORDERED_TYPES
+        known = len(aliases.tx) if aliases else 0
+        header = codec.encode_header(message, aliases)
+        # Dropping a frame that defines an alias would desync the peer
+        defines = bool(aliases) and len(aliases.tx) != known
+        if defines and ordered and self.send_queue.ordered_pending:
+            # It would have to jump to the control lane, ahead of the chat
+            # queued before it: send this one without aliases instead
+            aliases.truncate(known)
+            header = codec.encode_header(message)
+            defines = False
+        if defines or aliases is None:
+            # ... and so would a later frame overtaking it. Before the
+            # handshake nothing may overtake the switch to the new framing.
+            lane = LANE_CONTROL
+        else:
+            lane = message_lane(message.msg_type, len(body))
+        if ordered:
+            lane = self.send_queue.ordered_lane(lane)
+        
+        fragments = self.framing.fragments((header, body), lane)
+        return self.send_queue.put(
+            fragments[0] if len(fragments) == 1 else fragments,
+            block=self._can_block(),
+            pinned=defines,
+            lane=lane,
+            ordered=ordered
+        )
+    
+    def _can_block(self) -> bool:
+        return True
+    
     def _receive_loop(self):
         # loop untuk receive pesan
         self.socket.settimeout(1.0)  # Allow periodic checking of running flag
         
         while self.running:
             try:
-                data = self.socket.recv(4096)
-                if not data:
+                if self.decoder.recv_into(self.socket) == 0:
                     self._handle_disconnect()
                     break
                 
-                self.buffer += data.decode('utf-8')
-                
-                # Process complete messages (newline-delimited)
-                while '\n' in self.buffer:
-                    line, self.buffer = self.buffer.split('\n', 1)
-                    if line.strip():
-                        try:
-                            message = Message.from_json(line)
-                            if self.on_message:
-                                self.on_message(message, self)
-                        except Exception as e:
-                            logger.error(f"Error parsing message: {e}")
+                self._process_frames()
                             
             except socket.timeout:
                 continue
@@ -83,9 +392,68 @@ class ConnectionHandler:
                     self._handle_disconnect()
                 break
     
+    def _write_loop(self):
+        # kirim isi antrian, semua frame yang menunggu digabung per syscall
+        while True:
+            batch = self.send_queue.get_batch()
+            if batch is None:
+                break
+            
+            pending = batch
+            try:
+                while pending:
+                    try:
+                        sent = send_buffers(self.socket, pending)
+                    except socket.timeout:
+                        # Peer is slow; keep trying unless we are shutting down
+                        if self.send_queue.closed:
+                            raise
+                        continue
+                    pending = consume_buffers(pending, sent)
+            except Exception as e:
+                if self.running:
+                    logger.error(f"Error sending message to {self.address}: {e}")
+                    self._handle_disconnect()
+                break
+        
+        self._close_socket()
+    
+    def _process_frames(self):
+        # proses semua frame lengkap di buffer
+        while self.running:
+            # self.decoder may be replaced by set_protocol() inside on_message
+            frame = self.decoder.next_frame()
+            if frame is None:
+                break
+            try:
+                message = self.codec.decode(frame, self.rx_aliases)
+            except Exception as e:
+                logger.error(f"Error parsing message: {e}")
+                continue
+            if self.on_message:
+                try:
+                    self.on_message(message, self)
+                except Exception as e:
+                    # Same on both transports: log it, keep the link
+                    logger.error(f"Error handling message from {self.address}: {e}")
+        # An idle link does not keep its receive buffer
+        self.decoder.release()
+    
+    def _close_socket(self):
+        try:
+            self.socket.close()
+        except:
+            pass
+    
     def _handle_disconnect(self):
-        # handle disconnection
+        # handle disconnection (callback hanya dipanggil sekali)
+        with self.state_lock:
+            if self.disconnected:
+                return
+            self.disconnected = True
         self.running = False
+        self.send_queue.close()
+        self._close_socket()
         if self.on_disconnect:
             self.on_disconnect(self)
 
@@ -153,8 +521,8 @@ class P2PClient:
         timeout: float = 5.0
     ) -> Optional[ConnectionHandler]:
         # konek ke server
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             sock.settimeout(timeout)
             sock.connect((host, port))
             sock.settimeout(None)
@@ -165,4 +533,5 @@ class P2PClient:
             
         except Exception as e:
             logger.error(f"Failed to connect to {host}:{port}: {e}")
+            sock.close()
             return None
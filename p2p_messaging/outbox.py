@@ -0,0 +1,137 @@
+# Outbox store-and-forward: pesan untuk peer yang tidak terjangkau disimpan di SQLite
+import sqlite3
+import threading
+import logging
+from typing import Dict, List, Set, Tuple
+
+from .message import Message
+from .utils import now_us
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    peer_id TEXT NOT NULL,
+    created INTEGER NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_peer ON outbox (peer_id, id);
+"""
+
+
+class Outbox:
+    # Antrian pesan per peer tujuan, append-only, urut berdasarkan id.
+    # File memakai WAL dengan synchronous=NORMAL: commit hanya append ke WAL,
+    # fsync dikumpulkan saat checkpoint. Pesan disimpan dalam format JSON
+    # (independen dari codec koneksi) dan dihapus per batch setelah di-ack.
+    # Kolom peer_id berisi identity tujuan (Peer.identity_of), bukan peer_id
+    # sesi, supaya antrean masih berlaku setelah tujuan restart.
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        max_messages: int = 10000,
+        max_age: float = 7 * 24 * 3600
+    ):
+        self.path = path
+        self.max_messages = max_messages  # per peer tujuan
+        self.max_age = max_age            # detik
+        self.dropped = 0
+        self.closed = False
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        # jumlah pesan per peer, supaya put tidak perlu COUNT(*)
+        self._counts: Dict[str, int] = {}
+        self.expire()
+        self._recount()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def pending_peers(self) -> Set[str]:
+        # peer yang masih punya pesan di outbox
+        with self._lock:
+            return set(self._counts)
+
+    def has_pending(self, peer_id: str) -> bool:
+        return peer_id in self._counts
+
+    def put(self, peer_id: str, message: Message):
+        # simpan pesan; kalau sudah max_messages, yang paling lama dibuang
+        payload = message.to_payload()
+        with self._lock:
+            db = self._db
+            db.execute("BEGIN")
+            db.execute(
+                "INSERT INTO outbox (peer_id, created, payload) VALUES (?, ?, ?)",
+                (peer_id, now_us(), payload)
+            )
+            count = self._counts.get(peer_id, 0) + 1
+            if count > self.max_messages:
+                excess = count - self.max_messages
+                db.execute(
+                    "DELETE FROM outbox WHERE id IN "
+                    "(SELECT id FROM outbox WHERE peer_id = ? ORDER BY id LIMIT ?)",
+                    (peer_id, excess)
+                )
+                self.dropped += excess
+                count = self.max_messages
+            db.execute("COMMIT")
+            self._counts[peer_id] = count
+
+    def peek(self, peer_id: str, limit: int = 512) -> List[Tuple[int, Message]]:
+        # ambil pesan tertua untuk peer (belum dihapus)
+        cutoff = now_us() - int(self.max_age * 1_000_000)
+        with self._lock:
+            if self.closed:
+                return []
+            rows = self._db.execute(
+                "SELECT id, payload FROM outbox WHERE peer_id = ? AND created >= ? "
+                "ORDER BY id LIMIT ?",
+                (peer_id, cutoff, limit)
+            ).fetchall()
+            if not rows:
+                self._db.execute("DELETE FROM outbox WHERE peer_id = ?", (peer_id,))
+                self._counts.pop(peer_id, None)
+        return [(row_id, Message.from_payload(payload)) for row_id, payload in rows]
+
+    def remove(self, peer_id: str, upto: int):
+        # hapus pesan peer sampai id `upto` (sudah terkirim)
+        with self._lock:
+            if self.closed:
+                return
+            removed = self._db.execute(
+                "DELETE FROM outbox WHERE peer_id = ? AND id <= ?", (peer_id, upto)
+            ).rowcount
+            if peer_id in self._counts:
+                self._counts[peer_id] = max(self._counts[peer_id] - removed, 0)
+
+    def expire(self) -> int:
+        # buang pesan yang lebih tua dari max_age
+        cutoff = now_us() - int(self.max_age * 1_000_000)
+        with self._lock:
+            removed = self._db.execute("DELETE FROM outbox WHERE created < ?", (cutoff,)).rowcount
+            self.dropped += removed
+            if removed:
+                self._recount()
+        return removed
+
+    def _recount(self):
+        self._counts = dict(
+            self._db.execute("SELECT peer_id, COUNT(*) FROM outbox GROUP BY peer_id")
+        )
+
+    def close(self):
+        # drain yang masih jalan saat peer berhenti tidak menyentuh file lagi
+        with self._lock:
+            self.closed = True
+            try:
+                self._db.close()
+            except sqlite3.Error as e:
+                logger.error(f"Error closing outbox: {e}")
@@ -1,31 +1,79 @@
 # Implementasi P2P Peer
+import inspect
+import random
 import threading
 import logging
 import time
-from typing import Dict, List, Optional, Callable
-from datetime import datetime
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Callable, Tuple
 
-from .network import P2PServer, P2PClient, ConnectionHandler
-from .message import Message, MessageType
-from .utils import generate_peer_id, get_local_ip, format_peer_address
+from .network import (
+    P2PServer, P2PClient, ConnectionHandler, OVERFLOW_DROP_OLDEST, RECV_BUFFER, NOTSENT_LOWAT
+)
+from .reactor import Reactor, ReactorServer, ReactorClient
+from .message import Message, MessageType, SUPPORTED_CODECS, DEFAULT_CODEC, MAX_TTL, negotiate_codec
+from .framing import FRAMINGS, SUPPORTED_FRAMINGS, DEFAULT_FRAMING, negotiate_framing
+from .routing import RoutingTable, MAX_HOPS
+from .membership import (
+    PartialView, MemberTable, MEMBERS_PER_FRAME, MEMBERSHIP_PROTOCOL, PRIORITY_HIGH, PRIORITY_LOW
+)
+from .gossip import SeenSet, SEEN_CAPACITY
+from .failure import TimingWheel, PeerHealth
+from .reliability import ReliabilityManager, Delivery
+from .outbox import Outbox
+from .session import Session, backoff_delay
+from .dialer import Dialer
+from .peer_cache import PeerCache
+from .discovery import Discovery, DISCOVERY_GROUP, DISCOVERY_PORT
+from .utils import (
+    generate_peer_id, generate_msg_id, generate_session_token, get_local_ip,
+    format_peer_address, now_us
+)
 
 logger = logging.getLogger(__name__)
 
 
+def _peer_callback(callback: Optional[Callable], name: str) -> Optional[Callable[[str, str], None]]:
+    # on_peer_join/on_peer_leave dipanggil dengan (peer_name, peer_id); callback
+    # versi lama yang hanya menerima (peer_name) tetap jalan, dengan peringatan
+    if callback is None:
+        return None
+    try:
+        inspect.signature(callback).bind("peer_name", "peer_id")
+        return callback
+    except ValueError:
+        return callback  # no signature available (builtins), assume the new form
+    except TypeError:
+        pass
+    warnings.warn(
+        f"{name} callback taking only (peer_name) is deprecated, accept (peer_name, peer_id)",
+        DeprecationWarning,
+        stacklevel=3
+    )
+    return lambda peer_name, peer_id: callback(peer_name)
+
+
 class PeerInfo:
-    # Info tentang peer di jaringan
+    # Info tentang peer di jaringan.
+    # peer_id baru setiap peer start, identity tetap lintas restart (peer
+    # lama tidak mengirim identity, jadi identity = peer_id)
     
-    def __init__(self, peer_id: str, name: str, host: str, port: int):
+    __slots__ = ("peer_id", "name", "host", "port", "identity", "last_seen")
+    
+    def __init__(self, peer_id: str, name: str, host: str, port: int, identity: Optional[str] = None):
         self.peer_id = peer_id
         self.name = name
         self.host = host
         self.port = port
-        self.last_seen = datetime.now()
+        self.identity = identity or peer_id
+        self.last_seen = now_us()
     
     def to_dict(self) -> dict:
         # ubah ke format dict
         return {
             "peer_id": self.peer_id,
+            "identity": self.identity,
             "name": self.name,
             "host": self.host,
             "port": self.port
@@ -37,7 +85,8 @@ class PeerInfo:
             peer_id=data["peer_id"],
             name=data["name"],
             host=data["host"],
-            port=data["port"]
+            port=data["port"],
+            identity=data.get("identity")
         )
     
     def __str__(self):
@@ -47,57 +96,219 @@ class PeerInfo:
 class Peer:
     # Class utama untuk komunikasi P2P
     
+    # "thread": satu thread per koneksi, "selector": satu event loop untuk semua
+    TRANSPORTS = ("thread", "selector")
+    
     def __init__(
         self,
         name: str,
         port: int,
         host: str = "0.0.0.0",
-        on_message: Optional[Callable[[str, str, str], None]] = None,
-        on_peer_join: Optional[Callable[[str], None]] = None,
-        on_peer_leave: Optional[Callable[[str], None]] = None,
-        on_peer_disconnect: Optional[Callable[[str], None]] = None
+        on_message: Optional[Callable[[str, str, int, str], None]] = None,
+        on_peer_join: Optional[Callable[[str, str], None]] = None,
+        on_peer_leave: Optional[Callable[[str, str], None]] = None,
+        on_peer_disconnect: Optional[Callable[[str], None]] = None,
+        transport: str = "thread",
+        send_queue_size: int = 1024,
+        overflow_policy: str = OVERFLOW_DROP_OLDEST,
+        recv_buffer: Optional[int] = RECV_BUFFER,
+        notsent_lowat: Optional[int] = NOTSENT_LOWAT,
+        max_connections: int = 8,
+        passive_view_size: int = 32,
+        shuffle_interval: float = 10.0,
+        shuffle_length: int = 8,
+        broadcast_fanout: Optional[int] = None,
+        broadcast_ttl: int = MAX_HOPS,
+        seen_capacity: int = SEEN_CAPACITY,
+        heartbeat_interval: float = 5.0,
+        phi_threshold: float = 8.0,
+        failure_timeout: float = 30.0,
+        send_window: int = 256,
+        ack_delay: float = 0.05,
+        ack_every: int = 64,
+        max_retries: int = 8,
+        outbox_path: Optional[str] = None,
+        outbox_max_messages: int = 10000,
+        outbox_max_age: float = 7 * 24 * 3600,
+        reconnect_base: float = 0.05,
+        reconnect_max_delay: float = 10.0,
+        session_ttl: float = 60.0,
+        max_dials: int = 8,
+        connect_timeout: float = 5.0,
+        handshake_timeout: float = 10.0,
+        peer_cache_path: Optional[str] = None,
+        peer_cache_interval: float = 30.0,
+        discovery: bool = False,
+        discovery_group: str = DISCOVERY_GROUP,
+        discovery_port: int = DISCOVERY_PORT,
+        discovery_interval: float = 5.0,
+        identity: Optional[str] = None
     ):
+        if transport not in self.TRANSPORTS:
+            raise ValueError(f"Unknown transport: {transport}")
+        if not 1 <= broadcast_ttl <= MAX_TTL:
+            raise ValueError(f"broadcast_ttl must be between 1 and {MAX_TTL}")
+        
         self.name = name
         self.port = port
         self.host = host
         self.peer_id = generate_peer_id(name, port)
+        # Identitas tetap lintas restart (lihat utils.load_identity); kunci
+        # outbox. None = peer_id, jadi hanya berlaku selama satu sesi
+        self.identity = identity or self.peer_id
         self.local_ip = get_local_ip()
         
         # Callbacks
         self.on_message = on_message
-        self.on_peer_join = on_peer_join
-        self.on_peer_leave = on_peer_leave
+        self.on_peer_join = _peer_callback(on_peer_join, "on_peer_join")
+        self.on_peer_leave = _peer_callback(on_peer_leave, "on_peer_leave")
+        # Callback aplikasi dan tulis outbox (SQLite) jalan berurutan di satu
+        # worker, bukan di thread event loop / timing wheel yang melayani
+        # semua koneksi
+        self._worker: Optional[ThreadPoolExecutor] = None
         
         # Network components
-        self.server: Optional[P2PServer] = None
+        self.transport = transport
+        self.reactor: Optional[Reactor] = None
+        self.server = None
+        self.send_queue_size = send_queue_size
+        self.overflow_policy = overflow_policy
+        self.recv_buffer = recv_buffer
+        self.notsent_lowat = notsent_lowat
         self.connections: Dict[str, ConnectionHandler] = {}  # peer_id -> handler
         self.known_peers: Dict[str, PeerInfo] = {}  # peer_id -> PeerInfo
+        # peer_id -> identity neighbor yang pernah terhubung; tetap ada setelah
+        # known_peers dihapus, supaya pesan ke peer yang baru pergi masih masuk
+        # outbox identitasnya walau tabel member belum sempat tersinkron
+        self._identities: Dict[str, str] = {}
+        
+        # Dial keluar lewat antrian: maks. max_dials bersamaan, satu per alamat;
+        # koneksi tanpa handshake lengkap ditutup setelah handshake_timeout
+        self.connect_timeout = connect_timeout
+        self.handshake_timeout = handshake_timeout
+        self.dialer = Dialer(self._connect, max_dials)
+        
+        # Routing multi-hop ke peer di luar active view
+        self.routing = RoutingTable(self.peer_id)
+        
+        # Membership: max_connections = ukuran active view
+        self.view = PartialView(self.peer_id, max_connections, passive_view_size)
+        self.shuffle_interval = shuffle_interval
+        self.shuffle_length = shuffle_length
+        self._dialing: Dict[str, float] = {}  # peer_id -> batas waktu handshake
+        self._shuffle_sent: List[str] = []
+        
+        # Daftar semua member jaringan, disinkronkan per delta: per neighbor
+        # versi tabel kita yang sudah dikirim dan versi tabel mereka yang diterima
+        self.members = MemberTable(self.peer_id)
+        self._members_sent: Dict[str, int] = {}
+        self._members_received: Dict[str, int] = {}
+        self._members_timer = None
+        
+        # Broadcast epidemic: diteruskan ke `broadcast_fanout` neighbor
+        # (None = semua active view), duplikat dibuang lewat seen set
+        self.broadcast_fanout = broadcast_fanout
+        self.broadcast_ttl = broadcast_ttl
+        self.seen = SeenSet(seen_capacity)
+        self.broadcast_stats = {"received": 0, "duplicates": 0, "relayed": 0}
+        
+        # Failure detector: peer dianggap mati kalau phi > phi_threshold atau
+        # tidak ada PONG selama failure_timeout detik
+        self.heartbeat_interval = heartbeat_interval
+        self.phi_threshold = phi_threshold
+        self.failure_timeout = failure_timeout
+        self.health: Dict[str, PeerHealth] = {}  # peer_id -> PeerHealth
+        
+        # Timer heartbeat, shuffle (dan lainnya) jalan di satu timing wheel
+        self.wheel = TimingWheel()
+        
+        # Direct message andal (seq + ACK); peer lama tanpa "codecs" di
+        # handshake tidak mengirim ACK, jadi ke mereka tetap fire-and-forget
+        self.reliability = ReliabilityManager(
+            self.wheel, self._transmit, self._send_ack,
+            window=send_window, ack_delay=ack_delay, ack_every=ack_every, max_retries=max_retries
+        )
+        self.legacy_peers = set()
+        # neighbor yang mengumumkan MEMBERSHIP_PROTOCOL (boleh dikirimi SHUFFLE dan delta member)
+        self.membership_peers = set()
+        # msg_id direct message yang sudah diterima (replay dari outbox)
+        self.delivered = SeenSet(seen_capacity)
+        
+        # Outbox untuk peer yang tidak terjangkau (None = SQLite di memori)
+        self.outbox = Outbox(outbox_path or ":memory:", outbox_max_messages, outbox_max_age)
+        self._draining = set()
+        
+        # Link yang putus tanpa LEAVE di-redial (backoff + jitter) selama
+        # session_ttl detik dan di-resume dengan token sesi
+        self.reconnect_base = reconnect_base
+        self.reconnect_max_delay = reconnect_max_delay
+        self.session_ttl = session_ttl
+        self.sessions: Dict[str, Session] = {}  # peer_id -> Session
+        
+        # Cache alamat peer di file (None = tidak ada warm start); disimpan
+        # tiap peer_cache_interval detik dan saat stop
+        self.peer_cache = PeerCache(peer_cache_path) if peer_cache_path else None
+        self.peer_cache_interval = peer_cache_interval
+        
+        # Discovery LAN (UDP multicast); peer yang ditemukan masuk passive view
+        self.discovery = Discovery(
+            self.wheel, self.get_peer_info, self._handle_discovered,
+            group=discovery_group, port=discovery_port,
+            interval=discovery_interval, ttl=3 * discovery_interval
+        ) if discovery else None
+        self._partition_timer = None
         
         # Thread safety
         self.lock = threading.Lock()
         
         # State
         self.running = False
-        self.heartbeat_thread = None
     
     def start(self):
         # jalankan peer
         # Start server
-        self.server = P2PServer(
-            host=self.host,
-            port=self.port,
-            on_connection=self._handle_new_connection
-        )
+        if self.transport == "selector":
+            self.reactor = Reactor()
+            self.reactor.start()
+            self.server = ReactorServer(
+                reactor=self.reactor,
+                host=self.host,
+                port=self.port,
+                on_connection=self._handle_new_connection
+            )
+        else:
+            self.server = P2PServer(
+                host=self.host,
+                port=self.port,
+                on_connection=self._handle_new_connection
+            )
         self.server.start()
+        self.dialer.start()
+        self._worker = ThreadPoolExecutor(1, thread_name_prefix="peer-worker")
         
         self.running = True
+        with self.lock:
+            self.members.announce(self.get_peer_info())
         
-        # Start heartbeat thread
-        self.heartbeat_thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
-        self.heartbeat_thread.start()
+        # Heartbeat and shuffle timers
+        self.wheel.start()
+        self.wheel.schedule(self.heartbeat_interval, self._heartbeat_tick)
+        self.wheel.schedule(self.shuffle_interval, self._membership_tick)
+        self.wheel.schedule(60.0, self._outbox_tick)
+        if self.peer_cache:
+            self.wheel.schedule(self.peer_cache_interval, self._peer_cache_tick)
         
         logger.info(f"Peer '{self.name}' started on {self.local_ip}:{self.port}")
         logger.info(f"Peer ID: {self.peer_id}")
+        
+        if self.peer_cache and self.peer_cache.load():
+            self._warm_start()
+        if self.discovery:
+            try:
+                self.discovery.start()
+            except OSError as e:
+                # No multicast on this host, manual connect still works
+                logger.warning(f"LAN discovery unavailable: {e}")
     
     def stop(self):
         # stop peer
@@ -112,28 +323,87 @@ class Peer:
         )
         self._broadcast_message(leave_msg)
         
+        if self.discovery:
+            self.discovery.stop()
+        
+        # Queued dials are dropped, running ones finish on their own
+        self.dialer.stop()
+        if self.peer_cache:
+            self._save_peer_cache()
+        
         # Close all connections
         with self.lock:
-            for handler in self.connections.values():
-                handler.stop()
+            handlers = list(self.connections.values())
             self.connections.clear()
+        for handler in handlers:
+            handler.stop()
         
         # Stop server
+        self.wheel.stop()
+        # Undelivered messages are requeued into the outbox before it closes
+        self.reliability.close()
+        if self._worker:
+            self._worker.shutdown(wait=True)
+        self.outbox.close()
         if self.server:
             self.server.stop()
+        if self.reactor:
+            self.reactor.stop()
         
         logger.info(f"Peer '{self.name}' stopped")
     
-    def connect_to_peer(self, host: str, port: int) -> bool:
-        # konek ke peer lain
-        handler = P2PClient.connect(host, port)
+    def connect_to_peer(self, host: str, port: int, priority: str = PRIORITY_HIGH) -> bool:
+        # konek ke peer lain; priority "low" boleh ditolak kalau peer tujuan penuh
+        # Joins a dial to the same address that is already in flight
+        return self.dialer.submit(host, port, priority).result()
+    
+    def connect_many(
+        self,
+        addresses: Iterable[Tuple[str, int]],
+        priority: str = PRIORITY_HIGH,
+        timeout: Optional[float] = None
+    ) -> Dict[Tuple[str, int], bool]:
+        # dial banyak alamat sekaligus (maks. max_dials bersamaan); alamat
+        # neighbor yang sudah terkoneksi dilewati, yang belum selesai setelah
+        # `timeout` detik dihitung gagal
+        with self.lock:
+            connected = {(info.host, info.port) for info in self.known_peers.values()}
+        addresses = [(host, port) for host, port in dict.fromkeys(addresses) if not self._is_own_address(host, port)]
+        results = self.dialer.connect_many(
+            [address for address in addresses if address not in connected], priority, timeout=timeout
+        )
+        results.update({address: True for address in addresses if address in connected})
+        return results
+    
+    def _is_own_address(self, host: str, port: int) -> bool:
+        return port == self.port and host in (self.local_ip, "127.0.0.1", "localhost")
+    
+    def _warm_start(self):
+        # dial peer terbaik dari cache sekaligus; node yang baru start belum
+        # punya link, jadi sama seperti _fill_active_view semuanya "high"
+        entries = [
+            entry for entry in self.peer_cache.ranked()
+            if not self._is_own_address(entry["host"], entry["port"])
+        ][:self.view.active_size]
+        logger.info(f"Warm start: dialing {len(entries)} cached peers")
+        for entry in entries:
+            future = self.dialer.submit(entry["host"], entry["port"], PRIORITY_HIGH)
+            future.add_done_callback(lambda f, entry=entry: self._warm_dial_done(entry, f))
+    
+    def _warm_dial_done(self, entry: dict, future):
+        if future.cancelled() or not future.result():
+            self.peer_cache.failed(entry["host"], entry["port"])
+    
+    def _connect(self, host: str, port: int, priority: str, resume: Optional[dict] = None) -> bool:
+        # buka koneksi dan kirim JOIN; resume = {"token", "aliases"} dari sesi lama
+        if self.reactor:
+            handler = ReactorClient.connect(self.reactor, host, port, self.connect_timeout)
+        else:
+            handler = P2PClient.connect(host, port, self.connect_timeout)
         if not handler:
             return False
         
-        # Set up message handling
-        handler.on_message = self._handle_message
-        handler.on_disconnect = self._handle_disconnect
-        handler.start()
+        self._setup_handler(handler)
         
         # Send JOIN message
         join_msg = Message(
@@ -142,15 +412,29 @@ class Peer:
             sender_name=self.name,
             data={
                 "host": self.local_ip,
-                "port": self.port
+                "port": self.port,
+                "framing": SUPPORTED_FRAMINGS,
+                "codecs": SUPPORTED_CODECS,
+                "priority": priority,
+                "identity": self.identity,
+                "membership": MEMBERSHIP_PROTOCOL,
+                "digest": self.members.digest_hex()
             }
         )
+        if resume:
+            join_msg.data["resume"] = resume
         handler.send(join_msg)
         
         return True
     
-    def send_message(self, text: str, target_peer_id: Optional[str] = None):
-        # kirim pesan
+    def send_message(
+        self,
+        text: str,
+        target_peer_id: Optional[str] = None,
+        on_delivered: Optional[Callable[[Delivery], None]] = None
+    ) -> Optional[Delivery]:
+        # kirim pesan; direct message mengembalikan Delivery (wait()/callback),
+        # None kalau peer tidak terjangkau dan pesan disimpan di outbox
         if target_peer_id:
             # Direct message
             msg = Message(
@@ -158,23 +442,47 @@ class Peer:
                 sender_id=self.peer_id,
                 sender_name=self.name,
                 data={"text": text},
-                target_id=target_peer_id
+                target_id=target_peer_id,
+                msg_id=generate_msg_id(),
+                ttl=MAX_HOPS
             )
             
             with self.lock:
-                if target_peer_id in self.connections:
-                    self.connections[target_peer_id].send(msg)
-                else:
-                    logger.warning(f"Peer {target_peer_id} not connected")
+                legacy = target_peer_id in self.legacy_peers
+                reachable = self._route_handler(target_peer_id) is not None
+                key = self._identity_of(target_peer_id)
+            if legacy:
+                self._transmit(target_peer_id, msg)
+                return None
+            
+            # Queue behind anything already waiting so the order is kept
+            if not reachable or self.outbox.has_pending(key):
+                self.outbox.put(key, msg)
+                logger.info(f"Message to {target_peer_id[:8]}... queued in outbox")
+                if reachable:
+                    self._drain_reachable([target_peer_id])
+                return None
+            
+            delivery = self.reliability.send(target_peer_id, msg)
+            delivery.add_done_callback(lambda d: self._run_blocking(self._requeue_failed, d))
+            if on_delivered:
+                delivery.add_done_callback(lambda d: self._run_blocking(on_delivered, d))
+            return delivery
         else:
             # Broadcast
             msg = Message(
                 msg_type=MessageType.BROADCAST,
                 sender_id=self.peer_id,
                 sender_name=self.name,
-                data={"text": text}
+                data={"text": text},
+                msg_id=generate_msg_id(),
+                ttl=self.broadcast_ttl
             )
+            with self.lock:
+                # Copies that come back through the overlay are dropped
+                self.seen.add(msg.msg_id)
             self._broadcast_message(msg)
+            return None
     
     def get_connected_peers(self) -> List[PeerInfo]:
         # dapetin daftar peer yang konek
@@ -185,10 +493,79 @@ class Peer:
                 if pid in self.known_peers
             ]
     
+    def get_queue_stats(self) -> Dict[str, dict]:
+        # kedalaman antrian kirim per peer (untuk monitoring)
+        with self.lock:
+            handlers = dict(self.connections)
+        return {pid: handler.send_queue.stats() for pid, handler in handlers.items()}
+    
+    def get_routes(self) -> Dict[str, dict]:
+        # tabel routing: tujuan -> {"next_hop", "hops"}
+        with self.lock:
+            return self.routing.snapshot()
+    
+    def get_path_length(self, peer_id: str) -> Optional[int]:
+        # jumlah hop ke peer, None kalau tidak ada rute
+        with self.lock:
+            return self.routing.distance(peer_id)
+    
+    def get_broadcast_stats(self) -> Dict[str, int]:
+        # counter broadcast: diterima, duplikat, diteruskan
+        with self.lock:
+            stats = dict(self.broadcast_stats)
+            stats["seen"] = len(self.seen)
+        return stats
+    
+    def get_reliability_stats(self) -> Dict[str, int]:
+        # counter pengiriman andal (sent, retransmits, acks_sent, ...)
+        return self.reliability.snapshot()
+    
+    def get_peer_health(self) -> Dict[str, dict]:
+        # RTT dan tingkat kecurigaan (phi) per peer yang terkoneksi
+        now = time.monotonic()
+        with self.lock:
+            return {pid: health.to_dict(now) for pid, health in self.health.items()}
+    
+    def get_discovered(self) -> List[dict]:
+        # peer yang terlihat lewat discovery LAN
+        return self.discovery.peers() if self.discovery else []
+    
+    def get_membership(self) -> Dict[str, List[dict]]:
+        # isi active dan passive view (untuk monitoring)
+        with self.lock:
+            return {
+                "active": list(self.view.active.values()),
+                "passive": list(self.view.passive.values())
+            }
+    
+    def get_members(self) -> List[dict]:
+        # semua peer hidup di jaringan (bukan hanya neighbor), dari tabel member
+        with self.lock:
+            return self.members.alive()
+    
+    def get_sessions(self) -> Dict[str, dict]:
+        # sesi per peer: terkoneksi atau sedang di-redial
+        now = time.monotonic()
+        with self.lock:
+            return {
+                pid: {
+                    "connected": session.expires is None,
+                    "attempts": session.attempts,
+                    "expires_in": None if session.expires is None else round(session.expires - now, 3)
+                }
+                for pid, session in self.sessions.items()
+            }
+    
+    def identity_of(self, peer_id: str) -> str:
+        # identitas tetap peer (peer_id kalau tidak dikenal atau peer lama)
+        with self.lock:
+            return self._identity_of(peer_id)
+    
     def get_peer_info(self) -> dict:
         # info peer ini
         return {
             "peer_id": self.peer_id,
+            "identity": self.identity,
             "name": self.name,
             "host": self.local_ip,
             "port": self.port
@@ -198,22 +575,54 @@ class Peer:
     
     def _handle_new_connection(self, handler: ConnectionHandler):
         # handle koneksi baru
+        self._setup_handler(handler)
+    
+    def _setup_handler(self, handler: ConnectionHandler):
+        # pasang callback dan antrian kirim lalu mulai handler
+        handler.configure_send_queue(self.send_queue_size, self.overflow_policy)
+        handler.configure_buffers(self.recv_buffer, self.notsent_lowat)
         handler.on_message = self._handle_message
         handler.on_disconnect = self._handle_disconnect
         handler.start()
+        self.wheel.schedule(self.handshake_timeout, self._check_handshake, handler)
+    
+    def _check_handshake(self, handler: ConnectionHandler):
+        # koneksi yang tidak pernah menyelesaikan JOIN/PEERS ditutup
+        if handler.peer_id is None and handler.running:
+            logger.warning(f"Handshake with {handler.address} timed out")
+            handler.stop()
     
     def _handle_message(self, message: Message, handler: ConnectionHandler):
         # handle pesan masuk
         msg_type = message.msg_type
         
+        # Only the routing header is decoded at this point
+        if message.target_id and message.target_id != self.peer_id:
+            self._relay_message(message, handler)
+            return
+        
         if msg_type == MessageType.JOIN:
             self._handle_join(message, handler)
             
         elif msg_type == MessageType.LEAVE:
             self._handle_leave(message, handler)
             
-        elif msg_type == MessageType.MESSAGE or msg_type == MessageType.BROADCAST:
-            self._handle_chat_message(message)
+        elif msg_type == MessageType.BROADCAST:
+            self._handle_broadcast(message, handler)
+            
+        elif msg_type == MessageType.MESSAGE:
+            # Retransmitted copies are acked again but not delivered twice;
+            # an outbox replay of a message whose ACK was lost has a new seq
+            # but the same msg_id
+            new = message.seq is None or self.reliability.on_message(message.sender_id, message.seq)
+            if new and message.msg_id is not None:
+                with self.lock:
+                    new = self.delivered.add(message.msg_id)
+            if new:
+                self._handle_chat_message(message)
+            
+        elif msg_type == MessageType.ACK:
+            self.reliability.on_ack(message.sender_id, message.data)
             
         elif msg_type == MessageType.PEERS:
             self._handle_peers_list(message, handler)
@@ -222,7 +631,180 @@ class Peer:
             self._handle_ping(message, handler)
             
         elif msg_type == MessageType.PONG:
-            self._handle_pong(message)
+            self._handle_pong(message, handler)
+            
+        elif msg_type == MessageType.SHUFFLE:
+            self._handle_shuffle(message, handler)
+            
+        elif msg_type == MessageType.SHUFFLE_REPLY:
+            self._handle_shuffle_reply(message)
+    
+    def _route_handler(self, target_id: str) -> Optional[ConnectionHandler]:
+        # koneksi langsung kalau ada, kalau tidak next hop dari tabel routing
+        # (dipanggil dengan self.lock dipegang)
+        handler = self.connections.get(target_id)
+        if handler is None:
+            next_hop = self.routing.next_hop(target_id)
+            if next_hop:
+                handler = self.connections.get(next_hop)
+        return handler
+    
+    def _relay_message(self, message: Message, handler: ConnectionHandler):
+        # teruskan pesan untuk peer lain tanpa decode/encode ulang payload
+        with self.lock:
+            next_hop = self._route_handler(message.target_id)
+        
+        if next_hop is None or next_hop is handler:
+            logger.warning(f"No route to {message.target_id}, dropping message")
+            return
+        if not message.hop():
+            logger.warning(f"TTL expired for message to {message.target_id}, dropping")
+            return
+        next_hop.send(message)
+    
+    def _transmit(self, peer_id: str, message: Message) -> bool:
+        # kirim ke peer (langsung atau lewat next hop)
+        with self.lock:
+            handler = self._route_handler(peer_id)
+        
+        # Send outside the lock so a slow peer never blocks other callers
+        if handler is None:
+            logger.warning(f"No route to peer {peer_id}")
+            return False
+        handler.send(message)
+        return True
+    
+    def _send_ack(self, peer_id: str, data: dict) -> bool:
+        return self._transmit(peer_id, Message(
+            msg_type=MessageType.ACK,
+            sender_id=self.peer_id,
+            sender_name=self.name,
+            data=data,
+            target_id=peer_id,
+            ttl=MAX_HOPS
+        ))
+    
+    def _run_blocking(self, callback: Callable, *args):
+        # jalankan di worker: callback aplikasi dan SQLite tidak boleh
+        # menahan event loop selector atau timing wheel
+        worker = self._worker
+        if worker is not None:
+            try:
+                worker.submit(self._call, callback, args)
+                return
+            except RuntimeError:
+                pass  # worker already shut down: run inline
+        self._call(callback, args)
+    
+    @staticmethod
+    def _call(callback: Callable, args: tuple):
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.error(f"Error in callback {getattr(callback, '__name__', callback)}: {e}")
+    
+    def _requeue_failed(self, delivery: Delivery):
+        # pesan yang tidak pernah di-ack dipindah ke outbox
+        if not delivery.delivered:
+            with self.lock:
+                key = self._identity_of(delivery.peer_id)
+            try:
+                self.outbox.put(key, delivery.message)
+            except Exception as e:
+                logger.error(f"Could not queue message in outbox: {e}")
+    
+    def _identity_of(self, peer_id: str) -> str:
+        # (dipanggil dengan self.lock dipegang)
+        identity = self._identities.get(peer_id)
+        if identity is not None:
+            return identity
+        member = self.members.get(peer_id)
+        if member is not None:
+            return member.info.get("identity") or peer_id
+        return peer_id
+    
+    def _peers_with_identity(self, identities) -> List[str]:
+        # peer_id yang sekarang dipakai identitas-identitas ini; satu identitas
+        # bisa punya beberapa (peer_id lama belum ditandai mati)
+        # (dipanggil dengan self.lock dipegang)
+        identities = set(identities)
+        found = {pid for pid, identity in self._identities.items() if identity in identities}
+        found.update(
+            info["peer_id"] for info in self.members.alive()
+            if info.get("identity", info["peer_id"]) in identities
+        )
+        return list(found)
+    
+    def _drain_reachable(self, peer_ids):
+        # mulai drain outbox untuk peer yang sekarang punya rute; outbox
+        # dikunci per identitas, jadi pesan untuk peer_id lama ikut terkirim
+        # ke peer_id barunya
+        pending = self.outbox.pending_peers()
+        if not pending:
+            return
+        with self.lock:
+            ready = []
+            for pid in peer_ids:
+                key = self._identity_of(pid)
+                if key in pending and key not in self._draining and self._route_handler(pid):
+                    self._draining.add(key)
+                    ready.append((key, pid))
+        for key, pid in ready:
+            threading.Thread(target=self._drain_outbox, args=(key, pid), daemon=True).start()
+    
+    def _drain_outbox(self, key: str, peer_id: str, batch_size: int = 1024):
+        # kirim ulang isi outbox secara berurutan; baris dihapus setelah di-ack
+        try:
+            while self.running:
+                batch = self.outbox.peek(key, batch_size)
+                if not batch:
+                    break
+                for _, msg in batch:
+                    # Stored per identity, possibly by an earlier run: address
+                    # the current ids so the reply and ACK find their way. The
+                    # msg_id stays, the receiver drops copies it already has
+                    msg.sender_id = self.peer_id
+                    msg.sender_name = self.name
+                    msg.target_id = peer_id
+                deliveries = [self.reliability.send(peer_id, msg) for _, msg in batch]
+                
+                # Only the acknowledged prefix leaves the outbox, keeping order
+                acked = 0
+                for delivery in deliveries:
+                    if not delivery.wait(self.failure_timeout):
+                        break
+                    acked += 1
+                if acked:
+                    self.outbox.remove(key, batch[acked - 1][0])
+                if acked < len(batch):
+                    logger.warning(f"Outbox replay to {peer_id[:8]}... stalled, retrying later")
+                    break
+            if not self.outbox.has_pending(key):
+                logger.info(f"Outbox drained for {peer_id[:8]}...")
+        finally:
+            with self.lock:
+                self._draining.discard(key)
+    
+    def _send_route_updates(self, changed):
+        # kirim delta rute ke semua neighbor (PEERS tanpa my_info)
+        if not changed:
+            return
+        # Destinations that just became reachable get their outbox replayed
+        self._drain_reachable(changed)
+        with self.lock:
+            updates = [
+                (handler, self.routing.advertise(pid, changed))
+                for pid, handler in self.connections.items()
+                if pid not in self.legacy_peers
+            ]
+        for handler, routes in updates:
+            if routes:
+                handler.send(Message(
+                    msg_type=MessageType.PEERS,
+                    sender_id=self.peer_id,
+                    sender_name=self.name,
+                    data={"routes": routes}
+                ))
     
     def _handle_join(self, message: Message, handler: ConnectionHandler):
         # handle JOIN message
@@ -235,51 +817,204 @@ class Peer:
             peer_id=peer_id,
             name=peer_name,
             host=data["host"],
-            port=data["port"]
+            port=data["port"],
+            identity=data.get("identity")
         )
         
+        # Low priority joins only fill free slots in the active view
+        if data.get("priority", PRIORITY_HIGH) == PRIORITY_LOW:
+            with self.lock:
+                full = self.view.is_full()
+                if full:
+                    self.view.add_passive([peer_info.to_dict()])
+                    sample = self.view.sample(self.shuffle_length, exclude=(peer_id,))
+            if full:
+                handler.send(Message(
+                    msg_type=MessageType.LEAVE,
+                    sender_id=self.peer_id,
+                    sender_name=self.name,
+                    data={"reason": "full", "peers": sample}
+                ))
+                handler.stop()
+                return
+        
+        with self.lock:
+            keep, replaced = self._keep_connection(peer_id, initiator=peer_id)
+        if replaced:
+            self._replace_link(replaced)
+        if not keep:
+            handler.stop()
+            return
+        
         # Store connection and peer info
         handler.peer_id = peer_id
         handler.peer_name = peer_name
+        legacy = "codecs" not in data
+        membership = data.get("membership") == MEMBERSHIP_PROTOCOL
         
         with self.lock:
             self.connections[peer_id] = handler
             self.known_peers[peer_id] = peer_info
+            self._identities[peer_id] = peer_info.identity
+            self._dialing.pop(peer_id, None)
+            victim = self.view.add_active(peer_info.to_dict())
+            changed = self._add_neighbor(peer_id, legacy, membership)
+            routes = self.routing.advertise(peer_id)
+            resumed, aliases, received = self._resume_session(peer_id, data.get("resume"))
+            token = None if legacy else self._open_session(peer_info, handler)
+            digest = self.members.digest_hex()
+            members_received = self._members_received.get(peer_id, 0)
+            if self.peer_cache:
+                self.peer_cache.connected(peer_info.to_dict())
+            # Bounded sample instead of every peer we know
+            peers_data = None if resumed else self.view.sample(self.shuffle_length, exclude=(peer_id,))
         
-        logger.info(f"Peer joined: {peer_name} ({peer_id[:8]}...)")
+        logger.info(f"Peer {'resumed' if resumed else 'joined'}: {peer_name} ({peer_id[:8]}...)")
         
         # Send our peer list to the new peer
-        peers_data = [p.to_dict() for p in self.known_peers.values() if p.peer_id != peer_id]
+        framing = negotiate_framing(data.get("framing"))
+        codec = negotiate_codec(data.get("codecs"), FRAMINGS[framing].binary_safe)
         peers_msg = Message(
             msg_type=MessageType.PEERS,
             sender_id=self.peer_id,
             sender_name=self.name,
             data={
-                "peers": peers_data,
-                "my_info": self.get_peer_info()
+                "my_info": self.get_peer_info(),
+                "framing": framing,
+                "codec": codec,
+                "membership": MEMBERSHIP_PROTOCOL
             }
         )
-        handler.send(peers_msg)
+        if not legacy:
+            peers_msg.data["routes"] = routes
+        if token:
+            peers_msg.data["session"] = token
+            peers_msg.data["digest"] = digest
+        if resumed:
+            # A resumed peer still has its views, skip the peer sample
+            peers_msg.data["resume"] = {"aliases": received, "members": members_received}
+        else:
+            peers_msg.data["peers"] = peers_data
+        
+        # PEERS is the last newline-JSON frame, switch right behind it
+        handler.set_protocol(framing, codec, aliases, last=peers_msg)
+        if resumed:
+            self.reliability.resume(peer_id)
+        if membership:
+            # Member deltas only go out once PEERS is queued
+            with self.lock:
+                self._start_members_sync(peer_id, data.get("digest"), data.get("resume") if resumed else None)
+        self._send_route_updates(changed)
+        if victim:
+            self._evict(victim)
         
         # Notify callback
         if self.on_peer_join:
-            self.on_peer_join(peer_name)
+            self._run_blocking(self.on_peer_join, peer_name, peer_id)
     
     def _handle_leave(self, message: Message, handler: ConnectionHandler):
         # handle LEAVE message
         peer_id = message.sender_id
         peer_name = message.sender_name
+        reason = message.data.get("reason") if message.data else None
+        
+        if reason == "replaced":
+            self._handle_replaced(peer_id, peer_name, handler)
+            return
         
         with self.lock:
-            if peer_id in self.connections:
+            was_active = self.connections.get(peer_id) is handler
+            if was_active:
                 del self.connections[peer_id]
-            if peer_id in self.known_peers:
-                del self.known_peers[peer_id]
+                self.known_peers.pop(peer_id, None)
+            self._dialing.pop(peer_id, None)
+            if was_active:
+                self._close_session(peer_id)
+                self._forget_member_sync(peer_id)
+                if reason == "shutdown" and self.members.mark_dead(peer_id):
+                    self._schedule_members_sync()
+            changed = set()
+            if reason == "full":
+                # Rejected a low priority join, remember who it suggested
+                self.view.add_passive(message.data.get("peers", []))
+            elif was_active:
+                # An evicted link stays a good candidate, a shutdown does not
+                self.view.remove_active(peer_id, keep=reason == "evicted")
+                if reason != "evicted":
+                    self.view.remove_passive(peer_id)
+                changed = self.routing.remove_neighbor(peer_id)
         
-        logger.info(f"Peer left: {peer_name}")
+        handler.stop()
+        logger.info(f"Peer left: {peer_name} ({reason})")
+        self._send_route_updates(changed)
+        if reason != "full":
+            # After a rejection the periodic repair retries, not a dial storm
+            self._fill_active_view()
         
-        if self.on_peer_leave:
-            self.on_peer_leave(peer_name)
+        if self.on_peer_leave and was_active:
+            self._run_blocking(self.on_peer_leave, peer_name, peer_id)
+    
+    def _handle_replaced(self, peer_id: str, peer_name: str, handler: ConnectionHandler):
+        # Peer memilih link lain ke kita (tie-break dial bersamaan). Sesi,
+        # view dan rute tetap; handshake link pengganti sedang berjalan.
+        with self.lock:
+            detached = self.connections.get(peer_id) is handler
+            if detached:
+                del self.connections[peer_id]
+                self._dialing[peer_id] = time.monotonic() + self.handshake_timeout
+        handler.stop()
+        if detached:
+            logger.info(f"Link to {peer_name} replaced")
+            self.wheel.schedule(self.handshake_timeout, self._check_replaced, peer_id, peer_name)
+    
+    def _check_replaced(self, peer_id: str, peer_name: str):
+        # link pengganti tidak pernah datang: perlakukan seperti link putus
+        with self.lock:
+            if not self.running or peer_id in self.connections:
+                return
+            self._dialing.pop(peer_id, None)
+        self._link_lost(peer_id, peer_name)
+    
+    def _handle_discovered(self, info: dict):
+        # peer baru di LAN: jadi kandidat passive view, slot kosong langsung diisi
+        with self.lock:
+            if info["peer_id"] in self.connections or self._is_own_address(info["host"], info["port"]):
+                return
+            self.view.add_passive([info])
+            self._schedule_partition_check()
+        self._fill_active_view()
+    
+    def _schedule_partition_check(self):
+        # (dipanggil dengan self.lock dipegang)
+        if self._partition_timer is None and self.running:
+            # Random delay: whoever checks first joins, the routes it brings
+            # back stop the others from joining too
+            self._partition_timer = self.wheel.schedule(
+                random.uniform(0.25, 0.75), self._check_partition
+            )
+    
+    def _check_partition(self):
+        """Join one discovered peer we have no route to, even if it is full"""
+        with self.lock:
+            self._partition_timer = None
+            if not self.running:
+                return
+            # Peers that started together can fill their views among
+            # themselves and never accept a low priority join again
+            unreachable = [
+                info for info in self.discovery.peers()
+                if self.routing.distance(info["peer_id"]) is None
+                and info["peer_id"] not in self._dialing
+                and not self._is_own_address(info["host"], info["port"])
+            ]
+            if not unreachable:
+                return
+            info = random.choice(unreachable)
+            self._dialing[info["peer_id"]] = time.monotonic() + self.handshake_timeout
+        
+        logger.info(f"No route to discovered peer {info['name']}, joining it")
+        future = self.dialer.submit(info["host"], info["port"], PRIORITY_HIGH)
+        future.add_done_callback(lambda f: self._dial_done(info, f))
     
     def _handle_chat_message(self, message: Message):
         # handle pesan chat
@@ -289,11 +1024,41 @@ class Peer:
         timestamp = message.timestamp
         
         if self.on_message:
-            self.on_message(sender_name, text, timestamp, sender_id)
+            self._run_blocking(self.on_message, sender_name, text, timestamp, sender_id)
+    
+    def _handle_broadcast(self, message: Message, handler: ConnectionHandler):
+        # terima broadcast lalu teruskan ke neighbor lain (sekali per msg_id)
+        if message.msg_id is None:
+            # Older peers send no id, deliver without relaying
+            self._handle_chat_message(message)
+            return
+        
+        with self.lock:
+            if not self.seen.add(message.msg_id):
+                self.broadcast_stats["duplicates"] += 1
+                return
+            self.broadcast_stats["received"] += 1
+            
+            targets = []
+            if message.hop():
+                targets = [
+                    h for pid, h in self.connections.items()
+                    if h is not handler and pid != message.sender_id
+                ]
+                if self.broadcast_fanout is not None and len(targets) > self.broadcast_fanout:
+                    targets = random.sample(targets, self.broadcast_fanout)
+                self.broadcast_stats["relayed"] += len(targets)
+        
+        # Relay before the (possibly slow) chat callback
+        encoded = {}
+        for target in targets:
+            target.send(message, encoded)
+        self._handle_chat_message(message)
     
     def _handle_peers_list(self, message: Message, handler: ConnectionHandler):
-        # handle daftar peers
+        # handle daftar peers (handshake) atau update rute (tanpa my_info)
         data = message.data
+        changed = set()
         
         # Store sender's info
         if "my_info" in data:
@@ -301,45 +1066,363 @@ class Peer:
             peer_info = PeerInfo.from_dict(my_info)
             peer_id = my_info["peer_id"]
             
+            with self.lock:
+                # The remote peer only answers "resume" to the token we sent
+                resume = data.get("resume")
+                session = self.sessions.get(peer_id)
+                aliases = None
+                if resume is not None and session is not None:
+                    aliases = session.carry_aliases(resume.get("aliases", 0))
+            
+            # Frames after PEERS use the framing and codec chosen by the remote peer
+            handler.set_protocol(
+                data.get("framing", DEFAULT_FRAMING),
+                data.get("codec", DEFAULT_CODEC),
+                aliases
+            )
+            
+            with self.lock:
+                keep, replaced = self._keep_connection(peer_id, initiator=self.peer_id)
+                self._dialing.pop(peer_id, None)
+            if replaced:
+                self._replace_link(replaced)
+            if not keep:
+                # The remote peer already took this link as live
+                self._replace_link(handler)
+                return
+            
             with self.lock:
                 self.known_peers[peer_id] = peer_info
+                self._identities[peer_id] = peer_info.identity
                 # Store the handler for this peer
                 handler.peer_id = peer_id
                 handler.peer_name = my_info["name"]
                 self.connections[peer_id] = handler
+                victim = self.view.add_active(peer_info.to_dict())
+                legacy = "codec" not in data
+                membership = data.get("membership") == MEMBERSHIP_PROTOCOL
+                changed = self._add_neighbor(peer_id, legacy, membership)
+                routes = self.routing.advertise(peer_id)
+                if "session" in data:
+                    self._open_session(peer_info, handler, data["session"])
+                if membership:
+                    self._start_members_sync(peer_id, data.get("digest"), resume)
+                if self.peer_cache:
+                    self.peer_cache.connected(peer_info.to_dict())
+            
+            if resume is not None:
+                self.reliability.resume(peer_id)
+            
+            # Our side of the route exchange (older peers don't route)
+            if not legacy:
+                handler.send(Message(
+                    msg_type=MessageType.PEERS,
+                    sender_id=self.peer_id,
+                    sender_name=self.name,
+                    data={"routes": routes}
+                ))
+            
+            if victim:
+                self._evict(victim)
             
             # Notify that peer has joined (for the initiating peer)
             # Call outside lock to prevent deadlock
             if self.on_peer_join:
-                self.on_peer_join(my_info["name"])
-        
-        # Connect to other known peers
-        peers = data.get("peers", [])
-        for peer_data in peers:
-            peer_id = peer_data["peer_id"]
-            if peer_id != self.peer_id and peer_id not in self.connections:
-                # Try to connect to this peer
-                threading.Thread(
-                    target=self.connect_to_peer,
-                    args=(peer_data["host"], peer_data["port"]),
-                    daemon=True
-                ).start()
+                self._run_blocking(self.on_peer_join, my_info["name"], peer_id)
+        
+        if "routes" in data and handler.peer_id:
+            with self.lock:
+                if self.connections.get(handler.peer_id) is handler:
+                    changed |= self.routing.update(handler.peer_id, data["routes"])
+        self._send_route_updates(changed)
+        
+        if "members" in data and handler.peer_id:
+            with self.lock:
+                if self.connections.get(handler.peer_id) is handler:
+                    if self.members.merge(data["members"], source=handler.peer_id):
+                        self._schedule_members_sync()
+                    self._members_received[handler.peer_id] = data.get("version", 0)
+        
+        # Known peers go to the passive view, only free active slots are dialed
+        if "peers" in data:
+            with self.lock:
+                self.view.add_passive(data["peers"])
+            self._fill_active_view()
+    
+    def _add_neighbor(self, peer_id: str, legacy: bool, membership: bool):
+        # Older peers neither relay nor ack, so they stay out of routing
+        # (dipanggil dengan self.lock dipegang)
+        if membership:
+            self.membership_peers.add(peer_id)
+        else:
+            self.membership_peers.discard(peer_id)
+        if legacy:
+            self.legacy_peers.add(peer_id)
+            return set()
+        self.legacy_peers.discard(peer_id)
+        return self.routing.add_neighbor(peer_id)
+    
+    def _keep_connection(self, peer_id: str, initiator: str) -> Tuple[bool, Optional[ConnectionHandler]]:
+        # Both sides dialed each other: keep the link opened by the lower
+        # peer id so both ends settle on the same socket. Returns (keep,
+        # link yang diganti); link itu ditutup pemanggil setelah lock dilepas
+        # karena send bisa langsung memicu disconnect (dipanggil dengan self.lock dipegang)
+        existing = self.connections.get(peer_id)
+        if existing is None:
+            return True, None
+        if initiator != min(self.peer_id, peer_id):
+            return False, None
+        del self.connections[peer_id]
+        return True, existing
+    
+    def _replace_link(self, handler: ConnectionHandler):
+        # tutup link duplikat; sisi lain mungkin masih memakainya sebagai
+        # link hidup, LEAVE "replaced" mencegah itu dianggap putus (redial)
+        handler.send(Message(
+            msg_type=MessageType.LEAVE,
+            sender_id=self.peer_id,
+            sender_name=self.name,
+            data={"reason": "replaced"}
+        ))
+        handler.stop()
+    
+    def _resume_session(self, peer_id: str, resume: Optional[dict]):
+        # cek token resume dari JOIN: (resumed, alias untuk link baru, alias
+        # yang kita terima lewat link lama) (dipanggil dengan self.lock dipegang)
+        session = self.sessions.get(peer_id)
+        if not resume or session is None or resume.get("token") != session.token:
+            return False, None, 0
+        return True, session.carry_aliases(resume.get("aliases", 0)), session.aliases_received()
+    
+    def _open_session(self, peer_info: PeerInfo, handler: ConnectionHandler, token: Optional[str] = None) -> str:
+        # sesi untuk link baru; yang menjawab JOIN membuat token baru
+        # (dipanggil dengan self.lock dipegang)
+        self._close_session(peer_info.peer_id)
+        token = token or generate_session_token()
+        self.sessions[peer_info.peer_id] = Session(peer_info.peer_id, token, peer_info.to_dict(), handler)
+        return token
+    
+    def _close_session(self, peer_id: str):
+        # lupakan sesi, peer keluar dengan sengaja (dipanggil dengan self.lock dipegang)
+        session = self.sessions.pop(peer_id, None)
+        if session is not None and session.timer:
+            session.timer.cancel()
+    
+    def _schedule_redial(self, session: Session):
+        # (dipanggil dengan self.lock dipegang)
+        delay = backoff_delay(session.attempts, self.reconnect_base, self.reconnect_max_delay)
+        if session.attempts == 0 and self.peer_id > session.peer_id:
+            # The lower id redials; we only step in if it never comes back,
+            # e.g. because its address changed
+            delay += self.session_ttl / 2
+        session.timer = self.wheel.schedule(delay, self._redial, session)
+    
+    def _redial(self, session: Session):
+        """Try to resume a dropped link, backing off until the session expires"""
+        expired = False
+        with self.lock:
+            if not self.running or self.sessions.get(session.peer_id) is not session:
+                return
+            if session.expires is None:
+                return
+            if time.monotonic() > session.expires:
+                del self.sessions[session.peer_id]
+                self._dialing.pop(session.peer_id, None)
+                self._forget_member_sync(session.peer_id)
+                # Nobody else may know it is gone, tell the network
+                if self.members.mark_dead(session.peer_id):
+                    self._schedule_members_sync()
+                expired = True
+            else:
+                if not session.dialing:
+                    session.dialing = True
+                    session.attempts += 1
+                    resume = {
+                        "token": session.token,
+                        "aliases": session.aliases_received(),
+                        "members": self._members_received.get(session.peer_id, 0)
+                    }
+                    future = self.dialer.submit(
+                        session.info["host"], session.info["port"], PRIORITY_HIGH, resume
+                    )
+                    future.add_done_callback(lambda _: setattr(session, "dialing", False))
+                self._schedule_redial(session)
+        
+        if expired:
+            logger.info(f"Giving up on {session.info['name']} ({session.peer_id[:8]}...)")
+            self._fill_active_view()
+    
+    def _start_members_sync(self, peer_id: str, digest: Optional[str], resume: Optional[dict]):
+        # titik awal delta member ke neighbor baru: lanjut dari versi yang
+        # sudah mereka terima (resume), tidak ada apa-apa (digest sama),
+        # atau seluruh tabel (dipanggil dengan self.lock dipegang)
+        if resume is not None:
+            since = min(resume.get("members", 0), self.members.version)
+        elif digest == self.members.digest_hex():
+            since = self.members.version
+        else:
+            since = 0
+        self._members_sent[peer_id] = since
+        if since < self.members.version:
+            self._schedule_members_sync()
+    
+    def _forget_member_sync(self, peer_id: str):
+        # (dipanggil dengan self.lock dipegang)
+        self._members_sent.pop(peer_id, None)
+        self._members_received.pop(peer_id, None)
+    
+    def _schedule_members_sync(self):
+        # kumpulkan perubahan sebentar lalu kirim sekaligus (dipanggil dengan self.lock dipegang)
+        if self._members_timer is None and self.running:
+            self._members_timer = self.wheel.schedule(0.1, self._sync_members)
+    
+    def _sync_members(self):
+        """Push member table deltas to neighbors, one bounded frame each per round"""
+        with self.lock:
+            self._members_timer = None
+            version = self.members.version
+            frames = []
+            for pid, handler in self.connections.items():
+                since = self._members_sent.get(pid)
+                if since is None or since >= version:
+                    continue
+                entries, upto = self.members.delta(since, MEMBERS_PER_FRAME, exclude=pid)
+                self._members_sent[pid] = upto
+                if entries:
+                    frames.append((handler, entries, upto))
+            # Large syncs go out a frame per neighbor per round
+            if any(self._members_sent.get(pid, version) < version for pid in self.connections):
+                self._schedule_members_sync()
+        
+        for handler, entries, upto in frames:
+            handler.send(Message(
+                msg_type=MessageType.PEERS,
+                sender_id=self.peer_id,
+                sender_name=self.name,
+                data={"members": entries, "version": upto}
+            ))
+    
+    def _evict(self, peer_id: str):
+        # putus link active view yang berlebih, peer itu pindah ke passive view
+        with self.lock:
+            handler = self.connections.pop(peer_id, None)
+            self.known_peers.pop(peer_id, None)
+            self._close_session(peer_id)
+            self._forget_member_sync(peer_id)
+            self.view.remove_active(peer_id)
+            changed = self.routing.remove_neighbor(peer_id)
+        if handler is None:
+            return
+        
+        handler.send(Message(
+            msg_type=MessageType.LEAVE,
+            sender_id=self.peer_id,
+            sender_name=self.name,
+            data={"reason": "evicted"}
+        ))
+        handler.stop()
+        logger.info(f"Evicted {peer_id[:8]}... from the active view")
+        self._send_route_updates(changed)
+        
+        if self.on_peer_leave:
+            self._run_blocking(self.on_peer_leave, handler.peer_name or peer_id, peer_id)
+    
+    def _fill_active_view(self, limit: Optional[int] = None):
+        # dial peer dari passive view sampai active view penuh (maks. `limit` dial)
+        with self.lock:
+            if not self.running:
+                return
+            now = time.monotonic()
+            for peer_id, deadline in list(self._dialing.items()):
+                if deadline < now:
+                    del self._dialing[peer_id]
+            missing = self.view.active_size - len(self.connections) - len(self._dialing)
+            if limit is not None:
+                missing = min(missing, limit - len(self._dialing))
+            if missing <= 0:
+                return
+            candidates = self.view.candidates(
+                missing, exclude=set(self._dialing) | set(self.connections)
+            )
+            # An isolated node must be let in, otherwise only ask for free slots
+            priority = PRIORITY_LOW if self.connections else PRIORITY_HIGH
+            for info in candidates:
+                self._dialing[info["peer_id"]] = now + self.handshake_timeout
+        
+        for info in candidates:
+            future = self.dialer.submit(info["host"], info["port"], priority)
+            future.add_done_callback(lambda f, info=info: self._dial_done(info, f))
+    
+    def _dial_done(self, info: dict, future):
+        # kandidat yang tidak bisa dihubungi dibuang dari passive view
+        if future.cancelled() or not future.result():
+            with self.lock:
+                self._dialing.pop(info["peer_id"], None)
+                self.view.remove_passive(info["peer_id"])
+    
+    def _shuffle(self):
+        # kirim sampel view ke neighbor acak untuk memperbarui passive view
+        with self.lock:
+            target = self.view.shuffle_target(
+                exclude=[pid for pid in self.view.active if pid not in self.membership_peers]
+            )
+            handler = self.connections.get(target) if target else None
+            if handler is None:
+                return
+            sample = self.view.sample(self.shuffle_length - 1, exclude=(target,))
+            self._shuffle_sent = [info["peer_id"] for info in sample]
+        
+        handler.send(Message(
+            msg_type=MessageType.SHUFFLE,
+            sender_id=self.peer_id,
+            sender_name=self.name,
+            data={"peers": [self.get_peer_info()] + sample}
+        ))
+    
+    def _handle_shuffle(self, message: Message, handler: ConnectionHandler):
+        # balas shuffle dengan sampel sebesar yang diterima
+        peers = message.data.get("peers", [])
+        with self.lock:
+            reply = self.view.sample(len(peers), exclude=(message.sender_id,))
+            self.view.add_passive(peers, replace=[info["peer_id"] for info in reply])
+        
+        handler.send(Message(
+            msg_type=MessageType.SHUFFLE_REPLY,
+            sender_id=self.peer_id,
+            sender_name=self.name,
+            data={"peers": reply}
+        ))
+    
+    def _handle_shuffle_reply(self, message: Message):
+        with self.lock:
+            self.view.add_passive(message.data.get("peers", []), replace=self._shuffle_sent)
+            self._shuffle_sent = []
     
     def _handle_ping(self, message: Message, handler: ConnectionHandler):
-        # handle ping
+        # handle ping, timestamp pengirim dikembalikan apa adanya
+        ts = message.data.get("ts") if isinstance(message.data, dict) else None
         pong_msg = Message(
             msg_type=MessageType.PONG,
             sender_id=self.peer_id,
-            sender_name=self.name
+            sender_name=self.name,
+            data={"ts": ts} if ts is not None else None
         )
         handler.send(pong_msg)
     
-    def _handle_pong(self, message: Message):
-        # handle PONG response
-        peer_id = message.sender_id
+    def _handle_pong(self, message: Message, handler: ConnectionHandler):
+        # handle PONG response: heartbeat untuk detector + sampel RTT
+        peer_id = handler.peer_id
+        now = time.monotonic()
+        ts = message.data.get("ts") if isinstance(message.data, dict) else None
         with self.lock:
             if peer_id in self.known_peers:
-                self.known_peers[peer_id].last_seen = datetime.now()
+                self.known_peers[peer_id].last_seen = now_us()
+            health = self.health.get(peer_id)
+            if health is None or self.connections.get(peer_id) is not handler:
+                return
+            health.detector.heartbeat(now)
+            if isinstance(ts, int):
+                health.rtt.update((now_us() - ts) / 1_000_000)
     
     def _handle_disconnect(self, handler: ConnectionHandler):
         """Handle peer disconnection"""
@@ -347,33 +1430,144 @@ class Peer:
         peer_name = handler.peer_name or "Unknown"
         
         with self.lock:
-            if peer_id and peer_id in self.connections:
+            # Only if this handler is still the live link (not a replaced duplicate)
+            removed = bool(peer_id) and self.connections.get(peer_id) is handler
+            if removed:
                 del self.connections[peer_id]
-            if peer_id and peer_id in self.known_peers:
-                del self.known_peers[peer_id]
+        
+        if removed:
+            self._link_lost(peer_id, peer_name)
+        else:
+            logger.info(f"Peer disconnected: {peer_name}")
+    
+    def _link_lost(self, peer_id: str, peer_name: str):
+        # link hidup ke peer hilang tanpa LEAVE: bersihkan state, redial kalau ada sesi
+        with self.lock:
+            self.known_peers.pop(peer_id, None)
+            # A failed link is not worth keeping as a candidate
+            self.view.remove_active(peer_id, keep=False)
+            self.health.pop(peer_id, None)
+            self.legacy_peers.discard(peer_id)
+            self.membership_peers.discard(peer_id)
+            changed = self.routing.remove_neighbor(peer_id)
+            session = self.sessions.get(peer_id)
+            if session is not None and self.running:
+                # Hold the slot while we try to get the link back
+                session.expires = time.monotonic() + self.session_ttl
+                session.attempts = 0
+                self._dialing[peer_id] = session.expires
+            else:
+                session = None
+                self._forget_member_sync(peer_id)
         
         logger.info(f"Peer disconnected: {peer_name}")
+        if session is not None:
+            if self.peer_id < session.peer_id:
+                # A flapping link is usually back already, try right away
+                self._redial(session)
+            else:
+                with self.lock:
+                    self._schedule_redial(session)
+        self._send_route_updates(changed)
+        self._fill_active_view()
         
-        if self.on_peer_leave and peer_name != "Unknown":
-            self.on_peer_leave(peer_name)
+        # LEAVE and eviction already removed the peer and notified
+        if self.on_peer_leave:
+            self._run_blocking(self.on_peer_leave, peer_name, peer_id)
     
     def _broadcast_message(self, message: Message):
         """Send message to all connected peers"""
         with self.lock:
-            for handler in list(self.connections.values()):
-                try:
-                    handler.send(message)
-                except:
-                    pass
+            handlers = list(self.connections.values())
+        
+        # Serialize once per codec; recipients share the same immutable buffer
+        encoded = {}
+        for handler in handlers:
+            try:
+                handler.send(message, encoded)
+            except:
+                pass
     
-    def _heartbeat_loop(self):
-        """Periodic heartbeat to check peer connections"""
-        while self.running:
-            time.sleep(30)  # Every 30 seconds
-            
-            ping_msg = Message(
-                msg_type=MessageType.PING,
-                sender_id=self.peer_id,
-                sender_name=self.name
-            )
-            self._broadcast_message(ping_msg)
+    def _heartbeat_tick(self):
+        """Ping every peer and evict the ones the failure detector suspects"""
+        if not self.running:
+            return
+        self.wheel.schedule(self.heartbeat_interval, self._heartbeat_tick)
+        
+        now = time.monotonic()
+        suspected = []
+        with self.lock:
+            for pid in list(self.health):
+                if pid not in self.connections:
+                    del self.health[pid]
+            for pid, handler in self.connections.items():
+                health = self.health.get(pid)
+                if health is None:
+                    self.health[pid] = PeerHealth(now, self.heartbeat_interval)
+                    continue
+                phi = health.detector.phi(now)
+                if phi > self.phi_threshold or health.silence(now) > self.failure_timeout:
+                    suspected.append((handler, phi))
+        
+        for handler, phi in suspected:
+            logger.warning(f"Peer {handler.peer_name} suspected (phi={phi:.1f}), disconnecting")
+            handler.stop()
+            self._handle_disconnect(handler)
+        
+        ping_msg = Message(
+            msg_type=MessageType.PING,
+            sender_id=self.peer_id,
+            sender_name=self.name,
+            data={"ts": now_us()}
+        )
+        self._broadcast_message(ping_msg)
+    
+    def _outbox_tick(self):
+        """Expire old outbox entries and retry peers that are reachable again"""
+        if not self.running:
+            return
+        self.wheel.schedule(60.0, self._outbox_tick)
+        
+        # Entries for identities never seen again go with outbox_max_age
+        self.outbox.expire()
+        with self.lock:
+            peer_ids = self._peers_with_identity(self.outbox.pending_peers())
+        self._drain_reachable(peer_ids)
+    
+    def _peer_cache_tick(self):
+        """Persist the peer cache periodically, not only on a clean shutdown"""
+        if not self.running:
+            return
+        self.wheel.schedule(self.peer_cache_interval, self._peer_cache_tick)
+        self._save_peer_cache()
+    
+    def _save_peer_cache(self):
+        # neighbor yang masih terkoneksi dicatat berhasil (dengan RTT terakhir),
+        # passive view sebagai cadangan
+        with self.lock:
+            active = []
+            for pid in self.connections:
+                info = self.known_peers.get(pid)
+                if info is None:
+                    continue
+                health = self.health.get(pid)
+                active.append((info.to_dict(), health.rtt.srtt if health else None))
+            passive = list(self.view.passive.values())
+        for info, rtt in active:
+            self.peer_cache.connected(info, rtt)
+        self.peer_cache.known(passive)
+        self.peer_cache.save()
+    
+    def _membership_tick(self):
+        """Periodic shuffle and active view repair"""
+        if not self.running:
+            return
+        self.wheel.schedule(self.shuffle_interval, self._membership_tick)
+        
+        with self.lock:
+            self.members.expire()
+            if self.discovery:
+                self._schedule_partition_check()
+        self._shuffle()
+        # Gentle repair: near-full views would mostly get "full" replies
+        self._fill_active_view(limit=1)
@@ -0,0 +1,145 @@
+# Cache peer yang dikenal di file JSON, untuk warm start setelah restart
+import json
+import os
+import tempfile
+import threading
+import time
+import logging
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+
+
+class PeerCache:
+    # Alamat peer dari active/passive view plus RTT terakhir dan waktu koneksi
+    # terakhir yang berhasil. Key-nya alamat, bukan peer id, karena peer id
+    # dibuat ulang setiap peer start. Peer yang sering gagal atau sudah lama
+    # tidak berhasil dihubungi dibuang.
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 64,
+        max_age: float = 7 * 24 * 3600,
+        max_failures: int = 5
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age            # detik sejak koneksi terakhir berhasil
+        self.max_failures = max_failures  # dial gagal berturut-turut
+        self.entries: Dict[str, dict] = {}  # "host:port" -> entry
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(host: str, port: int) -> str:
+        return f"{host}:{port}"
+
+    def load(self) -> int:
+        # baca file cache; file yang tidak ada atau rusak = cache kosong
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring peer cache {self.path}: {e}")
+            return 0
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return 0
+        with self._lock:
+            for entry in data.get("peers", []):
+                try:
+                    self.entries[self.key(entry["host"], entry["port"])] = entry
+                except (KeyError, TypeError):
+                    continue
+            self._prune()
+            return len(self.entries)
+
+    def save(self) -> bool:
+        # tulis ke file sementara lalu rename, file lama tetap utuh kalau gagal
+        with self._lock:
+            self._prune()
+            peers = [dict(entry) for entry in self.entries.values()]
+        data = {"version": CACHE_VERSION, "saved": time.time(), "peers": peers}
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=".peers-", dir=directory)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f, separators=(",", ":"))
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError as e:
+            logger.error(f"Error saving peer cache: {e}")
+            return False
+        return True
+
+    def connected(self, info: dict, rtt: Optional[float] = None, now: Optional[float] = None):
+        # peer berhasil dihubungi (handshake selesai)
+        with self._lock:
+            entry = self._entry(info)
+            entry["last_success"] = now if now is not None else time.time()
+            entry["failures"] = 0
+            if rtt is not None:
+                entry["rtt"] = rtt
+
+    def known(self, infos: Iterable[dict]):
+        # alamat dari passive view; tidak mengubah riwayat koneksinya
+        with self._lock:
+            for info in infos:
+                self._entry(info)
+
+    def failed(self, host: str, port: int):
+        with self._lock:
+            entry = self.entries.get(self.key(host, port))
+            if entry is not None:
+                entry["failures"] = entry.get("failures", 0) + 1
+
+    def ranked(self, limit: Optional[int] = None) -> List[dict]:
+        # terbaik dulu: belum pernah gagal, RTT kecil, paling baru berhasil
+        with self._lock:
+            return [dict(entry) for entry in self._ranked(limit)]
+
+    def latest(self) -> Optional[dict]:
+        # peer yang paling baru berhasil dihubungi, None kalau belum ada
+        with self._lock:
+            entries = [entry for entry in self.entries.values() if entry.get("last_success")]
+            if not entries:
+                return None
+            return dict(max(entries, key=lambda entry: entry["last_success"]))
+
+    def _ranked(self, limit: Optional[int]) -> List[dict]:
+        def rank(entry):
+            rtt = entry.get("rtt")
+            return (
+                entry.get("failures", 0),
+                rtt if rtt is not None else float("inf"),
+                -entry.get("last_success", 0.0)
+            )
+        return sorted(self.entries.values(), key=rank)[:limit]
+
+    def _prune(self, now: Optional[float] = None):
+        # (dipanggil dengan self._lock dipegang)
+        now = now if now is not None else time.time()
+        for key, entry in list(self.entries.items()):
+            stale = "last_success" in entry and now - entry["last_success"] > self.max_age
+            if stale or entry.get("failures", 0) >= self.max_failures:
+                del self.entries[key]
+        if len(self.entries) > self.max_entries:
+            keep = self._ranked(self.max_entries)
+            self.entries = {self.key(e["host"], e["port"]): e for e in keep}
+
+    def _entry(self, info: dict) -> dict:
+        key = self.key(info["host"], info["port"])
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = {"host": info["host"], "port": info["port"]}
+        # Ids change on every restart, the latest one is just for display
+        entry["peer_id"] = info.get("peer_id")
+        entry["name"] = info.get("name")
+        return entry
@@ -0,0 +1,333 @@
+# Transport event-loop untuk P2P (satu thread selectors untuk semua koneksi)
+import socket
+import selectors
+import threading
+import logging
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .network import ConnectionHandler, limit_buffers, send_buffers, consume_buffers
+from .framing import FrameError
+from .message import Message
+
+logger = logging.getLogger(__name__)
+
+
+class Reactor:
+    # event loop berbasis selectors, tanpa polling timeout. Semua koneksi
+    # dilayani satu thread ini, jadi handler pesan tidak boleh blocking
+    # (SQLite, dial sinkron, callback aplikasi): kerjaan seperti itu
+    # diserahkan ke worker (Peer._run_blocking, thread _drain_outbox).
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.running = False
+        self.thread = None
+        self._calls = deque()
+        self._calls_lock = threading.Lock()
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+
+    def start(self):
+        # jalankan event loop
+        self.running = True
+        self.selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # stop event loop
+        self.running = False
+        self._wakeup()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2.0)
+
+    def in_loop(self) -> bool:
+        # cek apakah dipanggil dari thread event loop
+        return self.thread is threading.current_thread()
+
+    def call_soon(self, callback: Callable, *args):
+        # jadwalkan callback di thread event loop (thread-safe)
+        with self._calls_lock:
+            self._calls.append((callback, args))
+        self._wakeup()
+
+    def register(self, sock: socket.socket, events: int, handler):
+        # daftarkan socket, handler harus punya _on_readable/_on_writable
+        try:
+            self.selector.register(sock, events, handler)
+        except KeyError:
+            self.selector.modify(sock, events, handler)
+
+    def modify(self, sock: socket.socket, events: int, handler):
+        try:
+            self.selector.modify(sock, events, handler)
+        except KeyError:
+            self.selector.register(sock, events, handler)
+
+    def unregister(self, sock: socket.socket):
+        try:
+            self.selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+
+    def connection_count(self) -> int:
+        # jumlah socket yang dilayani (tanpa wakeup socket)
+        return max(len(self.selector.get_map()) - 1, 0)
+
+    def _wakeup(self):
+        try:
+            self._wakeup_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass
+
+    def _run_calls(self):
+        with self._calls_lock:
+            calls = list(self._calls)
+            self._calls.clear()
+        for callback, args in calls:
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.error(f"Error in reactor callback: {e}")
+
+    def _run(self):
+        # loop utama, select() blok sampai ada event
+        while self.running:
+            for key, events in self.selector.select():
+                handler = key.data
+                if handler is None:
+                    try:
+                        while self._wakeup_r.recv(4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                    continue
+                try:
+                    if events & selectors.EVENT_READ:
+                        handler._on_readable()
+                    if events & selectors.EVENT_WRITE:
+                        handler._on_writable()
+                except Exception as e:
+                    logger.error(f"Error handling socket event: {e}")
+            self._run_calls()
+
+        for key in list(self.selector.get_map().values()):
+            if key.data is not None:
+                try:
+                    key.fileobj.close()
+                except OSError:
+                    pass
+        self.selector.close()
+        self._wakeup_r.close()
+        self._wakeup_w.close()
+
+
+class ReactorConnection(ConnectionHandler):
+    # koneksi peer yang dilayani oleh Reactor
+
+    def __init__(
+        self,
+        reactor: Reactor,
+        sock: socket.socket,
+        address: Tuple[str, int],
+        peer_id: Optional[str] = None,
+        on_message: Optional[Callable[[Message, ConnectionHandler], None]] = None,
+        on_disconnect: Optional[Callable[[ConnectionHandler], None]] = None
+    ):
+        super().__init__(sock, address, peer_id, on_message, on_disconnect)
+        self.reactor = reactor
+        self.closed = False
+        self._pending: List[memoryview] = []
+        self._out_lock = threading.Lock()
+        self._want_write = False
+
+    def start(self):
+        # daftarkan ke event loop
+        limit_buffers(self.socket, self.recv_buffer, self.notsent_lowat)
+        self.running = True
+        self.socket.setblocking(False)
+        self.reactor.call_soon(self.reactor.register, self.socket, selectors.EVENT_READ, self)
+
+    def stop(self):
+        # stop koneksi setelah antrian kirim terkirim
+        self.running = False
+        self.send_queue.close()
+        self._request_write()
+
+    def send(self, message: Message, encoded: Optional[Dict[str, bytes]] = None):
+        # antrikan pesan, ditulis oleh event loop
+        super().send(message, encoded)
+        self._request_write()
+
+    def set_protocol(self, framing: str, codec: str, aliases: Optional[tuple] = None, last: Optional[Message] = None):
+        super().set_protocol(framing, codec, aliases, last)
+        if last is not None:
+            self._request_write()
+
+    def _can_block(self) -> bool:
+        # The loop thread must never wait on its own queue
+        return not self.reactor.in_loop()
+
+    def _request_write(self):
+        with self._out_lock:
+            if self._want_write or self.closed:
+                return
+            self._want_write = True
+        if self.reactor.in_loop():
+            self._on_writable()
+        else:
+            self.reactor.call_soon(self._on_writable)
+
+    def _on_readable(self):
+        try:
+            received = self.decoder.recv_into(self.socket)
+            if received:
+                self._process_frames()
+        except (BlockingIOError, InterruptedError):
+            return
+        except (OSError, FrameError) as e:
+            if self.running:
+                logger.error(f"Connection error with {self.address}: {e}")
+            self._handle_disconnect()
+            return
+
+        if not received:
+            self._handle_disconnect()
+
+    def _on_writable(self):
+        if self.closed:
+            return
+        error = False
+        flushed = False
+        with self._out_lock:
+            try:
+                while True:
+                    if not self._pending:
+                        batch = self.send_queue.get_batch(block=False)
+                        if not batch:
+                            break
+                        self._pending = batch
+                    sent = send_buffers(self.socket, self._pending)
+                    self._pending = consume_buffers(self._pending, sent)
+                    if self._pending:
+                        break
+            except (BlockingIOError, InterruptedError):
+                pass
+            except OSError as e:
+                if self.running:
+                    logger.error(f"Error sending message to {self.address}: {e}")
+                self._pending = []
+                error = True
+
+            if not error:
+                self._want_write = bool(self._pending) or len(self.send_queue) > 0
+                flushed = not self._want_write and self.send_queue.closed
+                if not flushed:
+                    events = selectors.EVENT_READ
+                    if self._want_write:
+                        events |= selectors.EVENT_WRITE
+                    self.reactor.modify(self.socket, events, self)
+
+        if error:
+            self._handle_disconnect()
+        elif flushed:
+            self._close()
+
+    def _close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.reactor.unregister(self.socket)
+        self._close_socket()
+
+    def _handle_disconnect(self):
+        # handle disconnection (sekali saja)
+        self._close()
+        super()._handle_disconnect()
+
+
+class ReactorServer:
+    # TCP server yang accept lewat Reactor
+
+    def __init__(
+        self,
+        reactor: Reactor,
+        host: str,
+        port: int,
+        on_connection: Callable[[ConnectionHandler], None]
+    ):
+        self.reactor = reactor
+        self.host = host
+        self.port = port
+        self.on_connection = on_connection
+        self.server_socket = None
+        self.running = False
+
+    def start(self):
+        # jalankan server
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind((self.host, self.port))
+        self.server_socket.listen(socket.SOMAXCONN)
+        self.server_socket.setblocking(False)
+
+        self.running = True
+        self.reactor.call_soon(self.reactor.register, self.server_socket, selectors.EVENT_READ, self)
+
+        logger.info(f"P2P Server (selector) listening on {self.host}:{self.port}")
+
+    def stop(self):
+        # stop server
+        self.running = False
+        if self.server_socket:
+            self.reactor.call_soon(self._close)
+
+    def _close(self):
+        self.reactor.unregister(self.server_socket)
+        self.server_socket.close()
+
+    def _on_readable(self):
+        # accept semua koneksi yang sudah antri
+        while self.running:
+            try:
+                client_socket, address = self.server_socket.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logger.error(f"Error accepting connection: {e}")
+                return
+
+            logger.info(f"New connection from {address}")
+            handler = ReactorConnection(self.reactor, client_socket, address)
+            self.on_connection(handler)
+
+    def _on_writable(self):
+        pass
+
+
+class ReactorClient:
+    # TCP client yang menyerahkan socket ke Reactor
+
+    @staticmethod
+    def connect(
+        reactor: Reactor,
+        host: str,
+        port: int,
+        timeout: float = 5.0
+    ) -> Optional[ReactorConnection]:
+        # konek ke server
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(timeout)
+            sock.connect((host, port))
+
+            handler = ReactorConnection(reactor, sock, (host, port))
+            logger.info(f"Connected to peer at {host}:{port}")
+            return handler
+
+        except Exception as e:
+            logger.error(f"Failed to connect to {host}:{port}: {e}")
+            sock.close()
+            return None
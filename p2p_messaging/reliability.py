@@ -0,0 +1,389 @@
+# Pengiriman andal end-to-end: sequence number, ack kumulatif/selektif, retransmit
+import threading
+import time
+import logging
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from .failure import TimingWheel, RttEstimator
+from .message import Message
+
+logger = logging.getLogger(__name__)
+
+# Maksimal range SACK per ACK
+MAX_SACK_RANGES = 16
+
+
+class Delivery:
+    # handle satu pesan andal; bisa ditunggu (wait) atau diberi callback
+
+    __slots__ = ("peer_id", "message", "attempts", "sent_at", "timer", "delivered", "_event", "_callbacks")
+
+    def __init__(self, peer_id: str, message: Message):
+        self.peer_id = peer_id
+        self.message = message
+        self.attempts = 0
+        self.sent_at = 0.0
+        self.timer = None
+        self.delivered: Optional[bool] = None  # None = masih dikirim
+        self._event = threading.Event()
+        self._callbacks: List[Callable[["Delivery"], None]] = []
+
+    @property
+    def seq(self) -> int:
+        return self.message.seq
+
+    @property
+    def done(self) -> bool:
+        return self.delivered is not None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        # tunggu sampai di-ack (True) atau gagal/timeout (False)
+        self._event.wait(timeout)
+        return bool(self.delivered)
+
+    def add_done_callback(self, callback: Callable[["Delivery"], None]):
+        # callback(delivery) dipanggil sekali setelah selesai
+        if self.done:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def _complete(self, delivered: bool):
+        if self.done:
+            return
+        self.delivered = delivered
+        if self.timer:
+            self.timer.cancel()
+        self._event.set()
+        for callback in self._callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                logger.error(f"Error in delivery callback: {e}")
+        self._callbacks = []
+
+
+class SendWindow:
+    # state pengirim ke satu peer
+
+    __slots__ = ("next_seq", "inflight", "backlog", "rtt", "abandoned")
+
+    def __init__(self):
+        self.next_seq = 1
+        self.inflight: Dict[int, Delivery] = {}  # seq -> Delivery, urut seq
+        self.backlog = deque()                   # menunggu ruang di window
+        self.rtt = RttEstimator()
+        self.abandoned = 0                       # seq terbesar yang gagal
+
+    def settled(self) -> int:
+        # semua seq <= nilai ini sudah di-ack atau gagal
+        if self.inflight:
+            return next(iter(self.inflight)) - 1
+        if self.backlog:
+            return self.backlog[0].seq - 1
+        return self.next_seq - 1
+
+
+class ReceiveWindow:
+    # state penerima dari satu peer
+
+    __slots__ = ("cumulative", "pending", "unacked", "timer")
+
+    def __init__(self):
+        self.cumulative = 0          # semua seq <= cumulative sudah diterima
+        self.pending = set()         # seq > cumulative yang sudah diterima
+        self.unacked = 0             # frame sejak ACK terakhir
+        self.timer = None
+
+    def receive(self, seq: int) -> bool:
+        # return False kalau seq duplikat
+        if seq <= self.cumulative or seq in self.pending:
+            return False
+        if seq == self.cumulative + 1:
+            self.cumulative = seq
+            while self.cumulative + 1 in self.pending:
+                self.cumulative += 1
+                self.pending.remove(self.cumulative)
+        else:
+            self.pending.add(seq)
+        return True
+
+    def forward(self, seq: int):
+        # pengirim sudah menyerah pada seq <= `seq`, jangan ditunggu lagi
+        if seq <= self.cumulative:
+            return
+        self.cumulative = seq
+        self.pending = {s for s in self.pending if s > seq}
+        while self.cumulative + 1 in self.pending:
+            self.cumulative += 1
+            self.pending.remove(self.cumulative)
+
+    def ranges(self) -> List[List[int]]:
+        # seq di atas cumulative sebagai range [awal, akhir]
+        result = []
+        for seq in sorted(self.pending):
+            if result and result[-1][1] == seq - 1:
+                result[-1][1] = seq
+            elif len(result) < MAX_SACK_RANGES:
+                result.append([seq, seq])
+            else:
+                break
+        return result
+
+
+class ReliabilityManager:
+    # Sequence number per peer tujuan (end-to-end, jadi tetap berlaku lewat
+    # relay). Penerima mengirim satu ACK per `ack_every` frame atau setelah
+    # `ack_delay` detik; ACK membawa seq kumulatif plus range SACK. Frame
+    # yang tidak di-ack dikirim ulang setelah RTO (backoff eksponensial)
+    # sampai `max_retries`, lalu Delivery dinyatakan gagal; tanpa rute
+    # langsung gagal. Seq yang gagal dilewati penerima lewat ACK berisi
+    # {"forward": seq}, jadi seq kumulatifnya tidak macet di lubang itu.
+
+    def __init__(
+        self,
+        wheel: TimingWheel,
+        transmit: Callable[[str, Message], bool],
+        send_ack: Callable[[str, dict], bool],
+        window: int = 256,
+        ack_delay: float = 0.05,
+        ack_every: int = 64,
+        max_retries: int = 8
+    ):
+        self.wheel = wheel
+        self.transmit = transmit
+        self.send_ack = send_ack
+        self.window = window
+        self.ack_delay = ack_delay
+        self.ack_every = ack_every
+        self.max_retries = max_retries
+        self.stats = {
+            "sent": 0, "retransmits": 0, "delivered": 0, "failed": 0,
+            "received": 0, "duplicates": 0, "acks_sent": 0, "acks_received": 0
+        }
+        self._send: Dict[str, SendWindow] = {}
+        self._recv: Dict[str, ReceiveWindow] = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["inflight"] = sum(len(w.inflight) + len(w.backlog) for w in self._send.values())
+        return stats
+
+    # ---- Pengirim ----
+
+    def send(self, peer_id: str, message: Message) -> Delivery:
+        # beri seq lalu kirim; lewat window ditahan di backlog
+        with self._lock:
+            window = self._send.get(peer_id)
+            if window is None:
+                window = self._send[peer_id] = SendWindow()
+            message.seq = window.next_seq
+            window.next_seq += 1
+            delivery = Delivery(peer_id, message)
+            self.stats["sent"] += 1
+            if len(window.inflight) >= self.window:
+                window.backlog.append(delivery)
+                return delivery
+            window.inflight[message.seq] = delivery
+        self._send_all([delivery], window)
+        return delivery
+
+    def on_ack(self, peer_id: str, data: dict):
+        # proses ACK: {"ack": kumulatif, "sack": [[awal, akhir], ...]}
+        if "forward" in data:
+            self._on_forward(peer_id, data["forward"])
+            return
+        now = time.monotonic()
+        acked = []
+        forward = None
+        with self._lock:
+            window = self._send.get(peer_id)
+            if window is None:
+                return
+            self.stats["acks_received"] += 1
+            cumulative = data.get("ack", 0)
+            # inflight is ordered by seq, pop from the front
+            for seq in list(window.inflight):
+                if seq > cumulative:
+                    break
+                acked.append(window.inflight.pop(seq))
+            newest = 0.0
+            for start, end in data.get("sack", []):
+                for seq in range(max(start, cumulative + 1), end + 1):
+                    delivery = window.inflight.pop(seq, None)
+                    if delivery is not None:
+                        acked.append(delivery)
+                        newest = max(newest, delivery.sent_at)
+
+            # Karn's rule: only frames sent once give RTT samples
+            fresh = [d for d in acked if d.attempts == 1]
+            if fresh:
+                window.rtt.update(now - fresh[-1].sent_at)
+            self.stats["delivered"] += len(acked)
+
+            # Fast retransmit: frames sent before one the peer already got
+            # are holes, resend them now instead of waiting for the RTO
+            holes = []
+            for delivery in window.inflight.values():
+                if delivery.sent_at >= newest:
+                    break
+                holes.append(delivery)
+            self.stats["retransmits"] += len(holes)
+            released = self._release(window)
+
+            # The peer is still waiting for a seq we gave up on: the forward
+            # marker was lost, send it again
+            if window.abandoned > cumulative and window.settled() > cumulative:
+                forward = window.settled()
+
+        for delivery in acked:
+            delivery._complete(True)
+        for delivery in holes:
+            if delivery.timer:
+                delivery.timer.cancel()
+        self._send_all(holes + released, window)
+        if forward is not None:
+            self.send_ack(peer_id, {"forward": forward})
+
+    def resume(self, peer_id: str):
+        # link ke peer tersambung lagi: kirim ulang yang belum di-ack sekarang
+        # juga, tidak menunggu RTO yang sudah di-backoff selama link putus
+        with self._lock:
+            window = self._send.get(peer_id)
+            if window is None:
+                return
+            pending = list(window.inflight.values())
+            self.stats["retransmits"] += len(pending)
+            forward = window.settled() if window.abandoned else None
+        for delivery in pending:
+            if delivery.timer:
+                delivery.timer.cancel()
+            # A new link gets a fresh retry budget (still no RTT sample)
+            delivery.attempts = min(delivery.attempts, 1)
+        self._send_all(pending, window)
+        if forward:
+            self.send_ack(peer_id, {"forward": forward})
+
+    def close(self):
+        # gagalkan semua pengiriman yang belum selesai (saat peer berhenti)
+        with self._lock:
+            pending = []
+            for window in self._send.values():
+                pending.extend(window.inflight.values())
+                pending.extend(window.backlog)
+                window.inflight.clear()
+                window.backlog.clear()
+            self.stats["failed"] += len(pending)
+        for delivery in pending:
+            delivery._complete(False)
+
+    def _release(self, window: SendWindow) -> List[Delivery]:
+        # pindahkan backlog ke window yang kosong (dipanggil dengan lock)
+        released = []
+        while window.backlog and len(window.inflight) < self.window:
+            delivery = window.backlog.popleft()
+            window.inflight[delivery.seq] = delivery
+            released.append(delivery)
+        return released
+
+    def _transmit(self, delivery: Delivery, window: SendWindow) -> bool:
+        # False kalau tidak ada rute (frame tidak terkirim, tanpa timer)
+        delivery.attempts += 1
+        delivery.sent_at = time.monotonic()
+        if not self.transmit(delivery.peer_id, delivery.message):
+            return False
+        timeout = window.rtt.rto() * (2 ** (delivery.attempts - 1))
+        delivery.timer = self.wheel.schedule(timeout, self._on_timeout, delivery, window)
+        return True
+
+    def _send_all(self, deliveries: List[Delivery], window: SendWindow):
+        # kirim berurutan; yang tidak punya rute langsung gagal, tidak menunggu
+        # RTO (backlog yang jadi masuk window ikut dikirim di loop ini)
+        queue = deque(deliveries)
+        while queue:
+            delivery = queue.popleft()
+            if not self._transmit(delivery, window):
+                queue.extend(self._abandon(delivery, window))
+
+    def _abandon(self, delivery: Delivery, window: SendWindow) -> List[Delivery]:
+        # nyatakan gagal, beri tahu penerima supaya seq-nya dilewati; return
+        # backlog yang sekarang masuk window
+        with self._lock:
+            if window.inflight.get(delivery.seq) is not delivery:
+                return []
+            del window.inflight[delivery.seq]
+            self.stats["failed"] += 1
+            window.abandoned = max(window.abandoned, delivery.seq)
+            released = self._release(window)
+            forward = window.settled()
+
+        logger.warning(f"Message {delivery.seq} to {delivery.peer_id[:8]}... not acknowledged")
+        delivery._complete(False)
+        # Earlier seqs still in flight: the next ACK triggers the marker
+        if forward >= delivery.seq:
+            self.send_ack(delivery.peer_id, {"forward": forward})
+        return released
+
+    def _on_timeout(self, delivery: Delivery, window: SendWindow):
+        if delivery.done:
+            return
+        with self._lock:
+            if window.inflight.get(delivery.seq) is not delivery:
+                return
+            failed = delivery.attempts > self.max_retries
+            if not failed:
+                self.stats["retransmits"] += 1
+
+        if failed:
+            self._send_all(self._abandon(delivery, window), window)
+        else:
+            self._send_all([delivery], window)
+
+    # ---- Penerima ----
+
+    def on_message(self, peer_id: str, seq: int) -> bool:
+        # catat seq yang diterima, return False kalau duplikat
+        with self._lock:
+            window = self._recv.get(peer_id)
+            if window is None:
+                window = self._recv[peer_id] = ReceiveWindow()
+            new = window.receive(seq)
+            self.stats["received" if new else "duplicates"] += 1
+            window.unacked += 1
+            flush = window.unacked >= self.ack_every
+            if not flush and window.timer is None:
+                window.timer = self.wheel.schedule(self.ack_delay, self._flush_ack, peer_id)
+        if flush:
+            self._flush_ack(peer_id)
+        return new
+
+    def _on_forward(self, peer_id: str, seq: int):
+        # pengirim melewati seq yang gagal; ACK langsung supaya dia berhenti
+        # mengirim ulang penandanya
+        with self._lock:
+            window = self._recv.get(peer_id)
+            if window is None:
+                window = self._recv[peer_id] = ReceiveWindow()
+            window.forward(seq)
+            window.unacked += 1
+        self._flush_ack(peer_id)
+
+    def _flush_ack(self, peer_id: str):
+        with self._lock:
+            window = self._recv.get(peer_id)
+            if window is None:
+                return
+            if window.timer is not None:
+                window.timer.cancel()
+                window.timer = None
+            if not window.unacked:
+                return
+            window.unacked = 0
+            data = {"ack": window.cumulative}
+            if window.pending:
+                data["sack"] = window.ranges()
+            self.stats["acks_sent"] += 1
+        self.send_ack(peer_id, data)
@@ -0,0 +1,121 @@
+# Routing multi-hop (distance-vector) untuk pesan ke peer yang tidak terhubung langsung
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+# Jarak maksimum; sekaligus TTL awal untuk pesan yang diteruskan
+MAX_HOPS = 16
+
+
+class RoutingTable:
+    # Tabel distance-vector: tujuan -> (next hop, jumlah hop).
+    # Vektor jarak dari tiap neighbor disimpan supaya rute bisa dihitung
+    # ulang saat neighbor putus. Update dikirim sebagai delta dengan split
+    # horizon + poisoned reverse untuk mencegah count-to-infinity.
+
+    def __init__(self, self_id: str, max_hops: int = MAX_HOPS):
+        self.self_id = self_id
+        self.max_hops = max_hops
+        self.neighbors: Dict[str, Dict[str, int]] = {}  # neighbor -> {tujuan: hop}
+        self.routes: Dict[str, Tuple[str, int]] = {}    # tujuan -> (next hop, hop)
+
+    def __len__(self) -> int:
+        return len(self.routes)
+
+    def next_hop(self, dest: str) -> Optional[str]:
+        route = self.routes.get(dest)
+        return route[0] if route else None
+
+    def distance(self, dest: str) -> Optional[int]:
+        route = self.routes.get(dest)
+        return route[1] if route else None
+
+    def add_neighbor(self, peer_id: str) -> Set[str]:
+        # tambah link langsung, return tujuan yang rutenya berubah
+        self.neighbors.setdefault(peer_id, {})
+        return self._recompute([peer_id])
+
+    def remove_neighbor(self, peer_id: str) -> Set[str]:
+        # hapus link, rute lewat neighbor ini dihitung ulang
+        vector = self.neighbors.pop(peer_id, None)
+        if vector is None:
+            return set()
+        affected = {dest for dest, (hop, _) in self.routes.items() if hop == peer_id}
+        affected.add(peer_id)
+        return self._recompute(affected)
+
+    def update(self, neighbor: str, entries: Dict[str, int]) -> Set[str]:
+        # terapkan delta dari neighbor, return tujuan yang rutenya berubah
+        vector = self.neighbors.get(neighbor)
+        if vector is None:
+            return set()
+
+        changed = set()
+        rescan = []
+        for dest, hops in entries.items():
+            if dest == self.self_id:
+                continue
+            if hops >= self.max_hops:
+                vector.pop(dest, None)
+            else:
+                vector[dest] = hops
+
+            candidate = hops + 1
+            route = self.routes.get(dest)
+            if route is not None and route[0] == neighbor:
+                if candidate < route[1]:
+                    self.routes[dest] = (neighbor, candidate)
+                    changed.add(dest)
+                elif candidate > route[1]:
+                    # Our route got worse or was withdrawn, look at other neighbors
+                    rescan.append(dest)
+            elif candidate < self.max_hops and (route is None or candidate < route[1]):
+                self.routes[dest] = (neighbor, candidate)
+                changed.add(dest)
+
+        changed |= self._recompute(rescan)
+        return changed
+
+    def advertise(self, neighbor: str, dests: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        # vektor jarak untuk dikirim ke neighbor (semua rute kalau dests None)
+        if dests is None:
+            dests = list(self.routes)
+        entries = {}
+        for dest in dests:
+            if dest == neighbor:
+                continue
+            route = self.routes.get(dest)
+            if route is None or route[0] == neighbor:
+                # Withdrawn, or poisoned reverse for routes through this neighbor
+                entries[dest] = self.max_hops
+            else:
+                entries[dest] = route[1]
+        return entries
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {
+            dest: {"next_hop": hop, "hops": hops}
+            for dest, (hop, hops) in self.routes.items()
+        }
+
+    def _recompute(self, dests: Iterable[str]) -> Set[str]:
+        changed = set()
+        for dest in dests:
+            if dest == self.self_id:
+                continue
+            best = None
+            if dest in self.neighbors:
+                best = (dest, 1)
+            else:
+                for neighbor, vector in self.neighbors.items():
+                    hops = vector.get(dest)
+                    if hops is None or hops + 1 >= self.max_hops:
+                        continue
+                    if best is None or hops + 1 < best[1]:
+                        best = (neighbor, hops + 1)
+
+            if self.routes.get(dest) != best:
+                if best is None:
+                    del self.routes[dest]
+                else:
+                    self.routes[dest] = best
+                changed.add(dest)
+        return changed
@@ -0,0 +1,52 @@
+# Sesi antar peer: token untuk resume koneksi yang putus dan backoff redial
+import random
+from typing import Optional
+
+from .message import AliasTable
+
+
+def backoff_delay(
+    attempt: int,
+    base: float,
+    cap: float,
+    rng: Optional[random.Random] = None
+) -> float:
+    # exponential backoff dengan full jitter: acak di [0, min(cap, base * 2^attempt)]
+    rng = rng or random
+    return rng.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class Session:
+    # State yang dipertahankan setelah link ke peer putus, supaya koneksi
+    # berikutnya cukup resume: token membuktikan kedua sisi terakhir memakai
+    # link yang sama, lalu alias peer id/nama dari link lama dipakai lagi.
+    # Token diganti setiap handshake/resume selesai.
+
+    __slots__ = ("peer_id", "token", "info", "handler", "expires", "attempts", "dialing", "timer")
+
+    def __init__(self, peer_id: str, token: str, info: dict, handler):
+        self.peer_id = peer_id
+        self.token = token
+        self.info = info                     # PeerInfo dict (alamat untuk redial)
+        self.handler = handler               # link yang sedang/terakhir dipakai
+        self.expires: Optional[float] = None  # None selama link hidup
+        self.attempts = 0
+        self.dialing = False                 # koneksi redial sedang dibuka
+        self.timer = None
+
+    def aliases_received(self) -> int:
+        # jumlah alias dari peer yang sampai lewat link lama
+        rx = self.handler.rx_aliases
+        return len(rx.rx) if rx else 0
+
+    def carry_aliases(self, delivered: int) -> Optional[tuple]:
+        # (tx, rx) baru dari tabel link lama; alias kirim dipotong ke
+        # `delivered` karena alias setelahnya tidak pernah sampai ke peer
+        old_tx, old_rx = self.handler.tx_aliases, self.handler.rx_aliases
+        if old_tx is None or old_rx is None:
+            return None
+        tx, rx = AliasTable(), AliasTable()
+        # Aliases are numbered in send order, so what arrived is a prefix
+        tx.tx = {key: alias for key, alias in old_tx.tx.items() if alias < delivered}
+        rx.rx = dict(old_rx.rx)
+        return tx, rx
@@ -1,10 +1,14 @@
 """
 Utility functions for P2P Messaging
 """
+import os
+import random
 import socket
+import time
 import uuid
 import hashlib
-from typing import Optional
+from datetime import datetime
+from typing import Optional, Union
 
 
 def get_local_ip() -> str:
@@ -35,6 +39,44 @@ def generate_peer_id(name: str, port: int) -> str:
     return hashlib.sha256(unique_str.encode()).hexdigest()[:16]
 
 
+def load_identity(path: str) -> str:
+    """
+    Load the persistent identity of this peer, creating it on first use
+    
+    The peer id changes on every start; the identity stays the same across
+    restarts so outbox entries and chat history can follow the peer.
+    
+    Args:
+        path: File holding the identity
+        
+    Returns:
+        Identity string (32 hex characters)
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            identity = f.read().strip()
+        if identity:
+            return identity
+    except FileNotFoundError:
+        pass
+    identity = uuid.uuid4().hex
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(identity)
+    os.replace(tmp, path)
+    return identity
+
+
+def generate_msg_id() -> int:
+    """Generate a random 64-bit message ID (fits the binary codec msg_id field)"""
+    return random.getrandbits(64)
+
+
+def generate_session_token() -> str:
+    """Generate a random token identifying one link between two peers"""
+    return uuid.uuid4().hex
+
+
 def is_port_available(port: int, host: str = "0.0.0.0") -> bool:
     """Check if a port is available"""
     try:
@@ -63,3 +105,25 @@ def parse_peer_address(address: str) -> tuple:
     """Parse peer address string to (host, port)"""
     parts = address.split(":")
     return parts[0], int(parts[1])
+
+
+def now_us() -> int:
+    """Current time as integer microseconds since the epoch"""
+    return time.time_ns() // 1000
+
+
+def parse_timestamp(value: Union[int, float, str, None]) -> int:
+    """Convert a wire timestamp (epoch microseconds or legacy ISO string) to epoch microseconds"""
+    if value is None:
+        return now_us()
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(datetime.fromisoformat(value).timestamp() * 1_000_000)
+    except (TypeError, ValueError):
+        return now_us()
+
+
+def format_timestamp(timestamp_us: int, fmt: str = "%H:%M") -> str:
+    """Format epoch microseconds for display"""
+    return datetime.fromtimestamp(timestamp_us / 1_000_000).strftime(fmt)
@@ -0,0 +1,107 @@
+# Dialer: antrian dial dengan batas konkurensi (user-017)
+import threading
+
+import pytest
+
+from p2p_messaging import Peer
+from p2p_messaging.dialer import Dialer
+
+
+class Gate:
+    # connect palsu yang tertahan sampai dibuka, mencatat alamat yang di-dial
+    def __init__(self):
+        self.opened = threading.Event()
+        self.started = threading.Semaphore(0)
+        self.calls = []
+
+    def __call__(self, host, port, *args):
+        self.calls.append((host, port))
+        self.started.release()
+        self.opened.wait(10)
+        return port != 0
+
+
+@pytest.fixture
+def gate():
+    gate = Gate()
+    yield gate
+    gate.opened.set()
+
+
+def test_submit_before_start_and_after_stop_returns_false(gate):
+    dialer = Dialer(gate)
+    assert dialer.submit("127.0.0.1", 1).result(0) is False
+
+    dialer.start()
+    gate.opened.set()
+    assert dialer.submit("127.0.0.1", 1).result(5) is True
+    dialer.stop()
+    assert dialer.submit("127.0.0.1", 1).result(0) is False
+    assert gate.calls == [("127.0.0.1", 1)]
+
+
+def test_connect_to_peer_on_stopped_peer_returns_false():
+    peer = Peer("alice", 1, host="127.0.0.1")
+    assert peer.connect_to_peer("127.0.0.1", 2) is False
+
+
+def test_stop_resolves_queued_dials_to_false(gate):
+    dialer = Dialer(gate, max_concurrent=1)
+    dialer.start()
+    running = dialer.submit("127.0.0.1", 1)
+    assert gate.started.acquire(timeout=5)
+    queued = dialer.submit("127.0.0.1", 2)
+    dialer.stop()
+    assert queued.result(5) is False
+    gate.opened.set()
+    assert running.result(5) is True
+    assert gate.calls == [("127.0.0.1", 1)]
+
+
+def test_same_address_is_dialed_once(gate):
+    dialer = Dialer(gate)
+    dialer.start()
+    try:
+        first = dialer.submit("127.0.0.1", 1)
+        second = dialer.submit("127.0.0.1", 1)
+        assert first is not second
+        assert dialer.pending() == [("127.0.0.1", 1)]
+        gate.opened.set()
+        assert first.result(5) and second.result(5)
+        assert gate.calls == [("127.0.0.1", 1)]
+    finally:
+        dialer.stop()
+
+
+def test_connect_many_timeout_keeps_shared_dial(gate):
+    dialer = Dialer(gate, max_concurrent=1)
+    dialer.start()
+    try:
+        busy = dialer.submit("127.0.0.1", 1)
+        assert gate.started.acquire(timeout=5)
+        # alamat 2 antri di belakang alamat 1; pemanggil lain ikut menunggu
+        other = dialer.submit("127.0.0.1", 2)
+        assert dialer.connect_many([("127.0.0.1", 2), ("127.0.0.1", 3)], timeout=0.1) == {
+            ("127.0.0.1", 2): False, ("127.0.0.1", 3): False,
+        }
+        assert not other.done()
+
+        gate.opened.set()
+        assert busy.result(5) and other.result(5)
+        # dial 3 hanya ditunggu connect_many, jadi dibatalkan selagi antri
+        assert gate.calls == [("127.0.0.1", 1), ("127.0.0.1", 2)]
+        assert dialer.pending() == []
+    finally:
+        dialer.stop()
+
+
+def test_connect_many_returns_results(gate):
+    dialer = Dialer(gate)
+    dialer.start()
+    gate.opened.set()
+    try:
+        assert dialer.connect_many([("127.0.0.1", 1), ("127.0.0.1", 0)], timeout=5) == {
+            ("127.0.0.1", 1): True, ("127.0.0.1", 0): False,
+        }
+    finally:
+        dialer.stop()
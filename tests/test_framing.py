@@ -0,0 +1,170 @@
+# Decoder frame recv_into dan negosiasi framing (user-002)
+import json
+import socket
+import time
+
+import pytest
+
+from p2p_messaging import Peer, Message, MessageType
+from p2p_messaging.framing import (
+    FRAMINGS, FRAGMENT_SIZE, LENGTH_HEADER, MAX_FRAME_SIZE,
+    ChunkedDecoder, FrameError, LengthDecoder, LineDecoder, negotiate_framing,
+)
+
+LEGACY = "00112233445566778899aabbccddeeff"
+
+
+def _read(decoder, pair, *chunks):
+    # kirim tiap potongan sebagai satu recv terpisah, kumpulkan frame lengkap
+    reader, writer = pair
+    frames = []
+    for chunk in chunks:
+        writer.sendall(chunk)
+        decoder.recv_into(reader)
+        while True:
+            frame = decoder.next_frame()
+            if frame is None:
+                break
+            frames.append(bytes(frame))
+    return frames
+
+
+@pytest.fixture
+def pair():
+    reader, writer = socket.socketpair()
+    yield reader, writer
+    reader.close()
+    writer.close()
+
+
+def _encode(framing, payload):
+    return b"".join(bytes(part) for part in FRAMINGS[framing].encode(payload))
+
+
+@pytest.mark.parametrize("framing", ["line", "length", "chunked"])
+def test_frame_split_across_reads(pair, framing):
+    wire = _encode(framing, b'{"hello": "world"}')
+    decoder = FRAMINGS[framing].decoder()
+    assert _read(decoder, pair, wire[:3], wire[3:9]) == []
+    assert _read(decoder, pair, wire[9:]) == [b'{"hello": "world"}']
+    assert len(decoder) == 0
+
+
+@pytest.mark.parametrize("framing", ["line", "length", "chunked"])
+def test_several_frames_in_one_read(pair, framing):
+    payloads = [b'{"n": %d}' % i for i in range(5)]
+    wire = b"".join(_encode(framing, payload) for payload in payloads)
+    # sisa frame ke-6 yang belum lengkap tetap tertahan di buffer
+    partial = _encode(framing, b'{"n": 5}')[:-2]
+    assert _read(FRAMINGS[framing].decoder(), pair, wire + partial) == payloads
+
+
+@pytest.mark.parametrize("framing", ["line", "length", "chunked"])
+def test_utf8_character_split_across_reads(pair, framing):
+    payload = json.dumps({"text": "halo é 😀"}, ensure_ascii=False).encode("utf-8")
+    wire = _encode(framing, payload)
+    cut = wire.index("😀".encode("utf-8")) + 2
+    decoder = FRAMINGS[framing].decoder()
+    assert _read(decoder, pair, wire[:cut]) == []
+    frames = _read(decoder, pair, wire[cut:])
+    assert [json.loads(str(frame, "utf-8")) for frame in frames] == [{"text": "halo é 😀"}]
+
+
+def test_oversized_length_prefix_raises(pair):
+    for decoder in (LengthDecoder(), ChunkedDecoder()):
+        # header saja sudah cukup untuk menolak, tanpa menunggu payload
+        with pytest.raises(FrameError):
+            _read(decoder, pair, LENGTH_HEADER.pack(MAX_FRAME_SIZE + 1))
+
+
+def test_unterminated_line_raises():
+    decoder = LineDecoder(b"x" * (MAX_FRAME_SIZE + 1))
+    with pytest.raises(FrameError):
+        decoder.next_frame()
+
+
+def test_chunk_reassembly_with_interleaved_streams(pair):
+    framing = FRAMINGS["chunked"]
+    big = bytes(range(256)) * (2 * FRAGMENT_SIZE // 256 + 1)
+    other = b"y" * (FRAGMENT_SIZE + 1)
+    first = framing.fragments((big,), 1)
+    second = framing.fragments((other,), 2)
+    assert len(first) == 3 and len(second) == 2
+
+    # fragment dua stream diselingi frame kecil biasa
+    order = [first[0], second[0], framing.encode(b"small"), first[1], second[1], first[2]]
+    wire = b"".join(b"".join(bytes(part) for part in chunk) for chunk in order)
+    decoder = framing.decoder()
+    frames = _read(decoder, pair, *(wire[i:i + 5000] for i in range(0, len(wire), 5000)))
+    assert frames == [b"small", other, big]
+
+
+def test_remaining_bytes_carry_over_to_new_decoder():
+    # sisa setelah frame newline terakhir dibawa ke decoder framing baru
+    tail = _encode("length", b"binary")
+    decoder = LineDecoder(b'{"type": "peers"}\n' + tail)
+    assert bytes(decoder.next_frame()) == b'{"type": "peers"}'
+    switched = FRAMINGS["length"].decoder(decoder.remaining())
+    assert bytes(switched.next_frame()) == b"binary"
+
+
+def test_negotiate_framing_prefers_best_common():
+    assert negotiate_framing(["line", "length", "chunked"]) == "chunked"
+    assert negotiate_framing(["length", "line"]) == "length"
+    assert negotiate_framing(["line"]) == "line"
+    assert negotiate_framing(["rot13"]) == "line"
+    assert negotiate_framing(None) == "line"
+
+
+def _free_ports(count):
+    socks = [socket.socket() for _ in range(count)]
+    for sock in socks:
+        sock.bind(("127.0.0.1", 0))
+    ports = [sock.getsockname()[1] for sock in socks]
+    for sock in socks:
+        sock.close()
+    return ports
+
+
+def _recv_line(sock, buffer, timeout=5.0):
+    sock.settimeout(timeout)
+    while b"\n" not in buffer:
+        data = sock.recv(4096)
+        if not data:
+            raise ConnectionError("closed")
+        buffer += data
+    line, _, rest = buffer.partition(b"\n")
+    return json.loads(line), rest
+
+
+@pytest.mark.parametrize("transport", ["thread", "selector"])
+def test_legacy_peer_stays_on_line_framing(transport):
+    got = []
+    port, = _free_ports(1)
+    peer = Peer("bob", port, host="127.0.0.1", transport=transport,
+                on_message=lambda name, text, timestamp, sender_id: got.append(text))
+    peer.start()
+    sock = socket.create_connection(("127.0.0.1", peer.port), timeout=5)
+    try:
+        # JOIN versi lama: tanpa "framing" dan "codecs"
+        join = Message(msg_type=MessageType.JOIN, sender_id=LEGACY, sender_name="old",
+                       data={"host": "127.0.0.1", "port": 1})
+        sock.sendall(join.to_bytes())
+        buffer = b""
+        while True:
+            reply, buffer = _recv_line(sock, buffer)
+            if reply["type"] == MessageType.PEERS.value:
+                break
+        assert reply["data"]["framing"] == "line"
+        assert reply["data"]["codec"] == "json"
+
+        chat = Message(msg_type=MessageType.MESSAGE, sender_id=LEGACY, sender_name="old",
+                       data={"text": "masih newline"}, target_id=peer.peer_id)
+        sock.sendall(chat.to_bytes())
+        deadline = time.monotonic() + 5
+        while not got and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert got == ["masih newline"]
+    finally:
+        sock.close()
+        peer.stop()
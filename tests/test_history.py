@@ -0,0 +1,90 @@
+# Riwayat chat di SQLite (user-024) dan pencarian FTS5 (user-025)
+import sqlite3
+import time
+
+import pytest
+
+from p2p_messaging.history import History
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "history.db")
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return condition()
+
+
+def _stored(path):
+    db = sqlite3.connect(path)
+    try:
+        return [row[0] for row in db.execute("SELECT text FROM messages ORDER BY id")]
+    finally:
+        db.close()
+
+
+def test_single_append_written_without_flush(path):
+    history = History(path, flush_interval=0.05)
+    try:
+        started = time.monotonic()
+        history.append("peer", "alice", "hello", 1)
+        assert _wait_for(lambda: _stored(path) == ["hello"])
+        # One flush_interval plus scheduling slack, not a full batch
+        assert time.monotonic() - started < 0.05 + 0.5
+    finally:
+        history.close()
+
+
+def test_search_finds_message_without_flush():
+    history = History(flush_interval=0.05)
+    try:
+        history.append("peer", "alice", "rapat besok jam sembilan", 1)
+        assert _wait_for(lambda: history.search("rapat"), timeout=0.05 + 0.5)
+        (result,) = history.search("sembil")
+        assert result["text"] == "rapat besok jam sembilan"
+        assert result["peer_id"] == "peer"
+    finally:
+        history.close()
+
+
+def test_failed_batch_does_not_block_later_writes(path):
+    first = History(path)
+    second = History(path)
+    try:
+        first.append("peer", "alice", "one", 1)
+        assert first.flush(5)
+        # `second` hands out the same id, so its batch fails and rolls back
+        second.append("peer", "bob", "clash", 2)
+        assert second.flush(5)
+        second.append("peer", "bob", "two", 3)
+        assert second.flush(5)
+
+        assert _stored(path) == ["one", "two"]
+    finally:
+        first.close()
+        second.close()
+
+
+def test_peer_name_is_last_name_the_peer_used(path):
+    history = History(path)
+    try:
+        assert history.peer_name("bob-id") is None
+        history.append("bob-id", "bob", "halo", 1)
+        history.append("bob-id", "Anda", "hai", 2, is_own=True)
+        # masih di antrian writer
+        assert history.peer_name("bob-id") == "bob"
+        assert history.flush(5)
+        history.append("bob-id", "bobby", "ganti nama", 3)
+        assert history.flush(5)
+        history.append("bob-id", "Anda", "oke", 4, is_own=True)
+        assert history.flush(5)
+        assert history.peer_name("bob-id") == "bobby"
+        assert history.peer_name("carol-id") is None
+    finally:
+        history.close()
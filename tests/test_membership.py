@@ -0,0 +1,200 @@
+# Membership: partial view, tabel member berversi, seen-set broadcast (user-010, user-016)
+import json
+import random
+import socket
+import time
+
+from p2p_messaging import Peer, Message, MessageType
+from p2p_messaging.gossip import SeenSet
+from p2p_messaging.membership import MemberTable, PartialView
+
+
+def _free_ports(count):
+    socks = [socket.socket() for _ in range(count)]
+    for sock in socks:
+        sock.bind(("127.0.0.1", 0))
+    ports = [sock.getsockname()[1] for sock in socks]
+    for sock in socks:
+        sock.close()
+    return ports
+
+
+def _wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def _info(peer_id, port=1):
+    return {"peer_id": peer_id, "name": peer_id, "host": "127.0.0.1", "port": port}
+
+
+def test_seen_set_rolls_over_generations():
+    seen = SeenSet(capacity=4)
+    assert seen.add(1) and seen.add(2)
+    assert not seen.add(1)
+    # generasi sekarang penuh (capacity/2): 1, 2 pindah ke generasi lama
+    assert seen.add(3)
+    assert 1 in seen and 2 in seen and len(seen) == 3
+    assert seen.add(4)
+    assert not seen.add(2)
+    # rollover kedua membuang 1 dan 2
+    assert seen.add(5)
+    assert 1 not in seen and 2 not in seen
+    assert 3 in seen and 4 in seen and 5 in seen
+    assert seen.add(1)
+    assert len(seen) <= seen.capacity
+
+
+def test_full_active_view_returns_victim():
+    view = PartialView("me", active_size=2, rng=random.Random(1))
+    view.add_passive([_info("c")])
+    assert view.add_active(_info("a")) is None
+    assert view.add_active(_info("b")) is None
+    # c naik dari passive, salah satu peer lama harus diputus
+    assert view.add_active(_info("c")) in ("a", "b")
+    assert "c" not in view.passive
+
+
+def test_failed_active_peer_is_not_a_candidate():
+    view = PartialView("me", active_size=2, rng=random.Random(1))
+    view.add_active(_info("a"))
+    view.add_active(_info("b"))
+    view.add_passive([_info("c"), _info("d"), _info("me")])
+    assert set(view.passive) == {"c", "d"}
+
+    view.remove_active("a", keep=False)
+    view.remove_active("b", keep=True)
+    assert set(view.passive) == {"b", "c", "d"}
+    assert {info["peer_id"] for info in view.candidates(5, exclude={"d"})} == {"b", "c"}
+
+
+def test_passive_view_replaces_entries_we_sent():
+    view = PartialView("me", passive_size=2, rng=random.Random(1))
+    view.add_passive([_info("a"), _info("b")])
+    view.add_passive([_info("c")], replace=["a"])
+    assert set(view.passive) == {"b", "c"}
+
+
+def test_member_delta_sync_converges():
+    alice, bob = MemberTable("alice"), MemberTable("bob")
+    alice.announce(_info("alice"))
+    alice.merge([dict(_info("carol"), incarnation=0)])
+    entries, version = alice.delta(0)
+    assert bob.merge(entries, source="alice") == 2
+    assert bob.delta(0, exclude="alice")[0] == []
+
+    # hanya perubahan setelah versi terakhir yang dikirim
+    alice.mark_dead("carol")
+    entries, version = alice.delta(version)
+    assert [(e["peer_id"], e["alive"]) for e in entries] == [("carol", False)]
+    bob.merge(entries, source="alice")
+    bob.announce(_info("bob"))
+    alice.merge(bob.delta(0, exclude="alice")[0], source="bob")
+    assert alice.digest_hex() == bob.digest_hex()
+
+
+def test_member_conflicts_resolved_by_incarnation():
+    table = MemberTable("me")
+    table.merge([dict(_info("carol"), incarnation=1)])
+    # incarnation sama: "mati" menang, "hidup" tidak menghidupkan lagi
+    assert table.merge([dict(_info("carol"), incarnation=1, alive=False)]) == 1
+    assert table.merge([dict(_info("carol"), incarnation=1)]) == 0
+    assert table.merge([dict(_info("carol"), incarnation=0)]) == 0
+    assert table.merge([dict(_info("carol"), incarnation=2)]) == 1
+    assert table.get("carol").alive
+
+    # kabar kematian kita sendiri dibantah dengan incarnation lebih tinggi
+    table.announce(_info("me"))
+    table.merge([dict(_info("me"), incarnation=0, alive=False)])
+    me = table.get("me")
+    assert me.alive and me.incarnation == 1
+
+
+def test_passive_peer_promoted_when_active_peer_fails():
+    ports = _free_ports(3)
+    alice = Peer("alice", ports[0], host="127.0.0.1", max_connections=1,
+                 session_ttl=1.0, reconnect_max_delay=0.2)
+    bob = Peer("bob", ports[1], host="127.0.0.1")
+    carol = Peer("carol", ports[2], host="127.0.0.1")
+    peers = [alice, bob, carol]
+    for peer in peers:
+        peer.local_ip = "127.0.0.1"
+        peer.start()
+    try:
+        assert alice.connect_to_peer("127.0.0.1", ports[1])
+        assert _wait_for(lambda: alice.peer_id in bob.connections)
+        with alice.lock:
+            alice.view.add_passive([_info(carol.peer_id, ports[2])])
+
+        # bob mati tanpa LEAVE
+        bob._broadcast_message = lambda message: None
+        bob.stop()
+        peers.remove(bob)
+
+        assert _wait_for(lambda: carol.peer_id in alice.connections)
+        assert bob.peer_id not in alice.connections
+        # sesi bob sudah habis, slotnya dipakai carol
+        assert bob.peer_id not in alice.get_sessions()
+    finally:
+        for peer in peers:
+            peer.stop()
+
+
+def _read_lines(sock, duration):
+    # semua frame newline JSON yang datang selama `duration` detik
+    sock.settimeout(0.05)
+    buffer = b""
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        try:
+            data = sock.recv(65536)
+        except socket.timeout:
+            continue
+        if not data:
+            break
+        buffer += data
+    return [json.loads(line) for line in buffer.split(b"\n") if line.strip()]
+
+
+def test_membership_traffic_skips_legacy_peers():
+    ports = _free_ports(2)
+    alice = Peer("alice", ports[0], host="127.0.0.1")
+    bob = Peer("bob", ports[1], host="127.0.0.1")
+    for peer in (alice, bob):
+        peer.local_ip = "127.0.0.1"
+        peer.start()
+    legacy = socket.create_connection(("127.0.0.1", ports[0]), timeout=5)
+    try:
+        # JOIN versi lama: tanpa "codecs" dan "membership"
+        legacy.sendall(Message(MessageType.JOIN, "00112233445566778899aabbccddeeff", "old",
+                               {"host": "127.0.0.1", "port": 1}).to_bytes())
+        assert _wait_for(lambda: len(alice.connections) == 1)
+        with alice.lock:
+            # hanya neighbor lama: tidak ada yang bisa diajak shuffle
+            assert alice.view.shuffle_target(
+                exclude=[pid for pid in alice.view.active if pid not in alice.membership_peers]
+            ) is None
+
+        assert alice.connect_to_peer("127.0.0.1", ports[1])
+        assert _wait_for(lambda: alice.peer_id in bob.connections)
+        assert alice.membership_peers == {bob.peer_id}
+        assert bob.membership_peers == {alice.peer_id}
+        for _ in range(5):
+            alice._shuffle()
+        with alice.lock:
+            alice.members.merge([_info("carol", 9)])
+            alice._schedule_members_sync()
+
+        assert _wait_for(lambda: any(m["name"] == "carol" for m in bob.get_members()))
+        frames = _read_lines(legacy, 0.5)
+        assert MessageType.SHUFFLE.value not in [frame["type"] for frame in frames]
+        assert not [frame for frame in frames if frame["type"] == MessageType.PEERS.value
+                    and ("members" in frame["data"] or "routes" in frame["data"])]
+    finally:
+        legacy.close()
+        alice.stop()
+        bob.stop()
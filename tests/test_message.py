@@ -0,0 +1,205 @@
+# Codec pesan: round-trip, negosiasi, alias dan relay (user-006, user-007, user-008)
+import json
+
+import pytest
+
+from p2p_messaging.message import (
+    CODECS, DEFAULT_CODEC, MAX_TTL, AliasTable, Message, MessageType, negotiate_codec,
+)
+
+ALICE = "0123456789abcdef"
+TARGET = "a-peer-id-that-is-not-hex"
+
+DATA = {
+    MessageType.MESSAGE: {"text": "halo 😀\nbaris dua"},
+    MessageType.BROADCAST: {"text": "semua"},
+    MessageType.JOIN: {"host": "127.0.0.1", "port": 5000, "codecs": ["binary", "json"]},
+    MessageType.LEAVE: None,
+    MessageType.PEERS: {"peers": [{"peer_id": ALICE, "name": "alice", "host": "h", "port": 1}]},
+    MessageType.PING: None,
+    MessageType.PONG: {"sent": 123},
+    MessageType.DISCOVERY: {"port": 5000},
+    MessageType.SHUFFLE: {"peers": [], "ttl": 3},
+    MessageType.SHUFFLE_REPLY: {"peers": []},
+    MessageType.ACK: {"ack": 7, "sack": [[9, 11]]},
+}
+
+
+def _round_trip(codec, message, tx=None, rx=None):
+    return codec.decode(codec.encode(message, tx), rx)
+
+
+def test_every_message_type_has_sample_data():
+    assert set(DATA) == set(MessageType)
+
+
+@pytest.mark.parametrize("codec_name", sorted(CODECS))
+@pytest.mark.parametrize("msg_type", list(MessageType), ids=lambda t: t.value)
+def test_round_trip_every_message_type(codec_name, msg_type):
+    codec = CODECS[codec_name]
+    message = Message(
+        msg_type=msg_type,
+        sender_id=ALICE,
+        sender_name="alice é",
+        data=DATA[msg_type],
+        target_id=TARGET if msg_type == MessageType.MESSAGE else None,
+        msg_id=2 ** 63 if msg_type == MessageType.MESSAGE else None,
+        ttl=5 if msg_type == MessageType.BROADCAST else None,
+        seq=41 if msg_type == MessageType.MESSAGE else None,
+    )
+    decoded = _round_trip(codec, message, AliasTable(), AliasTable())
+    assert decoded.to_dict() == message.to_dict()
+
+
+@pytest.mark.parametrize("codec_name", sorted(name for name, codec in CODECS.items() if codec.binary))
+def test_binary_ttl_clamped_to_one_byte(codec_name):
+    codec = CODECS[codec_name]
+    for ttl, expected in ((MAX_TTL + 100, MAX_TTL), (MAX_TTL, MAX_TTL), (-3, 0), (0, 0)):
+        message = Message(MessageType.BROADCAST, ALICE, "alice", {"text": "x"}, ttl=ttl)
+        assert _round_trip(codec, message).ttl == expected
+
+
+def test_json_keeps_ttl_above_max():
+    # JSON tidak dibatasi 1 byte, clamp hanya terjadi saat pindah ke binary
+    message = Message(MessageType.BROADCAST, ALICE, "alice", {"text": "x"}, ttl=MAX_TTL + 100)
+    assert _round_trip(CODECS["json"], message).ttl == MAX_TTL + 100
+
+
+def test_negotiate_codec_falls_back_to_json():
+    assert negotiate_codec(None, True) == DEFAULT_CODEC == "json"
+    assert negotiate_codec([], True) == "json"
+    assert negotiate_codec(["rot13", "protobuf"], True) == "json"
+
+
+def test_negotiate_codec_prefers_binary_when_framing_allows():
+    assert negotiate_codec(["json", "binary"], True) == "binary"
+    # payload binary bisa berisi newline, tidak boleh lewat framing line
+    assert negotiate_codec(["json", "binary"], False) == "json"
+
+
+# ---- Alias peer id per koneksi (user-007) ----
+
+def _link(*messages):
+    # kirim lewat satu arah koneksi: tabel tx di pengirim, rx di penerima
+    tx, rx = AliasTable(), AliasTable()
+    codec = CODECS["binary"]
+    frames = [codec.encode(message, tx) for message in messages]
+    return tx, rx, frames, [codec.decode(frame, rx) for frame in frames]
+
+
+def _chat(sender_id, name, target_id=None):
+    return Message(MessageType.MESSAGE, sender_id, name, {"text": "x"}, target_id=target_id)
+
+
+def test_aliases_match_on_both_ends():
+    senders = [(ALICE, "alice"), ("fedcba9876543210", "bob"), ("carol-long-id", "carol")]
+    messages = [_chat(*senders[i % 3], target_id=senders[(i + 1) % 3][0]) for i in range(9)]
+    tx, rx, frames, decoded = _link(*messages)
+
+    assert [(m.sender_id, m.sender_name, m.target_id) for m in decoded] == \
+        [(m.sender_id, m.sender_name, m.target_id) for m in messages]
+    # alias yang dibuat pengirim sama persis dengan yang dipelajari penerima
+    assert {alias: key for key, alias in tx.tx.items()} == rx.rx
+    # setelah didefinisikan, sender dikirim sebagai alias 2 byte
+    assert len(frames[3]) < len(frames[0])
+
+
+def test_same_key_gets_same_alias():
+    tx = AliasTable()
+    assert tx.outgoing((ALICE, "alice")) == (0, True)
+    assert tx.outgoing((ALICE, "alice")) == (0, False)
+    # target tanpa nama adalah key berbeda dari sender dengan nama
+    assert tx.outgoing((ALICE, None)) == (1, True)
+
+
+def test_truncated_alias_is_defined_again():
+    codec = CODECS["binary"]
+    tx, rx = AliasTable(), AliasTable()
+    codec.decode(codec.encode(_chat(ALICE, "alice"), tx), rx)
+
+    # frame yang mendefinisikan alias 1 tidak jadi dikirim
+    known = len(tx.tx)
+    codec.encode(_chat("carol-long-id", "carol"), tx)
+    tx.truncate(known)
+    assert set(tx.tx) == {(ALICE, "alice")}
+
+    decoded = codec.decode(codec.encode(_chat("carol-long-id", "carol"), tx), rx)
+    assert (decoded.sender_id, decoded.sender_name) == ("carol-long-id", "carol")
+    assert {alias: key for key, alias in tx.tx.items()} == rx.rx
+
+
+def test_unknown_alias_is_rejected():
+    codec = CODECS["binary"]
+    tx = AliasTable()
+    codec.encode(_chat(ALICE, "alice"), tx)
+    with pytest.raises(ValueError):
+        # penerima tidak pernah melihat frame yang mendefinisikan alias
+        codec.decode(codec.encode(_chat(ALICE, "alice"), tx), AliasTable())
+
+
+def test_full_table_sends_ids_inline():
+    codec = CODECS["binary"]
+    full = AliasTable()
+    full.MAX_ALIASES = 1
+    receiver = AliasTable()
+    for sender in [(ALICE, "alice"), ("carol-long-id", "carol"), ("carol-long-id", "carol")]:
+        decoded = codec.decode(codec.encode(_chat(*sender), full), receiver)
+        assert (decoded.sender_id, decoded.sender_name) == sender
+    assert list(full.tx) == [(ALICE, "alice")]
+    assert list(receiver.rx.values()) == [(ALICE, "alice")]
+
+
+# ---- Relay tanpa decode data (user-008) ----
+
+TRICKY = 'ttl ditulis "ttl": 3, lalu , "data": {"ttl": 9} dan }'
+
+
+@pytest.mark.parametrize("codec_name", sorted(CODECS))
+def test_relay_keeps_data_bytes_and_decrements_ttl(codec_name):
+    codec = CODECS[codec_name]
+    message = Message(MessageType.MESSAGE, ALICE, 'nama , "data": "x"', {"text": TRICKY, "ttl": 7},
+                      TARGET, msg_id=5, ttl=16)
+    received = codec.decode(codec.encode(message))
+    assert received.hop()
+    raw = received.raw_body(codec_name)
+    assert raw is not None
+    body = codec.encode_body(received)
+    # data diteruskan tanpa di-decode, dan tanpa serialize ulang
+    assert raw in body
+    assert received.raw_body(codec_name) is raw
+
+    next_hop = codec.decode(codec.encode_header(received) + body)
+    assert next_hop.ttl == 15
+    assert next_hop.sender_name == 'nama , "data": "x"'
+    assert next_hop.data == {"text": TRICKY, "ttl": 7}
+
+
+def test_json_decode_parses_header_only():
+    codec = CODECS["json"]
+    message = Message(MessageType.MESSAGE, ALICE, "alice", {"text": TRICKY}, TARGET, ttl=4)
+    payload = codec.encode(message)
+    # data rusak hanya ketahuan saat dibaca, header tetap ter-decode
+    broken = payload.replace(b'"text"', b'"text', 1)
+    received = codec.decode(broken)
+    assert (received.sender_id, received.target_id, received.ttl) == (ALICE, TARGET, 4)
+    with pytest.raises(ValueError):
+        received.data
+
+
+def test_json_decodes_legacy_field_order():
+    # peer lama menulis data sebelum target_id
+    legacy = {"type": "MESSAGE", "sender_id": ALICE, "sender_name": "old", "timestamp": 1,
+              "data": {"text": TRICKY}, "target_id": TARGET, "ttl": 3}
+    codec = CODECS["json"]
+    received = codec.decode(json.dumps(legacy).encode())
+    assert received.data == {"text": TRICKY}
+    assert received.hop()
+    relayed = codec.decode(codec.encode(received))
+    assert (relayed.target_id, relayed.ttl, relayed.data) == (TARGET, 2, {"text": TRICKY})
+
+
+def test_json_null_data_is_not_lazy():
+    codec = CODECS["json"]
+    received = codec.decode(codec.encode(Message(MessageType.PING, ALICE, "alice")))
+    assert not received.has_data
+    assert received.data is None
@@ -0,0 +1,123 @@
+# Urutan chat lewat lane antrian kirim (user-020)
+import socket
+import threading
+import time
+
+import pytest
+
+from p2p_messaging import Peer, Message, MessageType
+from p2p_messaging.network import ConnectionHandler
+
+ALICE = "0123456789abcdef"
+BOB = "fedcba9876543210"
+
+
+def _free_ports(count):
+    socks = [socket.socket() for _ in range(count)]
+    for sock in socks:
+        sock.bind(("127.0.0.1", 0))
+    ports = [sock.getsockname()[1] for sock in socks]
+    for sock in socks:
+        sock.close()
+    return ports
+
+
+def _wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+@pytest.fixture
+def link():
+    # dua ConnectionHandler lewat socketpair, framing chunked + codec binary
+    left, right = socket.socketpair()
+    sender = ConnectionHandler(left, ("left", 0))
+    receiver = ConnectionHandler(right, ("right", 0))
+    received = []
+    done = threading.Event()
+
+    def on_message(message, handler):
+        received.append(message)
+        if message.msg_type == MessageType.LEAVE:
+            done.set()
+
+    receiver.on_message = on_message
+    for handler in (sender, receiver):
+        handler.set_protocol("chunked", "binary")
+    yield sender, receiver, received, done
+    for handler in (sender, receiver):
+        handler.stop()
+
+
+def _chat(text):
+    return Message(MessageType.MESSAGE, ALICE, "alice", {"text": text}, target_id=BOB)
+
+
+def test_small_chat_does_not_overtake_large(link):
+    sender, receiver, received, done = link
+    # Queue everything before the writer starts so all frames wait together;
+    # the first chat defines the aliases and goes out first
+    sender.send(_chat("hello"))
+    sender.send(_chat("x" * (512 * 1024)))
+    sender.send(_chat("small"))
+    sender.send(Message(MessageType.PING, ALICE, "alice", {}))
+    sender.send(Message(MessageType.LEAVE, ALICE, "alice", {}))
+    receiver.start()
+    sender.start()
+
+    assert done.wait(10)
+    order = [
+        message.data.get("text", "")[:5] if message.msg_type == MessageType.MESSAGE
+        else message.msg_type.value
+        for message in received
+    ]
+    # Control frames still go first, chat and LEAVE keep their send order
+    assert order == ["hello", "PING", "xxxxx", "small", "LEAVE"]
+
+
+def test_new_alias_does_not_overtake_queued_chat(link):
+    sender, receiver, received, done = link
+    sender.send(_chat("hello"))
+    sender.send(_chat("x" * (512 * 1024)))
+    # A new sender would define an alias; it must still wait its turn
+    sender.send(Message(MessageType.MESSAGE, BOB, "bob", {"text": "relayed"}, target_id=ALICE))
+    sender.send(Message(MessageType.LEAVE, ALICE, "alice", {}))
+    receiver.start()
+    sender.start()
+
+    assert done.wait(10)
+    assert [message.sender_id for message in received] == [ALICE, ALICE, BOB, ALICE]
+    assert received[2].data == {"text": "relayed"}
+
+
+@pytest.mark.parametrize("transport", ["thread", "selector"])
+def test_peers_deliver_large_then_small_in_order(transport):
+    got = []
+    ports = _free_ports(2)
+    peers = []
+    try:
+        for name, port in zip(("alice", "bob"), ports):
+            peer = Peer(name, port, host="127.0.0.1", transport=transport,
+                        on_message=lambda sender, text, *rest: got.append(text))
+            peer.local_ip = "127.0.0.1"
+            peer.start()
+            peers.append(peer)
+        alice, bob = peers
+        assert alice.connect_to_peer("127.0.0.1", ports[1])
+        assert _wait_for(lambda: bob.peer_id in alice.connections and alice.peer_id in bob.connections)
+
+        # The first chat defines bob's alias on the link and skips the lanes
+        alice.send_message("hello", target_peer_id=bob.peer_id)
+        assert _wait_for(lambda: got == ["hello"])
+        alice.send_message("L" * (2 * 1024 * 1024), target_peer_id=bob.peer_id)
+        alice.send_message("small", target_peer_id=bob.peer_id)
+
+        assert _wait_for(lambda: len(got) == 3)
+        assert [text[:5] for text in got] == ["hello", "LLLLL", "small"]
+    finally:
+        for peer in peers:
+            peer.stop()
@@ -0,0 +1,90 @@
+# Outbox dikunci identity dan bertahan lintas restart (user-014)
+import socket
+import time
+
+from p2p_messaging import Peer
+from p2p_messaging.utils import load_identity
+
+
+def _free_ports(count):
+    socks = [socket.socket() for _ in range(count)]
+    for sock in socks:
+        sock.bind(("127.0.0.1", 0))
+    ports = [sock.getsockname()[1] for sock in socks]
+    for sock in socks:
+        sock.close()
+    return ports
+
+
+def _wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def _start(name, port, **options):
+    peer = Peer(name, port, host="127.0.0.1", **options)
+    peer.local_ip = "127.0.0.1"
+    peer.start()
+    return peer
+
+
+def test_load_identity_is_stable(tmp_path):
+    path = str(tmp_path / "identity_5000")
+    identity = load_identity(path)
+    assert len(identity) == 32
+    assert load_identity(path) == identity
+    assert load_identity(str(tmp_path / "identity_5001")) != identity
+
+
+def test_outbox_survives_restart_of_both_peers(tmp_path):
+    ports = _free_ports(4)
+    outbox_path = str(tmp_path / "outbox.db")
+    alice = _start("alice", ports[0], identity="alice-id", outbox_path=outbox_path)
+    bob = _start("bob", ports[1], identity="bob-id")
+    peers = [alice, bob]
+    try:
+        assert alice.connect_to_peer("127.0.0.1", ports[1])
+        assert _wait_for(lambda: alice.peer_id in bob.connections)
+        old_bob = bob.peer_id
+        assert alice.identity_of(old_bob) == "bob-id"
+
+        bob.stop()
+        peers.remove(bob)
+        assert _wait_for(lambda: old_bob not in alice.connections)
+        assert alice.send_message("satu", target_peer_id=old_bob) is None
+        assert alice.send_message("dua", target_peer_id=old_bob) is None
+        alice.stop()
+        peers.remove(alice)
+
+        # kedua sisi start lagi dengan peer_id baru, identity sama
+        got = []
+        alice = _start("alice", ports[2], identity="alice-id", outbox_path=outbox_path)
+        peers.append(alice)
+        bob = _start("bob", ports[3], identity="bob-id",
+                     on_message=lambda name, text, timestamp, sender_id: got.append((text, sender_id)))
+        peers.append(bob)
+        assert bob.peer_id != old_bob
+        assert alice.outbox.pending_peers() == {"bob-id"}
+
+        assert alice.connect_to_peer("127.0.0.1", ports[3])
+        assert _wait_for(lambda: len(got) == 2)
+        # dialamatkan ulang dari peer_id alice yang sekarang, jadi bisa dibalas
+        assert got == [("satu", alice.peer_id), ("dua", alice.peer_id)]
+        assert _wait_for(lambda: not alice.outbox.pending_peers())
+    finally:
+        for peer in peers:
+            peer.stop()
+
+
+def test_legacy_peer_without_identity_is_keyed_by_peer_id():
+    port, = _free_ports(1)
+    alice = _start("alice", port)
+    try:
+        assert alice.identity == alice.peer_id
+        assert alice.identity_of("unknown-peer") == "unknown-peer"
+    finally:
+        alice.stop()
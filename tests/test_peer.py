@@ -0,0 +1,106 @@
+# Peer: callback aplikasi tidak menahan event loop (user-001)
+import socket
+import threading
+import time
+import warnings
+
+import pytest
+
+from p2p_messaging import Peer
+
+
+def _free_ports(count):
+    socks = [socket.socket() for _ in range(count)]
+    for sock in socks:
+        sock.bind(("127.0.0.1", 0))
+    ports = [sock.getsockname()[1] for sock in socks]
+    for sock in socks:
+        sock.close()
+    return ports
+
+
+def _wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def _pair(transport, **bob_options):
+    ports = _free_ports(2)
+    alice = Peer("alice", ports[0], host="127.0.0.1", transport=transport)
+    bob = Peer("bob", ports[1], host="127.0.0.1", transport=transport, **bob_options)
+    for peer in (alice, bob):
+        peer.local_ip = "127.0.0.1"
+        peer.start()
+    assert alice.connect_to_peer("127.0.0.1", ports[1])
+    assert _wait_for(lambda: bob.peer_id in alice.connections and alice.peer_id in bob.connections)
+    return alice, bob
+
+
+def test_slow_callback_does_not_stall_selector_loop():
+    release = threading.Event()
+    got = []
+
+    def on_message(sender, text, *rest):
+        release.wait(10)
+        got.append(text)
+
+    alice, bob = _pair("selector", on_message=on_message)
+    try:
+        first = alice.send_message("one", target_peer_id=bob.peer_id)
+        second = alice.send_message("two", target_peer_id=bob.peer_id)
+        # Bob's loop still reads and acks while the callback is stuck
+        assert first.wait(5) and second.wait(5)
+        assert got == []
+        release.set()
+        assert _wait_for(lambda: got == ["one", "two"])
+    finally:
+        release.set()
+        alice.stop()
+        bob.stop()
+
+
+# ---- Callback join/leave (user-023) ----
+
+def test_peer_callbacks_receive_name_and_id():
+    joined, left = [], []
+    port, = _free_ports(1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        peer = Peer("alice", port, host="127.0.0.1",
+                    on_peer_join=lambda name, peer_id: joined.append((name, peer_id)),
+                    on_peer_leave=lambda *args: left.append(args))
+    peer.on_peer_join("bob", "b0b")
+    peer.on_peer_leave("bob", "b0b")
+    assert joined == [("bob", "b0b")] and left == [("bob", "b0b")]
+
+
+def test_one_argument_peer_callback_is_deprecated():
+    joined, left = [], []
+    port, = _free_ports(1)
+    with pytest.deprecated_call():
+        peer = Peer("alice", port, host="127.0.0.1", on_peer_join=joined.append,
+                    on_peer_leave=lambda name: left.append(name))
+    peer.on_peer_join("bob", "b0b")
+    peer.on_peer_leave("bob", "b0b")
+    assert joined == ["bob"] and left == ["bob"]
+
+
+def test_one_argument_callback_still_called_on_join():
+    joined = []
+    ports = _free_ports(2)
+    with pytest.deprecated_call():
+        alice = Peer("alice", ports[0], host="127.0.0.1", on_peer_join=lambda name: joined.append(name))
+    bob = Peer("bob", ports[1], host="127.0.0.1")
+    for peer in (alice, bob):
+        peer.local_ip = "127.0.0.1"
+        peer.start()
+    try:
+        assert alice.connect_to_peer("127.0.0.1", ports[1])
+        assert _wait_for(lambda: joined == ["bob"])
+    finally:
+        alice.stop()
+        bob.stop()
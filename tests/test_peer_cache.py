@@ -0,0 +1,29 @@
+# Cache alamat peer untuk warm start dan form ConnectDialog (user-019)
+import time
+
+from p2p_messaging.peer_cache import PeerCache
+
+
+def _info(port):
+    return {"host": "10.0.0.1", "port": port}
+
+
+def test_latest_is_most_recent_success(tmp_path):
+    cache = PeerCache(str(tmp_path / "peers.json"))
+    assert cache.latest() is None
+
+    # alamat dari passive view saja belum pernah berhasil dihubungi
+    cache.known([_info(1)])
+    assert cache.latest() is None
+
+    now = time.time()
+    cache.connected(_info(2), now=now - 10)
+    cache.connected(_info(3), rtt=0.001, now=now - 20)
+    assert cache.latest()["port"] == 2
+    cache.connected(_info(3), now=now)
+    assert cache.latest()["port"] == 3
+
+    cache.save()
+    reloaded = PeerCache(cache.path)
+    reloaded.load()
+    assert (reloaded.latest()["host"], reloaded.latest()["port"]) == ("10.0.0.1", 3)
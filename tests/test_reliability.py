@@ -0,0 +1,186 @@
+# Direct message andal: seq, ACK kumulatif/SACK, retransmit (user-013)
+from p2p_messaging.failure import TimingWheel
+from p2p_messaging.message import Message, MessageType
+from p2p_messaging.reliability import ReliabilityManager
+
+# RTO awal tanpa sampel RTT = 1 detik = 20 tick
+RTO_TICKS = 20
+
+
+class Link:
+    # Dua ReliabilityManager dihubungkan lewat transmit/send_ack palsu.
+    # Timer jalan di satu TimingWheel yang diputar manual dengan advance().
+
+    def __init__(self, **options):
+        self.wheel = TimingWheel()
+        self.sent = []        # seq setiap transmit a -> b
+        self.delivered = []   # seq yang diteruskan ke aplikasi di b
+        self.acks = []        # ACK b -> a
+        self.markers = []     # penanda forward a -> b
+        self.drop_seqs = {}   # seq -> berapa kali lagi dibuang
+        self.drop_acks = 0
+        self.drop_markers = 0
+        self.route = True
+        self.a = ReliabilityManager(self.wheel, self._transmit, self._a_ack, **options)
+        self.b = ReliabilityManager(self.wheel, lambda peer_id, message: True, self._b_ack,
+                                    ack_delay=0.05, ack_every=options.get("ack_every", 64))
+
+    def send(self, count=1):
+        return [
+            self.a.send("b", Message(MessageType.MESSAGE, "a", "alice", {"n": i}, "b"))
+            for i in range(count)
+        ]
+
+    def _transmit(self, peer_id, message):
+        if not self.route:
+            return False
+        self.sent.append(message.seq)
+        left = self.drop_seqs.get(message.seq, 0)
+        if left:
+            self.drop_seqs[message.seq] = left - 1
+        elif self.b.on_message("a", message.seq):
+            self.delivered.append(message.seq)
+        return True
+
+    def _a_ack(self, peer_id, data):
+        # dari a hanya penanda forward
+        self.markers.append(data["forward"])
+        if self.drop_markers:
+            self.drop_markers -= 1
+        else:
+            self.b.on_ack("a", data)
+        return True
+
+    def _b_ack(self, peer_id, data):
+        self.acks.append(data)
+        if self.drop_acks:
+            self.drop_acks -= 1
+        else:
+            self.a.on_ack("b", data)
+        return True
+
+    @property
+    def cumulative(self):
+        return self.b._recv["a"].cumulative
+
+
+def test_out_of_order_receive_acks_with_sack():
+    link = Link()
+    for seq in (1, 3, 4, 6, 8, 9, 10):
+        assert link.b.on_message("a", seq)
+    link.wheel.advance(1)
+    assert link.acks == [{"ack": 1, "sack": [[3, 4], [6, 6], [8, 10]]}]
+
+    # lubang terisi: kumulatif maju melewati range yang sudah diterima
+    link.b.on_message("a", 2)
+    link.b.on_message("a", 5)
+    link.wheel.advance(1)
+    assert link.acks[-1] == {"ack": 6, "sack": [[8, 10]]}
+
+
+def test_sack_completes_only_acknowledged_deliveries():
+    link = Link()
+    link.drop_seqs = {2: 1}
+    deliveries = link.send(4)
+    link.wheel.advance(1)
+    assert link.acks[0] == {"ack": 1, "sack": [[3, 4]]}
+    assert [d.delivered for d in deliveries] == [True, None, True, True]
+
+
+def test_dropped_frame_is_retransmitted_after_rto():
+    link = Link()
+    link.drop_seqs = {1: 1}
+    delivery, = link.send()
+    link.wheel.advance(RTO_TICKS - 1)
+    assert link.sent == [1] and not delivery.done
+
+    link.wheel.advance(2)
+    assert link.sent == [1, 1]
+    link.wheel.advance(1)
+    assert delivery.delivered is True
+    assert link.delivered == [1]
+    assert link.a.snapshot()["retransmits"] == 1
+
+
+def test_abandoned_seq_moves_receiver_forward():
+    link = Link(max_retries=1)
+    link.drop_seqs = {2: 99}
+    deliveries = link.send(3)
+    link.wheel.advance(1)
+    assert link.cumulative == 1
+
+    # seq 2 gagal setelah RTO + satu retransmit (RTO x2)
+    link.wheel.advance(RTO_TICKS * 3 + 2)
+    assert [d.delivered for d in deliveries] == [True, False, True]
+    assert link.markers == [3]
+    assert link.cumulative == 3 and not link.b._recv["a"].pending
+
+    # seq berikutnya diterima normal
+    link.send()
+    link.wheel.advance(1)
+    assert link.delivered == [1, 3, 4]
+    assert link.acks[-1] == {"ack": 4}
+
+
+def test_lost_forward_marker_is_resent_from_on_ack():
+    link = Link(max_retries=1)
+    link.drop_seqs = {2: 99}
+    link.drop_markers = 1
+    link.send(3)
+    link.wheel.advance(RTO_TICKS * 3 + 3)
+    assert link.markers == [3]
+    # penerima masih menunggu seq 2
+    assert link.cumulative == 1
+
+    # ACK berikutnya masih di bawah seq yang sudah dilepas: penanda dikirim
+    # lagi, sekarang sampai seq 4 yang juga sudah selesai
+    link.send()
+    link.wheel.advance(1)
+    assert link.markers == [3, 4]
+    assert link.cumulative == 4
+    assert link.acks[-1] == {"ack": 4}
+
+
+def test_duplicate_after_lost_ack_is_suppressed():
+    link = Link()
+    link.drop_acks = 1
+    delivery, = link.send()
+    link.wheel.advance(RTO_TICKS + 2)
+    # retransmit sampai ke penerima lagi, tapi aplikasi hanya melihatnya sekali
+    assert link.sent == [1, 1]
+    assert link.delivered == [1]
+    assert link.b.snapshot()["duplicates"] == 1
+    assert delivery.delivered is True
+
+
+def test_window_holds_backlog_until_acked():
+    link = Link(window=2, ack_every=1000)
+    deliveries = link.send(5)
+    assert link.sent == [1, 2]
+    assert link.a.snapshot()["inflight"] == 5
+
+    # setiap ACK membuka ruang di window untuk backlog
+    link.wheel.advance(1)
+    assert link.sent == [1, 2, 3, 4]
+    link.wheel.advance(2)
+    assert link.sent == [1, 2, 3, 4, 5]
+    link.wheel.advance(2)
+    assert all(d.delivered for d in deliveries)
+    assert link.a.snapshot()["inflight"] == 0
+
+
+def test_no_route_fails_without_waiting_for_rto():
+    link = Link()
+    link.route = False
+    first, second = link.send(2)
+    assert first.delivered is False and second.delivered is False
+    assert link.a.snapshot()["inflight"] == 0
+
+
+def test_close_fails_pending_deliveries():
+    link = Link(window=1)
+    link.drop_seqs = {1: 99}
+    deliveries = link.send(3)
+    link.wheel.advance(5)
+    link.a.close()
+    assert [d.delivered for d in deliveries] == [False, False, False]
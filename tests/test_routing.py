@@ -0,0 +1,128 @@
+# Routing distance-vector multi-hop (user-009)
+from p2p_messaging.routing import MAX_HOPS, RoutingTable
+
+
+def _converge(tables, links, pending):
+    # sebarkan delta rute sampai tidak ada perubahan, return jumlah ronde
+    rounds = 0
+    while pending:
+        rounds += 1
+        assert rounds < 100, "routing did not converge"
+        outgoing = {}
+        for (src, dst), entries in pending.items():
+            if src not in links[dst]:
+                continue
+            changed = tables[dst].update(src, entries)
+            for neighbor in links[dst] if changed else ():
+                outgoing.setdefault((dst, neighbor), set()).update(changed)
+        pending = {}
+        for (src, dst), changed in outgoing.items():
+            entries = tables[src].advertise(dst, changed)
+            if entries:
+                pending[(src, dst)] = entries
+    return rounds
+
+
+def _network(edges):
+    links = {}
+    for a, b in edges:
+        links.setdefault(a, set()).add(b)
+        links.setdefault(b, set()).add(a)
+    tables = {node: RoutingTable(node) for node in links}
+    pending = {}
+    for a, b in edges:
+        tables[a].add_neighbor(b)
+        tables[b].add_neighbor(a)
+    for node, neighbors in links.items():
+        for neighbor in neighbors:
+            pending[(node, neighbor)] = tables[node].advertise(neighbor)
+    _converge(tables, links, pending)
+    return tables, links
+
+
+def _drop_link(tables, links, a, b):
+    links[a].discard(b)
+    links[b].discard(a)
+    pending = {}
+    for node, other in ((a, b), (b, a)):
+        changed = tables[node].remove_neighbor(other)
+        for neighbor in links[node]:
+            entries = tables[node].advertise(neighbor, changed)
+            if entries:
+                pending[(node, neighbor)] = entries
+    _converge(tables, links, pending)
+
+
+def test_line_network_learns_multi_hop_routes():
+    tables, _ = _network([("a", "b"), ("b", "c"), ("c", "d")])
+    assert tables["a"].next_hop("d") == "b"
+    assert tables["a"].distance("d") == 3
+    assert tables["d"].distance("a") == 3
+
+
+def test_max_hops_poisons_route():
+    table = RoutingTable("a")
+    table.add_neighbor("b")
+    assert table.update("b", {"c": 2}) == {"c"}
+    assert table.distance("c") == 3
+
+    # jarak MAX_HOPS dari next hop = rute ditarik
+    assert table.update("b", {"c": MAX_HOPS}) == {"c"}
+    assert table.next_hop("c") is None
+    assert "c" not in table.neighbors["b"]
+
+
+def test_route_longer_than_max_hops_is_not_installed():
+    table = RoutingTable("a")
+    table.add_neighbor("b")
+    assert table.update("b", {"far": MAX_HOPS - 1}) == set()
+    assert table.next_hop("far") is None
+    assert table.update("b", {"near": MAX_HOPS - 2}) == {"near"}
+    assert table.distance("near") == MAX_HOPS - 1
+
+
+def test_split_horizon_with_poisoned_reverse():
+    table = RoutingTable("a")
+    table.add_neighbor("b")
+    table.add_neighbor("c")
+    table.update("b", {"x": 1})
+
+    # rute ke x lewat b: b diberi tahu jarak tak terhingga, c jarak aslinya
+    assert table.advertise("b") == {"x": MAX_HOPS, "c": 1}
+    assert table.advertise("c") == {"x": 2, "b": 1}
+    # neighbor tidak pernah diberi rute ke dirinya sendiri
+    assert "b" not in table.advertise("b")
+
+
+def test_dropped_link_withdraws_routes_through_it():
+    table = RoutingTable("a")
+    table.add_neighbor("b")
+    table.update("b", {"c": 1, "d": 2})
+    assert table.remove_neighbor("b") == {"b", "c", "d"}
+    assert len(table) == 0
+    # delta ke neighbor lain menarik rute dengan MAX_HOPS
+    table.add_neighbor("e")
+    assert table.advertise("e", {"c", "d"}) == {"c": MAX_HOPS, "d": MAX_HOPS}
+
+
+def test_dropped_link_fails_over_to_other_neighbor():
+    table = RoutingTable("a")
+    table.add_neighbor("b")
+    table.add_neighbor("c")
+    table.update("b", {"x": 1})
+    table.update("c", {"x": 3})
+    assert table.next_hop("x") == "b"
+    assert table.remove_neighbor("b") == {"b", "x"}
+    assert (table.next_hop("x"), table.distance("x")) == ("c", 4)
+
+
+def test_partition_does_not_count_to_infinity():
+    # cincin a-b-c-d-a lalu d terputus dari semua: tidak ada rute ke d tersisa
+    tables, links = _network([("a", "b"), ("b", "c"), ("c", "d"), ("d", "a")])
+    assert tables["b"].distance("d") == 2
+    _drop_link(tables, links, "c", "d")
+    assert tables["c"].next_hop("d") == "b"
+    _drop_link(tables, links, "d", "a")
+    for node in "abc":
+        assert tables[node].next_hop("d") is None
+        assert tables["d"].next_hop(node) is None